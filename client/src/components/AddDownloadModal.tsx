@@ -62,6 +62,7 @@ export default function AddDownloadModal() {
   const [url, setUrl] = useState("");
   const [filename, setFilename] = useState("");
   const [autoExtract, setAutoExtract] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [speedLimit, setSpeedLimit] = useState(0);
   const [maxConnections, setMaxConnections] = useState(0);
   const [defaultMaxConnections, setDefaultMaxConnections] = useState(4); // Default fallback
@@ -71,6 +72,8 @@ export default function AddDownloadModal() {
   const [driveLink, setDriveLink] = useState("");
   const [userDriveName, setUserDriveName] = useState("");
   const [fetchedDriveName, setFetchedDriveName] = useState("");
+  const [syncFolder, setSyncFolder] = useState(false);
+  const [deleteRemoved, setDeleteRemoved] = useState(false);
   const [driveMimeType, setDriveMimeType] = useState(
     "application/octet-stream"
   ); // Default fallback
@@ -144,7 +147,8 @@ export default function AddDownloadModal() {
           filename || undefined,
           autoExtract,
           speedLimit,
-          maxConnections
+          maxConnections,
+          streaming
         );
         await refreshTasks();
         resetForm();
@@ -181,7 +185,9 @@ export default function AddDownloadModal() {
           mime,
           autoExtract,
           speedLimit,
-          maxConnections
+          maxConnections,
+          syncFolder,
+          deleteRemoved
         );
         await refreshTasks();
         resetForm();
@@ -196,6 +202,7 @@ export default function AddDownloadModal() {
     setUrl("");
     setFilename("");
     setAutoExtract(false);
+    setStreaming(false);
     setSpeedLimit(0);
     setMaxConnections(defaultMaxConnections);
     setFileExists(false);
@@ -203,6 +210,8 @@ export default function AddDownloadModal() {
     setUserDriveName("");
     setFetchedDriveName("");
     setDriveMimeType("application/octet-stream");
+    setSyncFolder(false);
+    setDeleteRemoved(false);
     setError(null);
   };
 
@@ -344,6 +353,42 @@ export default function AddDownloadModal() {
                     Detected: {fetchedDriveName}
                   </p>
                 )}
+                {driveLink.includes("/folders/") && (
+                  <div className="mt-2 space-y-1">
+                    <div className="flex items-center gap-2">
+                      <input
+                        type="checkbox"
+                        id="syncFolder"
+                        checked={syncFolder}
+                        onChange={(e) => setSyncFolder(e.target.checked)}
+                        className="w-4 h-4 rounded border-neutral-300 text-pink-600 focus:ring-pink-500 accent-pink-500 dark:accent-pink-600"
+                      />
+                      <label
+                        htmlFor="syncFolder"
+                        className="text-sm text-neutral-700 dark:text-neutral-200 select-none cursor-pointer"
+                      >
+                        Sync as local mirror (only fetch changes)
+                      </label>
+                    </div>
+                    {syncFolder && (
+                      <div className="flex items-center gap-2">
+                        <input
+                          type="checkbox"
+                          id="deleteRemoved"
+                          checked={deleteRemoved}
+                          onChange={(e) => setDeleteRemoved(e.target.checked)}
+                          className="w-4 h-4 rounded border-neutral-300 text-pink-600 focus:ring-pink-500 accent-pink-500 dark:accent-pink-600"
+                        />
+                        <label
+                          htmlFor="deleteRemoved"
+                          className="text-sm text-neutral-700 dark:text-neutral-200 select-none cursor-pointer"
+                        >
+                          Delete files removed from Drive
+                        </label>
+                      </div>
+                    )}
+                  </div>
+                )}
               </div>
               <div>
                 <label className="block text-sm font-medium mb-1 text-neutral-600 dark:text-neutral-300">
@@ -472,6 +517,24 @@ export default function AddDownloadModal() {
                     Auto Extract (zip, tar, etc.)
                   </label>
                 </div>
+
+                {activeTab === "url" && (
+                  <div className="flex items-center gap-2">
+                    <input
+                      type="checkbox"
+                      id="streaming"
+                      checked={streaming}
+                      onChange={(e) => setStreaming(e.target.checked)}
+                      className="w-4 h-4 rounded border-neutral-300 text-pink-600 focus:ring-pink-500 accent-pink-500 dark:accent-pink-600"
+                    />
+                    <label
+                      htmlFor="streaming"
+                      className="text-sm text-neutral-700 dark:text-neutral-200 select-none cursor-pointer"
+                    >
+                      Streaming (play while downloading)
+                    </label>
+                  </div>
+                )}
               </div>
             )}
           </div>
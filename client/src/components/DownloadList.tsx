@@ -1,15 +1,27 @@
 "use client";
 
-import { useState } from "react";
+import {
+  memo,
+  useCallback,
+  useEffect,
+  useRef,
+  useState,
+  type ReactNode,
+} from "react";
 import {
   pauseDownload,
   resumeDownload,
   cancelDownload,
+  clearCompleted,
   setSpeedLimit,
   renameDownload,
+  refreshIfChanged,
+  streamUrl,
+  DownloadTask,
 } from "@/contexts/api";
 import {
   formatBytes,
+  formatEta,
   cn,
   sliderToSpeed,
   speedToSlider,
@@ -30,6 +42,8 @@ import {
   RefreshCw,
   Pencil,
   Check,
+  MonitorPlay,
+  Trash2,
 } from "lucide-react";
 import ConfirmDeleteModal from "./ConfirmDeleteModal";
 import RefreshLinkModal from "./RefreshLinkModal";
@@ -77,68 +91,61 @@ function formatCompletionTime(timestamp: number) {
   })}, ${timeStr}`;
 }
 
-export default function DownloadList() {
-  const { tasks, refreshTasks } = useDownloads();
-  const [deleteModal, setDeleteModal] = useState<{
-    isOpen: boolean;
-    taskId: string;
-    filename: string;
-    isCompleted: boolean;
-  }>({
-    isOpen: false,
-    taskId: "",
-    filename: "",
-    isCompleted: false,
-  });
-  const [limitModal, setLimitModal] = useState<{
-    isOpen: boolean;
-    taskId: string;
-    currentLimit: number;
-  }>({
-    isOpen: false,
-    taskId: "",
-    currentLimit: 0,
-  });
-  const [refreshModal, setRefreshModal] = useState<{
-    isOpen: boolean;
-    taskId: string;
-    currentUrl: string;
-  }>({
-    isOpen: false,
-    taskId: "",
-    currentUrl: "",
-  });
-  const [activeTab, setActiveTab] = useState<"active" | "completed">("active");
-  const [editingTaskId, setEditingTaskId] = useState<string | null>(null);
+// Fixed slot height per row (card + gap). Rows are absolutely positioned in a
+// scroll container, so only the rows in view (plus overscan) are mounted.
+const ROW_HEIGHT = 168;
+const ROW_GAP = 16;
+const OVERSCAN = 5;
+// Rows are fetched from the server in pages around the visible range
+const PAGE_SIZE = 50;
+
+interface DownloadRowProps {
+  task: DownloadTask;
+  top: number;
+  onOpenLimit: (task: DownloadTask) => void;
+  onOpenRefresh: (task: DownloadTask) => void;
+  onOpenDelete: (task: DownloadTask) => void;
+  onNotify: (message: string, type: SnackbarType) => void;
+  onChanged: () => Promise<void>;
+}
+
+// Memoized: the download context keeps the same task object while nothing
+// about it changed, so polling only re-renders rows that actually changed.
+const DownloadRow = memo(function DownloadRow({
+  task,
+  top,
+  onOpenLimit,
+  onOpenRefresh,
+  onOpenDelete,
+  onNotify,
+  onChanged,
+}: DownloadRowProps) {
+  const [editing, setEditing] = useState(false);
   const [editName, setEditName] = useState("");
-  const [snackbar, setSnackbar] = useState<{
-    isOpen: boolean;
-    message: string;
-    type: SnackbarType;
-  }>({
-    isOpen: false,
-    message: "",
-    type: "info",
-  });
+  const style = { top, height: ROW_HEIGHT - ROW_GAP };
 
-  const startEditing = (task: any) => {
-    setEditingTaskId(task.id);
+  const startEditing = () => {
+    setEditing(true);
     setEditName(task.filename);
   };
 
-  const handleRename = async (taskId: string) => {
+  const cancelEditing = () => {
+    setEditing(false);
+    setEditName("");
+  };
+
+  const handleRename = async () => {
     if (!editName.trim()) return;
     try {
-      await renameDownload(taskId, editName.trim());
-      await refreshTasks();
-      setEditingTaskId(null);
-      setEditName("");
+      await renameDownload(task.id, editName.trim());
+      await onChanged();
+      cancelEditing();
     } catch (e: any) {
       alert(e.message || "Failed to rename");
     }
   };
 
-  const renderActionButtons = (task: any, isMobile = false) => {
+  const renderActionButtons = (isMobile = false) => {
     const btnClass = cn(
       "rounded-full text-neutral-600 dark:text-neutral-400 hover:bg-neutral-100 dark:hover:bg-neutral-800",
       isMobile ? "p-1.5" : "p-2"
@@ -149,13 +156,7 @@ export default function DownloadList() {
       <>
         {task.status === "downloading" && (
           <button
-            onClick={() =>
-              setLimitModal({
-                isOpen: true,
-                taskId: task.id,
-                currentLimit: task.speed_limit || 0,
-              })
-            }
+            onClick={() => onOpenLimit(task)}
             className={btnClass}
             title="Set Speed Limit"
           >
@@ -166,7 +167,7 @@ export default function DownloadList() {
           <button
             onClick={async () => {
               await pauseDownload(task.id);
-              await refreshTasks();
+              await onChanged();
             }}
             className={btnClass}
           >
@@ -176,7 +177,7 @@ export default function DownloadList() {
           <button
             onClick={async () => {
               await resumeDownload(task.id);
-              await refreshTasks();
+              await onChanged();
             }}
             className={btnClass}
           >
@@ -184,15 +185,24 @@ export default function DownloadList() {
           </button>
         ) : null}
 
+        {task.streaming &&
+          task.status !== "completed" &&
+          task.status !== "error" &&
+          task.total_size > 0 && (
+            <a
+              href={streamUrl(task.id)}
+              target="_blank"
+              rel="noreferrer"
+              className={btnClass}
+              title="Play while downloading"
+            >
+              <MonitorPlay size={iconSize} />
+            </a>
+          )}
+
         {(task.status === "paused" || task.status === "error") && (
           <button
-            onClick={() =>
-              setRefreshModal({
-                isOpen: true,
-                taskId: task.id,
-                currentUrl: task.url,
-              })
-            }
+            onClick={() => onOpenRefresh(task)}
             className={btnClass}
             title="Refresh Link"
           >
@@ -200,15 +210,31 @@ export default function DownloadList() {
           </button>
         )}
 
+        {task.status === "completed" && (
+          <button
+            onClick={async () => {
+              try {
+                const changed = await refreshIfChanged(task.id);
+                onNotify(
+                  changed
+                    ? "File changed on the server, downloading it again"
+                    : "File is up to date",
+                  "success"
+                );
+                await onChanged();
+              } catch (e: any) {
+                onNotify(e.message || "Failed to check for changes", "error");
+              }
+            }}
+            className={btnClass}
+            title="Re-download if changed"
+          >
+            <RefreshCw size={iconSize} />
+          </button>
+        )}
+
         <button
-          onClick={() =>
-            setDeleteModal({
-              isOpen: true,
-              taskId: task.id,
-              filename: task.filename,
-              isCompleted: task.status === "completed",
-            })
-          }
+          onClick={() => onOpenDelete(task)}
           className={cn(
             "rounded-full text-red-600 dark:text-red-400 hover:bg-red-50 dark:hover:bg-red-900/20",
             isMobile ? "px-1.5" : "p-2"
@@ -220,26 +246,348 @@ export default function DownloadList() {
     );
   };
 
-  const filteredTasks = tasks
-    .filter((t) => {
-      if (activeTab === "active") return t.status !== "completed";
-      return t.status === "completed";
-    })
-    .sort((a, b) => {
-      if (activeTab === "completed") {
-        // Sort by completion time (newest first)
-        // If completed_at is missing (old tasks), treat as 0 (oldest)
-        return (b.completed_at || 0) - (a.completed_at || 0);
-      }
-      // For active tasks, keep default order (or maybe creation time if we had it)
-      return 0;
+  return (
+    <div
+      style={style}
+      className="absolute left-0 right-0 overflow-y-auto bg-white dark:bg-neutral-900 border border-neutral-200 dark:border-neutral-800 rounded-lg p-3 md:p-4 shadow-sm"
+    >
+      <div className="flex items-center justify-between mb-2">
+        <div className={cn("flex items-center gap-3 min-w-0 flex-1 mr-4")}>
+          <div
+            className={cn(
+              "p-2 bg-pink-100 dark:bg-pink-900/20 rounded-lg text-pink-500 dark:text-pink-400 shrink-0"
+            )}
+          >
+            {getFileIcon(task.filename)}
+          </div>
+          <div className="min-w-0 flex-1">
+            {editing ? (
+              <div className="flex items-center gap-2">
+                <input
+                  type="text"
+                  value={editName}
+                  onChange={(e) => setEditName(e.target.value)}
+                  className="text-sm px-1 py-0.5 w-full md:max-w-[400px] border-b dark:bg-transparent focus:outline-none"
+                  autoFocus
+                  onKeyDown={(e) => {
+                    if (e.key === "Enter") handleRename();
+                    if (e.key === "Escape") {
+                      cancelEditing();
+                    }
+                  }}
+                />
+                <button
+                  onClick={() => handleRename()}
+                  className="text-green-600 hover:text-green-700"
+                  title="Save"
+                >
+                  <Check size={16} />
+                </button>
+                <button
+                  onClick={() => {
+                    cancelEditing();
+                  }}
+                  className="text-red-600 hover:text-red-700"
+                  title="Cancel"
+                >
+                  <X size={16} />
+                </button>
+              </div>
+            ) : (
+              <div className="flex items-center gap-2 group/title">
+                <h3
+                  className="font-medium text-sm truncate cursor-pointer hover:text-pink-600 transition-colors"
+                  title={task.filename}
+                  onClick={() => startEditing()}
+                >
+                  {task.filename}
+                </h3>
+                <button
+                  onClick={() => startEditing()}
+                  className="opacity-0 group-hover/title:opacity-100 text-neutral-400 hover:text-pink-500 transition-opacity"
+                  title="Rename"
+                >
+                  <Pencil size={12} />
+                </button>
+              </div>
+            )}
+            <p
+              className="text-xs text-neutral-500 dark:text-neutral-400 truncate cursor-pointer hover:text-neutral-700 dark:hover:text-neutral-200"
+              title={`${task.url} (Click to copy)`}
+              onClick={() => {
+                navigator.clipboard.writeText(task.url);
+                onNotify("Link copied to clipboard", "success");
+              }}
+            >
+              {task.url}
+            </p>
+          </div>
+        </div>
+        <div className="hidden md:flex items-center gap-2 shrink-0">
+          {renderActionButtons()}
+        </div>
+      </div>
+
+      <div>
+        <div className="flex justify-between text-xs text-neutral-500 dark:text-neutral-400">
+          <span>
+            {formatBytes(task.downloaded_size)} of{" "}
+            {task.total_size > 0 ? formatBytes(task.total_size) : "Unknown"}
+          </span>
+          <span>
+            {task.status === "extracting"
+              ? "Extracting..."
+              : task.status === "merging"
+              ? `Merging... ${formatBytes(task.merged_size || 0)}`
+              : task.status === "downloading" && task.eta
+              ? `${formatBytes(task.speed)}/s · ${formatEta(task.eta)} left`
+              : `${formatBytes(task.speed)}/s`}
+          </span>
+        </div>
+        <div className="h-2 mt-1 bg-neutral-100 dark:bg-neutral-800 rounded-full overflow-hidden">
+          <div
+            className={cn(
+              "h-full transition-all duration-300",
+              task.status === "error" ? "bg-red-500" : "bg-pink-500",
+              (task.total_size === 0 && task.status === "downloading") ||
+                task.status === "extracting"
+                ? "animate-pulse w-full bg-pink-400/50"
+                : ""
+            )}
+            style={{
+              width:
+                task.status === "merging" && task.total_size > 0
+                  ? `${((task.merged_size || 0) / task.total_size) * 100}%`
+                  : task.total_size > 0 && task.status !== "extracting"
+                  ? `${task.progress}%`
+                  : "100%",
+            }}
+          />
+        </div>
+        <div className="flex flex-col md:flex-row md:items-center justify-between text-xs mt-4 md:mt-2 gap-2 md:gap-0">
+          <span
+            className={cn(
+              "capitalize font-medium flex items-center gap-1",
+              task.status === "downloading"
+                ? "text-pink-600"
+                : task.status === "completed"
+                ? "text-green-600"
+                : task.status === "error"
+                ? "text-red-600"
+                : task.status === "extracting" || task.status === "merging"
+                ? "text-amber-600"
+                : "text-neutral-500"
+            )}
+          >
+            {(task.status === "extracting" || task.status === "merging") && (
+              <Loader2 size={12} className="animate-spin" />
+            )}
+            {task.status === "completed" && task.completed_at
+              ? `Completed ${formatCompletionTime(task.completed_at)}`
+              : task.status === "queued" && task.wait_reason
+              ? `Queued (${task.wait_reason})`
+              : task.status}
+          </span>
+          <div className="flex items-center gap-2 w-full md:w-auto justify-between md:justify-start">
+            <div className="flex md:hidden items-center gap-1">
+              {renderActionButtons(true)}
+            </div>
+            <div className="flex gap-2">
+              {task.auto_extract && (
+                <span
+                  className={cn(
+                    "text-[10px] md:text-[11px] px-1.5 py-0.5 rounded-full font-medium border",
+                    task.status === "completed"
+                      ? task.extraction_skipped
+                        ? "bg-amber-50 text-amber-700 border-amber-200 dark:bg-amber-900/20 dark:text-amber-400 dark:border-amber-800"
+                        : "bg-green-50 text-green-700 border-green-200 dark:bg-green-900/20 dark:text-green-400 dark:border-green-800"
+                      : "bg-pink-50 text-pink-700 border-pink-200 dark:bg-pink-900/20 dark:text-pink-400 dark:border-pink-800"
+                  )}
+                >
+                  {task.status === "completed"
+                    ? task.extraction_skipped
+                      ? "Extraction Skipped"
+                      : "Auto Extracted"
+                    : "Auto Extract On"}
+                </span>
+              )}
+              {(task.status === "downloading" ||
+                task.status === "paused") && (
+                <span
+                  className={cn(
+                    "text-[10px] md:text-[11px] px-1.5 py-0.5 rounded-full font-medium border",
+                    task.supports_resume
+                      ? "bg-green-100 text-green-600 border-green-200 dark:bg-green-950 dark:text-green-400 dark:border-green-800"
+                      : "bg-red-50 text-red-600 border-red-200 dark:bg-red-900/20 dark:text-red-400 dark:border-red-800"
+                  )}
+                >
+                  {task.supports_resume ? "Resumable" : "Non-Resumable"}
+                </span>
+              )}
+            </div>
+          </div>
+        </div>
+        {task.status === "error" && task.error_message && (
+          <details className="mt-2 text-xs text-red-600 dark:text-red-400">
+            <summary className="cursor-pointer hover:underline font-medium">
+              Show Error Log
+            </summary>
+            <pre className="mt-1 p-2 max-h-24 overflow-y-auto bg-red-50 dark:bg-red-900/20 rounded border border-red-100 dark:border-red-800 overflow-x-auto whitespace-pre-wrap">
+              {task.error_message}
+            </pre>
+          </details>
+        )}
+      </div>
+    </div>
+  );
+});
+
+export default function DownloadList() {
+  const { tasks, offset, total, counts, view, setView, refreshTasks } =
+    useDownloads();
+  const [deleteModal, setDeleteModal] = useState<{
+    isOpen: boolean;
+    taskId: string;
+    filename: string;
+    isCompleted: boolean;
+    clearAll?: boolean; // "Clear completed" instead of a single task
+  }>({
+    isOpen: false,
+    taskId: "",
+    filename: "",
+    isCompleted: false,
+  });
+  const [limitModal, setLimitModal] = useState<{
+    isOpen: boolean;
+    taskId: string;
+    currentLimit: number;
+  }>({
+    isOpen: false,
+    taskId: "",
+    currentLimit: 0,
+  });
+  const [refreshModal, setRefreshModal] = useState<{
+    isOpen: boolean;
+    taskId: string;
+    currentUrl: string;
+  }>({
+    isOpen: false,
+    taskId: "",
+    currentUrl: "",
+  });
+  const activeTab = view.tab;
+  const [snackbar, setSnackbar] = useState<{
+    isOpen: boolean;
+    message: string;
+    type: SnackbarType;
+  }>({
+    isOpen: false,
+    message: "",
+    type: "info",
+  });
+
+  const scrollRef = useRef<HTMLDivElement>(null);
+  const [scrollTop, setScrollTop] = useState(0);
+  const [viewportHeight, setViewportHeight] = useState(800);
+
+  useEffect(() => {
+    const el = scrollRef.current;
+    if (!el) return;
+    const observer = new ResizeObserver(() =>
+      setViewportHeight(el.clientHeight)
+    );
+    observer.observe(el);
+    return () => observer.disconnect();
+  }, []);
+
+  // Coalesce scroll events to one state update per frame
+  const frame = useRef<number | null>(null);
+  const handleScroll = () => {
+    if (frame.current !== null) return;
+    frame.current = requestAnimationFrame(() => {
+      frame.current = null;
+      if (scrollRef.current) setScrollTop(scrollRef.current.scrollTop);
+    });
+  };
+
+  const firstVisible = Math.max(
+    Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN,
+    0
+  );
+  const lastVisible = Math.min(
+    Math.ceil((scrollTop + viewportHeight) / ROW_HEIGHT) + OVERSCAN,
+    total
+  );
+
+  // Ask the server for the pages covering the visible range
+  useEffect(() => {
+    const pageOffset = Math.floor(firstVisible / PAGE_SIZE) * PAGE_SIZE;
+    const limit =
+      Math.ceil((lastVisible - pageOffset) / PAGE_SIZE) * PAGE_SIZE ||
+      PAGE_SIZE;
+    setView({ tab: activeTab, offset: pageOffset, limit });
+  }, [activeTab, firstVisible, lastVisible, setView]);
+
+  const switchTab = (tab: "active" | "completed") => {
+    if (scrollRef.current) scrollRef.current.scrollTop = 0;
+    setScrollTop(0);
+    setView({ tab, offset: 0, limit: PAGE_SIZE });
+  };
+
+  const openLimit = useCallback((task: DownloadTask) => {
+    setLimitModal({
+      isOpen: true,
+      taskId: task.id,
+      currentLimit: task.speed_limit || 0,
+    });
+  }, []);
+
+  const openRefresh = useCallback((task: DownloadTask) => {
+    setRefreshModal({
+      isOpen: true,
+      taskId: task.id,
+      currentUrl: task.url,
+    });
+  }, []);
+
+  const openDelete = useCallback((task: DownloadTask) => {
+    setDeleteModal({
+      isOpen: true,
+      taskId: task.id,
+      filename: task.filename,
+      isCompleted: task.status === "completed",
     });
+  }, []);
+
+  const notify = useCallback((message: string, type: SnackbarType) => {
+    setSnackbar({ isOpen: true, message, type });
+  }, []);
+
+  // Only rows that are both visible and part of the loaded page get mounted
+  const visibleRows: ReactNode[] = [];
+  const from = Math.max(firstVisible, offset);
+  const to = Math.min(lastVisible, offset + tasks.length);
+  for (let index = from; index < to; index++) {
+    const task = tasks[index - offset];
+    visibleRows.push(
+      <DownloadRow
+        key={task.id}
+        task={task}
+        top={index * ROW_HEIGHT}
+        onOpenLimit={openLimit}
+        onOpenRefresh={openRefresh}
+        onOpenDelete={openDelete}
+        onNotify={notify}
+        onChanged={refreshTasks}
+      />
+    );
+  }
 
   return (
     <div className="w-full space-y-4">
       <div className="flex gap-2 border-b border-neutral-200 dark:border-neutral-800 mb-4">
         <button
-          onClick={() => setActiveTab("active")}
+          onClick={() => switchTab("active")}
           className={cn(
             "px-4 py-2 text-sm font-medium border-b-2 transition-colors",
             activeTab === "active"
@@ -247,10 +595,10 @@ export default function DownloadList() {
               : "border-transparent text-neutral-500 hover:text-neutral-700 dark:text-neutral-400 dark:hover:text-neutral-200"
           )}
         >
-          Downloading ({tasks.filter((t) => t.status !== "completed").length})
+          Downloading ({counts.active})
         </button>
         <button
-          onClick={() => setActiveTab("completed")}
+          onClick={() => switchTab("completed")}
           className={cn(
             "px-4 py-2 text-sm font-medium border-b-2 transition-colors",
             activeTab === "completed"
@@ -258,203 +606,37 @@ export default function DownloadList() {
               : "border-transparent text-neutral-500 hover:text-neutral-700 dark:text-neutral-400 dark:hover:text-neutral-200"
           )}
         >
-          Completed ({tasks.filter((t) => t.status === "completed").length})
+          Completed ({counts.completed})
         </button>
+        {activeTab === "completed" && counts.completed > 0 && (
+          <button
+            onClick={() =>
+              setDeleteModal({
+                isOpen: true,
+                taskId: "",
+                filename: "all completed downloads",
+                isCompleted: true,
+                clearAll: true,
+              })
+            }
+            className="ml-auto px-3 py-2 text-sm font-medium text-neutral-500 hover:text-red-600 dark:text-neutral-400 dark:hover:text-red-500 flex items-center gap-1.5 transition-colors"
+          >
+            <Trash2 size={16} />
+            Clear completed
+          </button>
+        )}
       </div>
 
-      {filteredTasks.map((task) => (
-        <div
-          key={task.id}
-          className="bg-white dark:bg-neutral-900 border border-neutral-200 dark:border-neutral-800 rounded-lg p-3 md:p-4 shadow-sm"
-        >
-          <div className="flex items-center justify-between mb-2">
-            <div className={cn("flex items-center gap-3 min-w-0 flex-1 mr-4")}>
-              <div
-                className={cn(
-                  "p-2 bg-pink-100 dark:bg-pink-900/20 rounded-lg text-pink-500 dark:text-pink-400 shrink-0"
-                )}
-              >
-                {getFileIcon(task.filename)}
-              </div>
-              <div className="min-w-0 flex-1">
-                {editingTaskId === task.id ? (
-                  <div className="flex items-center gap-2">
-                    <input
-                      type="text"
-                      value={editName}
-                      onChange={(e) => setEditName(e.target.value)}
-                      className="text-sm px-1 py-0.5 w-full md:max-w-[400px] border-b dark:bg-transparent focus:outline-none"
-                      autoFocus
-                      onKeyDown={(e) => {
-                        if (e.key === "Enter") handleRename(task.id);
-                        if (e.key === "Escape") {
-                          setEditingTaskId(null);
-                          setEditName("");
-                        }
-                      }}
-                    />
-                    <button
-                      onClick={() => handleRename(task.id)}
-                      className="text-green-600 hover:text-green-700"
-                      title="Save"
-                    >
-                      <Check size={16} />
-                    </button>
-                    <button
-                      onClick={() => {
-                        setEditingTaskId(null);
-                        setEditName("");
-                      }}
-                      className="text-red-600 hover:text-red-700"
-                      title="Cancel"
-                    >
-                      <X size={16} />
-                    </button>
-                  </div>
-                ) : (
-                  <div className="flex items-center gap-2 group/title">
-                    <h3
-                      className="font-medium text-sm truncate cursor-pointer hover:text-pink-600 transition-colors"
-                      title={task.filename}
-                      onClick={() => startEditing(task)}
-                    >
-                      {task.filename}
-                    </h3>
-                    <button
-                      onClick={() => startEditing(task)}
-                      className="opacity-0 group-hover/title:opacity-100 text-neutral-400 hover:text-pink-500 transition-opacity"
-                      title="Rename"
-                    >
-                      <Pencil size={12} />
-                    </button>
-                  </div>
-                )}
-                <p
-                  className="text-xs text-neutral-500 dark:text-neutral-400 truncate cursor-pointer hover:text-neutral-700 dark:hover:text-neutral-200"
-                  title={`${task.url} (Click to copy)`}
-                  onClick={() => {
-                    navigator.clipboard.writeText(task.url);
-                    setSnackbar({
-                      isOpen: true,
-                      message: "Link copied to clipboard",
-                      type: "success",
-                    });
-                  }}
-                >
-                  {task.url}
-                </p>
-              </div>
-            </div>
-            <div className="hidden md:flex items-center gap-2 shrink-0">
-              {renderActionButtons(task)}
-            </div>
-          </div>
-
-          <div>
-            <div className="flex justify-between text-xs text-neutral-500 dark:text-neutral-400">
-              <span>
-                {formatBytes(task.downloaded_size)} of{" "}
-                {task.total_size > 0 ? formatBytes(task.total_size) : "Unknown"}
-              </span>
-              <span>
-                {task.status === "extracting"
-                  ? "Extracting..."
-                  : `${formatBytes(task.speed)}/s`}
-              </span>
-            </div>
-            <div className="h-2 mt-1 bg-neutral-100 dark:bg-neutral-800 rounded-full overflow-hidden">
-              <div
-                className={cn(
-                  "h-full transition-all duration-300",
-                  task.status === "error" ? "bg-red-500" : "bg-pink-500",
-                  (task.total_size === 0 && task.status === "downloading") ||
-                    task.status === "extracting"
-                    ? "animate-pulse w-full bg-pink-400/50"
-                    : ""
-                )}
-                style={{
-                  width:
-                    task.total_size > 0 && task.status !== "extracting"
-                      ? `${task.progress}%`
-                      : "100%",
-                }}
-              />
-            </div>
-            <div className="flex flex-col md:flex-row md:items-center justify-between text-xs mt-4 md:mt-2 gap-2 md:gap-0">
-              <span
-                className={cn(
-                  "capitalize font-medium flex items-center gap-1",
-                  task.status === "downloading"
-                    ? "text-pink-600"
-                    : task.status === "completed"
-                    ? "text-green-600"
-                    : task.status === "error"
-                    ? "text-red-600"
-                    : task.status === "extracting"
-                    ? "text-amber-600"
-                    : "text-neutral-500"
-                )}
-              >
-                {task.status === "extracting" && (
-                  <Loader2 size={12} className="animate-spin" />
-                )}
-                {task.status === "completed" && task.completed_at
-                  ? `Completed ${formatCompletionTime(task.completed_at)}`
-                  : task.status}
-              </span>
-              <div className="flex items-center gap-2 w-full md:w-auto justify-between md:justify-start">
-                <div className="flex md:hidden items-center gap-1">
-                  {renderActionButtons(task, true)}
-                </div>
-                <div className="flex gap-2">
-                  {task.auto_extract && (
-                    <span
-                      className={cn(
-                        "text-[10px] md:text-[11px] px-1.5 py-0.5 rounded-full font-medium border",
-                        task.status === "completed"
-                          ? task.extraction_skipped
-                            ? "bg-amber-50 text-amber-700 border-amber-200 dark:bg-amber-900/20 dark:text-amber-400 dark:border-amber-800"
-                            : "bg-green-50 text-green-700 border-green-200 dark:bg-green-900/20 dark:text-green-400 dark:border-green-800"
-                          : "bg-pink-50 text-pink-700 border-pink-200 dark:bg-pink-900/20 dark:text-pink-400 dark:border-pink-800"
-                      )}
-                    >
-                      {task.status === "completed"
-                        ? task.extraction_skipped
-                          ? "Extraction Skipped"
-                          : "Auto Extracted"
-                        : "Auto Extract On"}
-                    </span>
-                  )}
-                  {(task.status === "downloading" ||
-                    task.status === "paused") && (
-                    <span
-                      className={cn(
-                        "text-[10px] md:text-[11px] px-1.5 py-0.5 rounded-full font-medium border",
-                        task.supports_resume
-                          ? "bg-green-100 text-green-600 border-green-200 dark:bg-green-950 dark:text-green-400 dark:border-green-800"
-                          : "bg-red-50 text-red-600 border-red-200 dark:bg-red-900/20 dark:text-red-400 dark:border-red-800"
-                      )}
-                    >
-                      {task.supports_resume ? "Resumable" : "Non-Resumable"}
-                    </span>
-                  )}
-                </div>
-              </div>
-            </div>
-            {task.status === "error" && task.error_message && (
-              <details className="mt-2 text-xs text-red-600 dark:text-red-400">
-                <summary className="cursor-pointer hover:underline font-medium">
-                  Show Error Log
-                </summary>
-                <pre className="mt-1 p-2 bg-red-50 dark:bg-red-900/20 rounded border border-red-100 dark:border-red-800 overflow-x-auto whitespace-pre-wrap">
-                  {task.error_message}
-                </pre>
-              </details>
-            )}
-          </div>
+      <div
+        ref={scrollRef}
+        onScroll={handleScroll}
+        className="max-h-[calc(100vh-16rem)] overflow-y-auto"
+      >
+        <div className="relative" style={{ height: total * ROW_HEIGHT }}>
+          {visibleRows}
         </div>
-      ))}
-      {filteredTasks.length === 0 && (
+      </div>
+      {total === 0 && (
         <div className="text-center py-12 text-neutral-500 dark:text-neutral-400">
           {activeTab === "active"
             ? "No active downloads."
@@ -468,7 +650,11 @@ export default function DownloadList() {
         filename={deleteModal.filename}
         isCompleted={deleteModal.isCompleted}
         onConfirm={async (deleteFile) => {
-          await cancelDownload(deleteModal.taskId, deleteFile);
+          if (deleteModal.clearAll) {
+            await clearCompleted(deleteFile);
+          } else {
+            await cancelDownload(deleteModal.taskId, deleteFile);
+          }
           await refreshTasks();
           setDeleteModal({ ...deleteModal, isOpen: false });
         }}
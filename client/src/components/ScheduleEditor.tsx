@@ -0,0 +1,192 @@
+import { Clock, Plus, Trash2 } from "lucide-react";
+import { ScheduleWindow } from "@/contexts/api";
+import { cn } from "@/contexts/utils";
+
+const DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"];
+
+const inputClass =
+  "w-full px-3 py-2 rounded-lg border border-neutral-200 dark:border-neutral-700 bg-neutral-50 dark:bg-neutral-800 focus:outline-none focus:ring-2 focus:ring-pink-500";
+
+const newWindow = (): ScheduleWindow => ({
+  name: "Business hours",
+  days: [0, 1, 2, 3, 4],
+  start: "09:00",
+  end: "18:00",
+  max_speed_kbps: 0,
+  max_concurrent_downloads: null,
+  paused_classes: [],
+});
+
+interface ScheduleEditorProps {
+  windows: ScheduleWindow[];
+  onChange: (windows: ScheduleWindow[]) => void;
+}
+
+export function ScheduleEditor({ windows, onChange }: ScheduleEditorProps) {
+  const update = (index: number, changes: Partial<ScheduleWindow>) => {
+    onChange(windows.map((w, i) => (i === index ? { ...w, ...changes } : w)));
+  };
+
+  const toggleDay = (index: number, day: number) => {
+    const days = windows[index].days;
+    update(index, {
+      days: days.includes(day)
+        ? days.filter((d) => d !== day)
+        : [...days, day].sort(),
+    });
+  };
+
+  return (
+    <div className="bg-white dark:bg-neutral-900 p-6 rounded-xl border border-neutral-200 dark:border-neutral-800 shadow-sm">
+      <div className="flex items-center justify-between mb-4">
+        <h2 className="text-lg font-semibold flex items-center gap-2">
+          <Clock size={20} />
+          Schedule
+        </h2>
+        <button
+          type="button"
+          onClick={() => onChange([...windows, newWindow()])}
+          className="text-sm text-pink-600 dark:text-pink-400 hover:underline flex items-center gap-1"
+        >
+          <Plus size={14} />
+          Add window
+        </button>
+      </div>
+      <p className="text-sm text-neutral-500 mb-4">
+        While a window is active it caps total bandwidth, limits concurrent
+        downloads and holds back the listed queue classes. Overlapping windows
+        combine, the strictest limit wins.
+      </p>
+
+      {windows.length === 0 && (
+        <p className="text-sm text-neutral-500">No schedule windows.</p>
+      )}
+
+      <div className="space-y-4">
+        {windows.map((window, index) => (
+          <div
+            key={index}
+            className="p-4 rounded-lg border border-neutral-200 dark:border-neutral-700 space-y-3"
+          >
+            <div className="flex items-center gap-2">
+              <input
+                type="text"
+                value={window.name}
+                placeholder="Name"
+                onChange={(e) => update(index, { name: e.target.value })}
+                className={inputClass}
+              />
+              <button
+                type="button"
+                onClick={() => onChange(windows.filter((_, i) => i !== index))}
+                className="p-2 rounded-full text-red-600 dark:text-red-400 hover:bg-red-50 dark:hover:bg-red-900/20"
+                title="Remove window"
+              >
+                <Trash2 size={16} />
+              </button>
+            </div>
+
+            <div className="flex flex-wrap gap-1">
+              {DAYS.map((label, day) => (
+                <button
+                  type="button"
+                  key={label}
+                  onClick={() => toggleDay(index, day)}
+                  className={cn(
+                    "text-xs px-2 py-1 rounded-full border",
+                    window.days.includes(day)
+                      ? "bg-pink-500 text-white border-pink-500"
+                      : "border-neutral-200 dark:border-neutral-700 text-neutral-500"
+                  )}
+                >
+                  {label}
+                </button>
+              ))}
+            </div>
+
+            <div className="grid grid-cols-2 gap-3">
+              <div>
+                <label className="block text-xs font-medium mb-1 text-neutral-600 dark:text-neutral-300">
+                  From
+                </label>
+                <input
+                  type="time"
+                  value={window.start}
+                  onChange={(e) => update(index, { start: e.target.value })}
+                  className={inputClass}
+                />
+              </div>
+              <div>
+                <label className="block text-xs font-medium mb-1 text-neutral-600 dark:text-neutral-300">
+                  Until
+                </label>
+                <input
+                  type="time"
+                  value={window.end}
+                  onChange={(e) => update(index, { end: e.target.value })}
+                  className={inputClass}
+                />
+              </div>
+              <div>
+                <label className="block text-xs font-medium mb-1 text-neutral-600 dark:text-neutral-300">
+                  Bandwidth cap (KB/s, 0 = none)
+                </label>
+                <input
+                  type="number"
+                  min="0"
+                  value={window.max_speed_kbps}
+                  onChange={(e) =>
+                    update(index, {
+                      max_speed_kbps: parseInt(e.target.value) || 0,
+                    })
+                  }
+                  className={inputClass}
+                />
+              </div>
+              <div>
+                <label className="block text-xs font-medium mb-1 text-neutral-600 dark:text-neutral-300">
+                  Max concurrent downloads
+                </label>
+                <input
+                  type="number"
+                  min="0"
+                  value={window.max_concurrent_downloads ?? ""}
+                  placeholder="Unchanged"
+                  onChange={(e) =>
+                    update(index, {
+                      max_concurrent_downloads:
+                        e.target.value === ""
+                          ? null
+                          : parseInt(e.target.value),
+                    })
+                  }
+                  className={inputClass}
+                />
+              </div>
+            </div>
+
+            <div>
+              <label className="block text-xs font-medium mb-1 text-neutral-600 dark:text-neutral-300">
+                Paused queue classes (comma separated)
+              </label>
+              <input
+                type="text"
+                defaultValue={window.paused_classes.join(", ")}
+                placeholder="e.g. bulk"
+                onBlur={(e) =>
+                  update(index, {
+                    paused_classes: e.target.value
+                      .split(",")
+                      .map((c) => c.trim())
+                      .filter(Boolean),
+                  })
+                }
+                className={inputClass}
+              />
+            </div>
+          </div>
+        ))}
+      </div>
+    </div>
+  );
+}
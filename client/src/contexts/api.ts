@@ -4,21 +4,29 @@ export interface DownloadTask {
   filename: string;
   status:
     | "pending"
+    | "queued"
     | "downloading"
     | "paused"
     | "completed"
     | "error"
     | "canceled"
+    | "merging"
     | "extracting";
   progress: number;
   total_size: number;
   downloaded_size: number;
   speed: number;
+  eta?: number | null;
+  connection_speeds?: number[];
   speed_limit: number;
   auto_extract: boolean;
   extraction_skipped: boolean;
   supports_resume: boolean;
   error_message?: string;
+  wait_reason?: string;
+  queue_class?: string;
+  streaming?: boolean;
+  merged_size?: number;
   completed_at?: number;
 }
 
@@ -28,12 +36,34 @@ export async function fetchDownloads(): Promise<DownloadTask[]> {
   return res.json();
 }
 
+export type DownloadTab = "active" | "completed";
+
+export interface DownloadPage {
+  items: DownloadTask[];
+  total: number;
+  offset: number;
+  counts: { active: number; completed: number; running: number };
+}
+
+export async function fetchDownloadsPage(
+  tab: DownloadTab,
+  offset: number,
+  limit: number
+): Promise<DownloadPage> {
+  const res = await fetch(
+    `/api/downloads/page?tab=${tab}&offset=${offset}&limit=${limit}`
+  );
+  if (!res.ok) throw new Error("Failed to fetch downloads");
+  return res.json();
+}
+
 export async function addDownload(
   url: string,
   filename?: string,
   auto_extract: boolean = false,
   speed_limit: number = 0,
-  max_connections?: number
+  max_connections?: number,
+  streaming: boolean = false
 ) {
   const res = await fetch(`/api/downloads`, {
     method: "POST",
@@ -44,6 +74,7 @@ export async function addDownload(
       auto_extract,
       speed_limit,
       max_connections,
+      streaming,
     }),
   });
   if (!res.ok) throw new Error("Failed to add download");
@@ -79,6 +110,13 @@ export async function refreshDownloadLink(id: string, url: string) {
   });
 }
 
+export async function refreshIfChanged(id: string): Promise<boolean> {
+  const res = await fetch(`/api/downloads/${id}/refresh`, { method: "POST" });
+  const data = await res.json();
+  if (!res.ok) throw new Error(data.detail || "Failed to check for changes");
+  return data.changed;
+}
+
 export async function renameDownload(id: string, filename: string) {
   const res = await fetch(`/api/downloads/${id}/rename`, {
     method: "POST",
@@ -91,6 +129,10 @@ export async function renameDownload(id: string, filename: string) {
   }
 }
 
+export function streamUrl(id: string): string {
+  return `/api/downloads/${id}/stream`;
+}
+
 export async function resumeDownload(id: string) {
   await fetch(`/api/downloads/${id}/resume`, { method: "POST" });
 }
@@ -101,11 +143,42 @@ export async function cancelDownload(id: string, deleteFile: boolean = false) {
   });
 }
 
+// The server returns right away, files are removed in the background
+export async function deleteDownloads(ids: string[], deleteFile: boolean = false) {
+  const res = await fetch(`/api/downloads/delete`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ids, delete_file: deleteFile }),
+  });
+  if (!res.ok) throw new Error("Failed to delete downloads");
+  return res.json() as Promise<{ deleted: string[]; not_found: string[] }>;
+}
+
+export async function clearCompleted(deleteFile: boolean = false) {
+  const res = await fetch(
+    `/api/downloads/clear_completed?delete_file=${deleteFile}`,
+    { method: "POST" }
+  );
+  if (!res.ok) throw new Error("Failed to clear completed downloads");
+  return res.json() as Promise<{ deleted: string[] }>;
+}
+
 export interface Settings {
   download_dir: string;
   max_concurrent_downloads: number;
   max_connections_per_task: number;
   organize_files: boolean;
+  schedule?: ScheduleWindow[];
+}
+
+export interface ScheduleWindow {
+  name: string;
+  days: number[]; // 0 = Monday
+  start: string; // "HH:MM"
+  end: string;
+  max_speed_kbps: number;
+  max_concurrent_downloads: number | null;
+  paused_classes: string[];
 }
 
 export async function fetchSettings(): Promise<Settings> {
@@ -200,7 +273,9 @@ export async function cloneDriveFile(
   mimeType: string,
   autoExtract: boolean = false,
   speedLimit: number = 0,
-  maxConnections: number = 0
+  maxConnections: number = 0,
+  sync: boolean = false,
+  deleteRemoved: boolean = false
 ) {
   const res = await fetch(`/api/drive/clone`, {
     method: "POST",
@@ -214,6 +289,8 @@ export async function cloneDriveFile(
       auto_extract: autoExtract,
       speed_limit: speedLimit,
       max_connections: maxConnections > 0 ? maxConnections : undefined,
+      sync,
+      delete_removed: deleteRemoved,
     }),
   });
   if (!res.ok) {
@@ -1,10 +1,34 @@
 "use client";
 
-import React, { createContext, useContext, useState, useEffect } from "react";
-import { DownloadTask, fetchDownloads } from "@/contexts/api";
+import React, {
+  createContext,
+  useCallback,
+  useContext,
+  useEffect,
+  useRef,
+  useState,
+} from "react";
+import {
+  DownloadTask,
+  DownloadTab,
+  DownloadPage,
+  fetchDownloadsPage,
+} from "@/contexts/api";
+
+export interface DownloadView {
+  tab: DownloadTab;
+  offset: number;
+  limit: number;
+}
 
 interface DownloadContextType {
+  // Tasks of the current window; tasks[0] is at index `offset` of the tab
   tasks: DownloadTask[];
+  offset: number;
+  total: number;
+  counts: DownloadPage["counts"];
+  view: DownloadView;
+  setView: (view: DownloadView) => void;
   refreshTasks: () => Promise<void>;
 }
 
@@ -12,38 +36,119 @@ const DownloadContext = createContext<DownloadContextType | undefined>(
   undefined
 );
 
+function sameTask(a: DownloadTask, b: DownloadTask) {
+  const keys = Object.keys(b) as (keyof DownloadTask)[];
+  if (keys.length !== Object.keys(a).length) return false;
+  return keys.every((k) => sameValue(a[k], b[k]));
+}
+
+// Arrays and objects (connection_speeds, sync_stats...) are fresh on every
+// poll, so compare them by content.
+function sameValue(x: unknown, y: unknown) {
+  if (x === y) return true;
+  if (typeof x !== "object" || typeof y !== "object" || !x || !y) return false;
+  return JSON.stringify(x) === JSON.stringify(y);
+}
+
 export function DownloadProvider({ children }: { children: React.ReactNode }) {
-  const [tasks, setTasks] = useState<DownloadTask[]>([]);
+  const [view, setViewState] = useState<DownloadView>({
+    tab: "active",
+    offset: 0,
+    limit: 100,
+  });
+  const [page, setPage] = useState<DownloadPage>({
+    items: [],
+    total: 0,
+    offset: 0,
+    counts: { active: 0, completed: 0, running: 0 },
+  });
+
+  const viewRef = useRef(view);
+  // Last seen object per task id. Unchanged tasks keep their identity across
+  // polls so memoized rows don't re-render.
+  const knownTasks = useRef(new Map<string, DownloadTask>());
 
-  const refreshTasks = async () => {
+  const refreshTasks = useCallback(async () => {
+    const requested = viewRef.current;
     try {
-      const data = await fetchDownloads();
-      setTasks(data);
+      const data = await fetchDownloadsPage(
+        requested.tab,
+        requested.offset,
+        requested.limit
+      );
+      // Drop responses for a window we already scrolled away from
+      if (viewRef.current !== requested) return;
+
+      const known = knownTasks.current;
+      const next = new Map<string, DownloadTask>();
+      const items = data.items.map((t) => {
+        const prev = known.get(t.id);
+        const merged = prev && sameTask(prev, t) ? prev : t;
+        next.set(t.id, merged);
+        return merged;
+      });
+      knownTasks.current = next;
+
+      setPage((current) => {
+        const unchanged =
+          current.items.length === items.length &&
+          current.items.every((t, i) => t === items[i]) &&
+          current.total === data.total &&
+          current.offset === data.offset &&
+          current.counts.active === data.counts.active &&
+          current.counts.completed === data.counts.completed &&
+          current.counts.running === data.counts.running;
+        return unchanged ? current : { ...data, items };
+      });
     } catch (e) {
       console.error(e);
     }
-  };
+  }, []);
 
-  // Check if there are any active tasks
-  const hasActive = tasks.some((t) =>
-    ["downloading", "extracting", "queued", "pending"].includes(t.status)
+  const setView = useCallback(
+    (next: DownloadView) => {
+      const current = viewRef.current;
+      if (
+        current.tab === next.tab &&
+        current.offset === next.offset &&
+        current.limit === next.limit
+      )
+        return;
+      viewRef.current = next;
+      setViewState(next);
+      refreshTasks();
+    },
+    [refreshTasks]
   );
 
+  // Check if there are any active tasks
+  const hasActive = page.counts.running > 0;
+
   useEffect(() => {
     // Poll frequently (1s) if active, otherwise slowly (5s)
     const delay = hasActive ? 1000 : 5000;
 
     const interval = setInterval(refreshTasks, delay);
     return () => clearInterval(interval);
-  }, [hasActive]); // Only reset timer when activity state changes
+  }, [hasActive, refreshTasks]); // Only reset timer when activity state changes
 
   // Initial fetch on mount
   useEffect(() => {
     refreshTasks();
-  }, []);
+  }, [refreshTasks]);
 
   return (
-    <DownloadContext.Provider value={{ tasks, refreshTasks }}>
+    <DownloadContext.Provider
+      value={{
+        tasks: page.items,
+        offset: page.offset,
+        total: page.total,
+        counts: page.counts,
+        view,
+        setView,
+        refreshTasks,
+      }}
+    >
       {children}
     </DownloadContext.Provider>
   );
@@ -3,6 +3,7 @@ import { useState, useEffect } from "react";
 import { Settings, fetchSettings, updateSettings } from "@/contexts/api";
 import { Save, Folder, Github, Info, Heart, Cloud } from "lucide-react";
 import { DriveAuth } from "@/components/DriveAuth";
+import { ScheduleEditor } from "@/components/ScheduleEditor";
 import { Loading } from "@/components/Loading";
 
 // Import package.json version dynamically
@@ -157,6 +158,11 @@ export default function SettingsPage() {
             </div>
           </div>
 
+          <ScheduleEditor
+            windows={settings.schedule || []}
+            onChange={(schedule) => setSettings({ ...settings, schedule })}
+          />
+
           <div className="bg-white dark:bg-neutral-900 p-6 rounded-xl border border-neutral-200 dark:border-neutral-800 shadow-sm">
             <h2 className="text-lg font-semibold mb-4 flex items-center gap-2">
               <Cloud size={20} />
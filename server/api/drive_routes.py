@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
 import os
 import shutil
-from core.drive import drive_manager
+from core.drive import drive_manager, file_url, export_name, is_native, FOLDER_MIME
 from core.downloader import manager
 
 router = APIRouter()
@@ -16,6 +17,10 @@ class CloneRequest(BaseModel):
     auto_extract: bool = False
     speed_limit: int = 0
     max_connections: Optional[int] = None
+    # Folders only: keep a local mirror and only fetch what changed since the last sync
+    sync: bool = False
+    delete_removed: bool = False
+    queue_class: str = "default"
 
 class VerifyRequest(BaseModel):
     code: str
@@ -55,7 +60,8 @@ async def drive_status():
 @router.get("/drive/metadata")
 async def get_drive_metadata(file_id: str):
     try:
-        return drive_manager.get_file_metadata(file_id)
+        # A shortcut is shown as what it points to
+        return drive_manager.resolve(file_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -69,28 +75,51 @@ async def list_drive_files(folder_id: str = 'root', page_token: Optional[str] =
 @router.post("/drive/clone")
 async def clone_drive_file(request: CloneRequest, background_tasks: BackgroundTasks):
     try:
+        # A shortcut stands for its target, a file or a folder
+        loop = asyncio.get_running_loop()
+        target = await loop.run_in_executor(None, drive_manager.resolve, request.file_id)
+        file_id, mime_type = target["id"], target["mimeType"]
+
         # If it's a folder, we need recursive logic
-        if request.mime_type == 'application/vnd.google-apps.folder':
+        if mime_type == FOLDER_MIME and request.sync:
+             task_id = await manager.sync_drive_folder(
+                 file_id,
+                 request.name,
+                 delete_removed=request.delete_removed,
+                 auto_extract=request.auto_extract,
+                 speed_limit=request.speed_limit,
+                 max_connections=request.max_connections,
+                 queue_class=request.queue_class
+             )
+             return {"status": "syncing", "task_id": task_id}
+
+        if mime_type == FOLDER_MIME:
              task_id = await manager.add_drive_folder_task(
-                 request.file_id, 
+                 file_id, 
                  request.name,
                  auto_extract=request.auto_extract,
                  speed_limit=request.speed_limit,
-                 max_connections=request.max_connections
+                 max_connections=request.max_connections,
+                 queue_class=request.queue_class
              )
              return {"status": "started", "task_id": task_id}
         
-        # It's a file
-        headers = drive_manager.get_headers()
-        url = f"https://www.googleapis.com/drive/v3/files/{request.file_id}?alt=media"
+        # It's a file. The token is resolved per request by the task, so it
+        # keeps working after the current access token expires.
+        # Google Docs & co. are exported in the format from the settings.
+        url = file_url(file_id, mime_type)
+        if url is None:
+            raise Exception(f"Google files of type {mime_type} can't be exported")
         
         task_id = await manager.add_task(
             url=url,
-            filename=request.name,
-            headers=headers,
+            filename=export_name(request.name, mime_type),
+            export=is_native(mime_type),
+            auth="drive",
             auto_extract=request.auto_extract,
             speed_limit=request.speed_limit,
-            max_connections=request.max_connections
+            max_connections=request.max_connections,
+            queue_class=request.queue_class
         )
         return {"status": "started", "task_id": task_id}
 
@@ -1,9 +1,22 @@
-import os
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import asyncio
+import json
+import mimetypes
+from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File, Form, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Union
 from core.downloader import manager, TaskStatus
+from core.manifest import parse_import_file, make_entry, normalize_hash_type
 from core.settings import settings_manager, Settings
+from core.checkpoint import checkpoint_service
+from core.workers import worker_pool
+from core.dedup import content_index
+from core.scheduler import scheduler
+from core.names import name_index
+from core.hosts import host_profiles
+from core.events import event_bus
+from core.hooks import hook_runner
+from core.reaper import reaper
 
 router = APIRouter()
 
@@ -13,52 +26,134 @@ class DownloadRequest(BaseModel):
     auto_extract: bool = False
     speed_limit: int = 0 # kbps
     max_connections: Optional[int] = None
+    queue_class: str = "default"
+    streaming: bool = False # Prioritize from the start so it can be played while downloading
 
 class SpeedLimitRequest(BaseModel):
     limit: int # kbps
 
+class BulkDownloadItem(BaseModel):
+    # Same fields as a JSON manifest entry (see core/manifest.py)
+    url: str
+    filename: Optional[str] = None
+    mirrors: List[str] = []
+    size: int = 0
+    hash_type: Optional[str] = None
+    checksum: Optional[str] = None
+    piece_length: int = 0
+    piece_hashes: List[str] = []
+
+class BulkDownloadRequest(BaseModel):
+    urls: List[Union[str, BulkDownloadItem]]
+    auto_extract: bool = False
+    speed_limit: int = 0 # kbps
+    max_connections: Optional[int] = None
+    queue_class: str = "default"
+
 @router.post("/downloads")
 async def add_download(request: DownloadRequest):
-    task_id = await manager.add_task(request.url, request.filename, request.auto_extract, request.speed_limit, request.max_connections)
+    task_id = await manager.add_task(request.url, request.filename, request.auto_extract, request.speed_limit, request.max_connections, queue_class=request.queue_class, streaming=request.streaming)
     return {"id": task_id, "status": "started"}
 
+@router.post("/downloads/bulk")
+async def add_downloads_bulk(request: BulkDownloadRequest):
+    entries = []
+    for item in request.urls:
+        if isinstance(item, str):
+            entries.append(make_entry(item))
+        else:
+            fields = item.dict()
+            fields["hash_type"] = normalize_hash_type(fields["hash_type"])
+            entries.append(make_entry(**fields))
+    return await manager.add_tasks_bulk(entries, request.auto_extract, request.speed_limit, request.max_connections, request.queue_class)
+
+@router.post("/downloads/bulk/upload")
+async def upload_downloads_bulk(
+    file: UploadFile = File(...),
+    auto_extract: bool = Form(False),
+    speed_limit: int = Form(0),
+    max_connections: Optional[int] = Form(None),
+    queue_class: str = Form("default")
+):
+    # Accepts a plain text list (one URL per line), a Metalink 4 file or a JSON manifest
+    try:
+        entries = parse_import_file(file.filename, await file.read())
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse file: {e}")
+    return await manager.add_tasks_bulk(entries, auto_extract, speed_limit, max_connections, queue_class)
+
 @router.get("/downloads/check_file")
 async def check_file(filename: str):
-    settings = settings_manager.settings
-    filepath = os.path.join(settings.download_dir, filename)
-    exists = os.path.exists(filepath)
-    return {"exists": exists}
+    # Also covers the category folders and names reserved by queued tasks
+    return {"exists": name_index.is_taken(filename)}
+
+def serialize_task(t):
+    return {
+        "id": t.id,
+        "url": t.url,
+        "filename": t.filename,
+        "status": t.status,
+        "progress": (t.downloaded_size / t.total_size * 100) if t.total_size > 0 else 0,
+        "total_size": t.total_size,
+        "downloaded_size": t.downloaded_size,
+        "speed": t.speed,
+        "eta": getattr(t, 'eta', None),
+        "connection_speeds": getattr(t, 'connection_speeds', []),
+        "speed_limit": t.speed_limit,
+        "auto_extract": t.auto_extract,
+        "extraction_skipped": t.extraction_skipped,
+        "supports_resume": t.supports_resume,
+        "error_message": t.error_message,
+        "wait_reason": getattr(t, 'wait_reason', None),
+        "sync_stats": getattr(t, 'sync_stats', None),
+        "deduplicated_from": getattr(t, 'deduplicated_from', None),
+        "queue_class": getattr(t, 'queue_class', 'default'),
+        "streaming": getattr(t, 'streaming', False),
+        "merged_size": getattr(t, 'merged_size', 0),
+        "completed_at": getattr(t, 'completed_at', 0)
+    }
 
 @router.get("/downloads")
 async def list_downloads():
     tasks = manager.get_all_tasks()
-    return [
-        {
-            "id": t.id,
-            "url": t.url,
-            "filename": t.filename,
-            "status": t.status,
-            "progress": (t.downloaded_size / t.total_size * 100) if t.total_size > 0 else 0,
-            "total_size": t.total_size,
-            "downloaded_size": t.downloaded_size,
-            "speed": t.speed,
-            "speed_limit": t.speed_limit,
-            "auto_extract": t.auto_extract,
-            "extraction_skipped": t.extraction_skipped,
-            "supports_resume": t.supports_resume,
-            "supports_resume": t.supports_resume,
-            "error_message": t.error_message,
-            "completed_at": getattr(t, 'completed_at', 0)
-        }
-        for t in tasks
-    ]
+    return [serialize_task(t) for t in tasks]
+
+@router.get("/downloads/page")
+async def list_downloads_page(tab: str = "active", offset: int = 0, limit: int = 100):
+    # Paged listing for the UI, so large histories aren't serialized on every poll.
+    # Only the requested window is serialized; counts are cheap to compute.
+    if tab not in ("active", "completed"):
+        raise HTTPException(status_code=400, detail="tab must be 'active' or 'completed'")
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), 500)
+
+    active, completed = [], []
+    running = 0
+    for t in manager.get_all_tasks():
+        (completed if t.status == TaskStatus.COMPLETED else active).append(t)
+        if t.status in [TaskStatus.DOWNLOADING, TaskStatus.MERGING, TaskStatus.EXTRACTING, TaskStatus.QUEUED, TaskStatus.PENDING]:
+            running += 1
+
+    if tab == "completed":
+        # Newest first. Old tasks without completed_at sort last.
+        completed.sort(key=lambda t: getattr(t, 'completed_at', 0) or 0, reverse=True)
+        selected = completed
+    else:
+        selected = active
+
+    return {
+        "items": [serialize_task(t) for t in selected[offset:offset + limit]],
+        "total": len(selected),
+        "offset": offset,
+        "counts": {"active": len(active), "completed": len(completed), "running": running}
+    }
 
 @router.post("/downloads/{task_id}/pause")
 async def pause_download(task_id: str):
     task = manager.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    task.pause()
+    await manager.pause_task(task_id)
     return {"status": "paused"}
 
 @router.post("/downloads/{task_id}/resume")
@@ -71,27 +166,32 @@ async def resume_download(task_id: str):
 
 @router.delete("/downloads/{task_id}")
 async def delete_download(task_id: str, delete_file: bool = False):
-    if task_id in manager.tasks:
-        task = manager.tasks[task_id]
-        if task.status in [TaskStatus.DOWNLOADING, TaskStatus.PAUSED, TaskStatus.PENDING, TaskStatus.QUEUED]:
-            await task.cancel()
-            # Wait for the task to actually stop to ensure file handles are closed
-            if task.task_runner and not task.task_runner.done():
-                try:
-                    await task.task_runner
-                except:
-                    pass
-            
-            # If task was incomplete, force delete files (parts)
-            delete_file = True
-        
-        if delete_file:
-            task.delete_files()
-            
-        del manager.tasks[task_id]
+    # Returns right away, stopping the task and removing files happens in the background
+    if manager.remove_task(task_id, delete_file):
         return {"status": "deleted"}
     raise HTTPException(status_code=404, detail="Task not found")
 
+class BulkDeleteRequest(BaseModel):
+    ids: List[str]
+    delete_file: bool = False
+
+@router.post("/downloads/delete")
+async def delete_downloads(request: BulkDeleteRequest):
+    return manager.remove_tasks(request.ids, request.delete_file)
+
+@router.post("/downloads/clear_completed")
+async def clear_completed(delete_file: bool = False):
+    return {"deleted": manager.clear_completed(delete_file)}
+
+@router.post("/downloads/{task_id}/refresh")
+async def refresh_download(task_id: str):
+    # Conditional re-download: only fetched again if the server has a newer version
+    try:
+        changed = await manager.refresh_task(task_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "refreshing" if changed else "unchanged", "changed": changed}
+
 @router.post("/downloads/{task_id}/limit")
 async def set_speed_limit(task_id: str, request: SpeedLimitRequest):
     task = manager.get_task(task_id)
@@ -111,6 +211,73 @@ async def refresh_link(task_id: str, request: RefreshLinkRequest):
     task.update_url(request.url)
     return {"status": "link updated"}
 
+STREAM_CHUNK = 256 * 1024
+
+def parse_range(header: Optional[str], total: int):
+    """(start, end) for a single "bytes=" range, None for no/unsupported range."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), total - 1) if last else total - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(total - int(last), 0)
+            end = total - 1
+    except ValueError:
+        return None
+    if start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{total}"})
+    return start, end
+
+@router.get("/downloads/{task_id}/stream")
+async def stream_download(task_id: str, range_header: Optional[str] = Header(None, alias="range")):
+    # Serves whatever is on disk already, so media can be played while it downloads.
+    # Missing bytes are prioritized and waited for briefly, see DownloadTask.read_range
+    task = manager.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if hasattr(task, 'folder_id'):
+        raise HTTPException(status_code=400, detail="Folders can't be streamed")
+    total = task.total_size
+    if total <= 0:
+        raise HTTPException(status_code=409, detail="File size is not known yet")
+
+    byte_range = parse_range(range_header, total)
+    start, end = byte_range or (0, total - 1)
+
+    first = await task.read_range(start, min(STREAM_CHUNK, end - start + 1))
+    if not first:
+        raise HTTPException(status_code=503, detail="Not downloaded yet", headers={"Retry-After": "1"})
+
+    # Only the bytes on disk now are promised, the rest may not arrive in time.
+    # A range request gets that span as a 206 and the player asks again for
+    # the rest, a plain request is sent without Content-Length and may end short.
+    available = max(task.available_at(start) if hasattr(task, 'available_at') else total - start, len(first))
+    complete = start + available > end
+    if byte_range and not complete:
+        end = start + available - 1
+
+    async def body():
+        yield first
+        position = start + len(first)
+        while position <= end:
+            data = await task.read_range(position, min(STREAM_CHUNK, end - position + 1))
+            if not data:
+                return # Not there in time. The response ends short and the player asks again.
+            yield data
+            position += len(data)
+
+    headers = {"Accept-Ranges": "bytes"}
+    if byte_range or complete:
+        headers["Content-Length"] = str(end - start + 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    media_type = mimetypes.guess_type(task.filename)[0] or "application/octet-stream"
+    return StreamingResponse(body(), status_code=206 if byte_range else 200, media_type=media_type, headers=headers)
+
 class RenameRequest(BaseModel):
     filename: str
 
@@ -122,13 +289,76 @@ async def rename_download(task_id: str, request: RenameRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/stats/checkpoints")
+async def get_checkpoint_stats():
+    return checkpoint_service.get_stats()
+
+@router.get("/stats/dedup")
+async def get_dedup_stats():
+    return content_index.get_stats()
+
+@router.get("/stats/hosts")
+async def get_host_profiles():
+    # What has been learned per host: range support, range-ignoring, throughput per connection count
+    return host_profiles.get_all()
+
+@router.get("/stats/reaper")
+async def get_reaper_stats():
+    # Deleted tasks still being stopped / having their files removed
+    return reaper.get_stats()
+
+@router.get("/stats/events")
+async def get_event_stats():
+    return {"bus": event_bus.get_stats(), "hooks": dict(hook_runner.stats)}
+
+EVENT_STREAM_BUFFER = 1000 # Events held for a slow client, newer ones are dropped
+EVENT_KEEPALIVE = 15 # seconds
+
+@router.get("/events")
+async def stream_events():
+    # Server-sent events: task lifecycle as it happens (see core/events.py)
+    queue = asyncio.Queue(EVENT_STREAM_BUFFER)
+
+    def forward(event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass # A slow client misses events instead of holding up the bus
+
+    event_bus.subscribe("*", forward)
+
+    async def body():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_bus.unsubscribe("*", forward)
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/schedule")
+async def get_schedule_status():
+    # Currently active windows and the policy they add up to
+    return scheduler.get_status()
+
 @router.get("/settings")
 async def get_settings():
     return settings_manager.settings
 
 @router.post("/settings")
 async def update_settings(settings: Settings):
+    # Hooks run shell commands and call arbitrary URLs, and this endpoint is
+    # reachable by any page the user visits. They are only configured in
+    # settings.json, keep the current ones whatever was sent.
+    settings.hooks = settings_manager.settings.hooks
     settings_manager.save_settings(settings)
-    # Trigger queue processing in case max_concurrent increased
-    await manager.process_queue()
+    worker_pool.update_settings(settings)
+    # Apply the schedule right away (caps, paused classes), which also
+    # processes the queue in case max_concurrent increased
+    await scheduler.apply()
     return settings_manager.settings
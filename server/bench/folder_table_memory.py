@@ -0,0 +1,95 @@
+"""Memory of a big Drive folder's file list: FolderFileTable vs per-file dicts.
+
+Builds the same synthetic listing (Drive-like ids, nested paths, sizes, md5s)
+three ways and reports what tracemalloc attributes to each:
+
+  dicts        one dict per file, as DriveFolderTask kept before the table
+  dicts+tasks  the same plus a DownloadTask per file, created up front as before
+  table        FolderFileTable
+
+Run from the server directory:
+
+    python bench/folder_table_memory.py --files 100000
+"""
+import argparse
+import gc
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MIME_TYPES = ["application/pdf", "image/jpeg", "video/mp4", "application/zip", "text/plain"]
+
+def _listing(count: int):
+    rng = random.Random(42)
+    alphabet = string.ascii_letters + string.digits + "-_"
+    for i in range(count):
+        file_id = "".join(rng.choice(alphabet) for _ in range(33))
+        name = f"file_{i:06d}.bin"
+        path = os.path.join("Big folder", f"dir_{i // 1000:03d}", name)
+        md5 = "%032x" % rng.getrandbits(128)
+        yield file_id, name, path, rng.choice(MIME_TYPES), rng.randint(1, 1 << 30), md5, "2024-01-01T00:00:00.000Z"
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    gc.collect()
+    return used
+
+def build_dicts(rows):
+    return [{'id': file_id, 'name': name, 'relative_path': path, 'size': size, 'mimeType': mime,
+             'md5Checksum': md5, 'modifiedTime': modified}
+            for file_id, name, path, mime, size, md5, modified in rows]
+
+def build_dicts_and_tasks(rows, download_dir: str):
+    from core.downloader import DownloadTask
+    files = build_dicts(rows)
+    tasks = [DownloadTask(f"https://www.googleapis.com/drive/v3/files/{meta['id']}?alt=media",
+                          meta['relative_path'], download_dir, 4)
+             for meta in files]
+    return files, tasks
+
+def build_table(rows):
+    from core.drive_task import FolderFileTable
+    table = FolderFileTable()
+    for file_id, name, path, mime, size, md5, modified in rows:
+        table.append(file_id, path, mime, size, md5, modified)
+    return table
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--skip-tasks", action="store_true", help="skip the DownloadTask per file variant")
+    args = parser.parse_args()
+
+    from core.settings import settings_manager, Settings
+    download_dir = tempfile.mkdtemp(prefix="hdm-bench-")
+    settings_manager.use(Settings(download_dir=download_dir, organize_files=False))
+    # Imported up front so module import isn't counted
+    import core.downloader, core.drive_task # noqa: F401
+
+    # Each variant is built from a fresh listing, so it owns its strings
+    results = [("dicts", _measure(lambda: build_dicts(_listing(args.files))))]
+    if not args.skip_tasks:
+        results.append(("dicts+tasks", _measure(lambda: build_dicts_and_tasks(_listing(args.files), download_dir))))
+    results.append(("table", _measure(lambda: build_table(_listing(args.files)))))
+    shutil.rmtree(download_dir, ignore_errors=True)
+
+    print(f"{args.files} files")
+    table_size = dict(results)["table"]
+    for label, size in results:
+        print(f"  {label:12} {size / 2**20:8.1f} MiB  {size / args.files:7.0f} B/file  {size / table_size:5.1f}x table")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Files per second for many small downloads, HTTP/1.1 (aiohttp) vs HTTP/2 (httpx).
+
+Starts a local TLS server that speaks both protocols (hypercorn, ALPN), then
+downloads the same set of small files through hdm.run_batch twice: once with
+the host in settings.http2_hosts and once without. --delay-ms adds a fixed
+per-request server delay, a stand-in for a remote server's latency.
+
+Needs httpx[http2] (requirements-http2.txt), hypercorn and the openssl command.
+Run from the server directory:
+
+    python bench/http2_smallfiles.py --files 500 --size 65536 --concurrency 16
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HOST = "localhost"
+
+def _make_cert(directory: str):
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-keyout", key, "-out", cert, "-subj", f"/CN={HOST}",
+                    "-addext", f"subjectAltName=DNS:{HOST}"], check=True, capture_output=True)
+    return cert, key
+
+def _serve(port: int, cert: str, key: str, size: int, delay: float):
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    body = os.urandom(size)
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if delay:
+            await asyncio.sleep(delay)
+        headers = dict(scope["headers"])
+        start, end = 0, size - 1
+        status = 200
+        byte_range = headers.get(b"range")
+        if byte_range:
+            first, _, last = byte_range.decode()[6:].partition("-")
+            start, end = int(first), int(last) if last else size - 1
+            status = 206
+        response_headers = [(b"content-length", str(end - start + 1).encode()), (b"accept-ranges", b"bytes"),
+                            (b"etag", b'"bench"')]
+        if status == 206:
+            response_headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode()))
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        payload = b"" if scope["method"] == "HEAD" else body[start:end + 1]
+        await send({"type": "http.response.body", "body": payload})
+
+    config = Config()
+    config.bind = [f"{HOST}:{port}"]
+    config.certfile, config.keyfile = cert, key
+    config.alpn_protocols = ["h2", "http/1.1"]
+    config.loglevel = "WARNING"
+    config.accesslog = None
+    asyncio.run(serve(app, config))
+
+async def _run(download_dir: str, urls, http2: bool, concurrency: int) -> float:
+    import hdm
+    from core.settings import Settings
+
+    hdm.PROGRESS_INTERVAL = 0.05 # Measure the downloads, not the polling
+    settings = Settings(download_dir=download_dir, max_concurrent_downloads=concurrency,
+                        max_connections_per_task=1, organize_files=False, dedup_mode="off",
+                        http2_hosts=[HOST] if http2 else [], http2_max_connections=2)
+    started = time.perf_counter()
+    summary = await hdm.run_batch(settings, urls=urls)
+    elapsed = time.perf_counter() - started
+    if summary["failed"] or len(summary["completed"]) != len(urls):
+        raise SystemExit(f"{len(summary['failed'])} download(s) failed: {summary['failed'][:1]}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--size", type=int, default=64 * 1024, help="bytes per file")
+    parser.add_argument("--concurrency", type=int, default=16, help="max_concurrent_downloads")
+    parser.add_argument("--delay-ms", type=float, default=0, help="server delay per request")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="hdm-bench-")
+    cert, key = _make_cert(work)
+    # Both clients trust the self-signed certificate through the standard variable
+    os.environ["SSL_CERT_FILE"] = cert
+
+    server = multiprocessing.Process(target=_serve, args=(args.port, cert, key, args.size, args.delay_ms / 1000), daemon=True)
+    server.start()
+    time.sleep(1.5)
+    try:
+        print(f"{args.files} files x {args.size} bytes, concurrency {args.concurrency}, "
+              f"server delay {args.delay_ms:g} ms")
+        for round_number in range(args.rounds):
+            for label, http2 in (("HTTP/1.1", False), ("HTTP/2", True)):
+                download_dir = os.path.join(work, f"{label.replace('/', '')}-{round_number}")
+                urls = [f"https://{HOST}:{args.port}/f{i}.bin" for i in range(args.files)]
+                elapsed = asyncio.run(_run(download_dir, urls, http2, args.concurrency))
+                print(f"  round {round_number + 1} {label:8} {elapsed:7.2f} s  {args.files / elapsed:8.1f} files/s")
+                shutil.rmtree(download_dir, ignore_errors=True)
+    finally:
+        server.terminate()
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Cost of one UI poll with a big history: GET /api/downloads vs /api/downloads/page.
+
+Fills the manager with --tasks synthetic tasks (3/4 completed TaskRecords,
+1/4 DownloadTasks) and times both endpoints in-process (fastapi TestClient),
+reporting the median latency and the response size. With --serve PORT it
+serves the filled manager (main.app, uvicorn) instead, for profiling the
+client against a big list.
+
+Run from the server directory:
+
+    python bench/list_paging.py --tasks 20000
+    python bench/list_paging.py --tasks 20000 --serve 8000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _fill(manager, download_dir: str, count: int):
+    from core.downloader import DownloadTask, TaskRecord, TaskStatus
+    tasks = {}
+    completed = count * 3 // 4
+    for i in range(completed):
+        tasks[f"done-{i}"] = TaskRecord(
+            id=f"done-{i}", url=f"http://example.com/{i}.bin", filename=f"done-{i}.bin",
+            filepath=os.path.join(download_dir, f"done-{i}.bin"), state_file="", parts_dir="",
+            status=TaskStatus.COMPLETED, total_size=1000, downloaded_size=1000, speed_limit=0,
+            completed_at=float(i), num_connections=4)
+    for i in range(count - completed):
+        task = DownloadTask(f"http://example.com/a{i}.bin", f"active-{i}.bin", download_dir, 4)
+        task.status = TaskStatus.QUEUED
+        tasks[task.id] = task
+    manager._tasks = tasks
+
+def _time(client, path: str, params: dict, rounds: int):
+    times, size = [], 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        response = client.get(path, params=params)
+        times.append(time.perf_counter() - started)
+        size = len(response.content)
+    return statistics.median(times), size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=9)
+    parser.add_argument("--serve", type=int, metavar="PORT", help="serve the filled manager instead of timing")
+    args = parser.parse_args()
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from core.settings import settings_manager, Settings
+    from core.downloader import manager
+    import api.routes as routes
+
+    download_dir = tempfile.mkdtemp(prefix="hdm-bench-")
+    settings_manager.use(Settings(download_dir=download_dir, organize_files=False))
+    _fill(manager, download_dir, args.tasks)
+    if args.serve:
+        import uvicorn
+        from main import app
+        uvicorn.run(app, host="127.0.0.1", port=args.serve)
+        return
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    client = TestClient(app)
+
+    print(f"{args.tasks} tasks, median of {args.rounds}")
+    for label, path, params in (
+            ("full list", "/api/downloads", {}),
+            ("page, completed", "/api/downloads/page", {"tab": "completed", "offset": 5000, "limit": 100}),
+            ("page, active", "/api/downloads/page", {"tab": "active", "offset": 0, "limit": 100})):
+        seconds, size = _time(client, path, params, args.rounds)
+        print(f"  {label:16} {seconds * 1000:8.1f} ms  {size / 1024:9.1f} KiB")
+
+if __name__ == "__main__":
+    main()
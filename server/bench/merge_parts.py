@@ -0,0 +1,123 @@
+"""Merge time for big downloads: DownloadTask.merge_parts vs the old read/write loop.
+
+Writes the parts of a download of --size-gb to disk, merges them with the
+old sequential 1 MiB aiofiles loop, writes them again and merges them with
+DownloadTask.merge_parts (reflink / copy_file_range / sendfile into a
+preallocated file, MERGE_CONCURRENCY parts at a time). Parts are fsynced
+before each merge. The page cache isn't dropped, so use sizes above RAM for
+cold numbers.
+
+Run from the server directory, --dir should be on the filesystem you care about:
+
+    python bench/merge_parts.py --size-gb 1 10 --parts 4
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHUNK = 64 * 1024 * 1024
+
+def _write_parts(task, size: int, parts: int):
+    block = os.urandom(CHUNK)
+    part_size = size // parts
+    task.parts_info = []
+    for i in range(parts):
+        start = i * part_size
+        end = size - 1 if i == parts - 1 else start + part_size - 1
+        remaining = end - start + 1
+        with open(task._part_file(i), 'wb') as f:
+            while remaining > 0:
+                remaining -= f.write(block[:min(CHUNK, remaining)])
+            f.flush()
+            os.fsync(f.fileno())
+        task.parts_info.append({'start': start, 'end': end, 'current': end + 1})
+    task.total_size = size
+    task.num_connections = parts
+
+async def _old_merge(task):
+    # The merge as it was: one part after the other through a 1 MiB buffer
+    import aiofiles
+    async with aiofiles.open(task.filepath, 'wb') as outfile:
+        for i in range(task.num_connections):
+            part_file = task._part_file(i)
+            if os.path.exists(part_file):
+                async with aiofiles.open(part_file, 'rb') as infile:
+                    while True:
+                        chunk = await infile.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        await outfile.write(chunk)
+                os.remove(part_file)
+
+async def _new_merge(task):
+    from core.disk import preallocate
+    # start() preallocates the merge file while the download runs
+    await asyncio.get_running_loop().run_in_executor(None, preallocate, task._merge_file(), task.total_size)
+    started = time.perf_counter()
+    await task.merge_parts()
+    return started
+
+def _copy_method(directory: str) -> str:
+    from core.disk import copy_into
+    src, dst = os.path.join(directory, "probe.src"), os.path.join(directory, "probe.dst")
+    with open(src, 'wb') as f:
+        f.write(os.urandom(1 << 20))
+    open(dst, 'wb').close()
+    try:
+        return copy_into(src, dst, 0)
+    finally:
+        os.remove(src)
+        os.remove(dst)
+
+def _sync():
+    if hasattr(os, 'sync'):
+        os.sync()
+
+async def _bench(directory: str, size: int, parts: int):
+    from core.downloader import DownloadTask
+    task = DownloadTask("http://bench.invalid/file.bin", "file.bin", directory, parts)
+
+    _write_parts(task, size, parts)
+    started = time.perf_counter()
+    await _old_merge(task)
+    _sync()
+    old = time.perf_counter() - started
+    os.remove(task.filepath)
+
+    _write_parts(task, size, parts)
+    started = await _new_merge(task)
+    _sync()
+    new = time.perf_counter() - started
+    if os.path.getsize(task.filepath) != size:
+        raise SystemExit("merged file has the wrong size")
+    os.remove(task.filepath)
+    return old, new
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-gb", type=float, nargs="+", default=[1, 10])
+    parser.add_argument("--parts", type=int, default=4)
+    parser.add_argument("--dir", default=None, help="where to write (default: a temp dir)")
+    args = parser.parse_args()
+
+    from core.settings import settings_manager, Settings
+    directory = tempfile.mkdtemp(prefix="hdm-bench-", dir=args.dir)
+    settings_manager.use(Settings(download_dir=directory, organize_files=False))
+    try:
+        print(f"{args.parts} parts, in-kernel copy method here: {_copy_method(directory)}")
+        for size_gb in args.size_gb:
+            size = int(size_gb * 2**30)
+            old, new = asyncio.run(_bench(directory, size, args.parts))
+            print(f"  {size_gb:g} GiB  old loop {old:7.2f} s ({size / old / 2**20:6.0f} MiB/s)  "
+                  f"merge_parts {new:7.2f} s ({size / new / 2**20:6.0f} MiB/s)  {old / new:4.1f}x")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Aggregate download throughput vs settings.worker_processes.
+
+Starts a local HTTP server (aiohttp, Range support) in its own process and
+downloads the same batch through hdm.run_batch once per worker count, each
+run in a fresh interpreter so the process-wide singletons start clean.
+With worker_processes=0 everything runs in one process.
+
+Run from the server directory:
+
+    python bench/worker_scaling.py --workers 0 1 2 4 --files 16 --size-mb 64
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+def _serve(port: int, size: int):
+    from aiohttp import web
+
+    body = os.urandom(size)
+
+    async def handle(request):
+        headers = {"Accept-Ranges": "bytes", "ETag": '"bench"'}
+        byte_range = request.headers.get("Range")
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(size)
+            return web.Response(headers=headers)
+        if byte_range:
+            first, _, last = byte_range[6:].partition("-")
+            start, end = int(first), int(last) if last else size - 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return web.Response(status=206, body=body[start:end + 1], headers=headers)
+        return web.Response(body=body, headers=headers)
+
+    app = web.Application()
+    app.router.add_route("*", "/{name}", handle)
+    web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None)
+
+async def _run_once(download_dir: str, urls, workers: int, concurrency: int, connections: int) -> dict:
+    import hdm
+    from core.settings import Settings
+
+    hdm.PROGRESS_INTERVAL = 0.05
+    settings = Settings(download_dir=download_dir, worker_processes=workers, max_concurrent_downloads=concurrency,
+                        max_connections_per_task=connections, organize_files=False, dedup_mode="off")
+    started = time.perf_counter()
+    summary = await hdm.run_batch(settings, urls=urls)
+    return {"seconds": time.perf_counter() - started, "bytes": summary["bytes"], "failed": len(summary["failed"])}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8, help="max_concurrent_downloads")
+    parser.add_argument("--connections", type=int, default=4, help="max_connections_per_task")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS) # Single run, used internally
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    urls = [f"http://127.0.0.1:{args.port}/f{i}.bin" for i in range(args.files)]
+    if args.one is not None:
+        result = asyncio.run(_run_once(args.dir, urls, args.one, args.concurrency, args.connections))
+        print(json.dumps(result))
+        return
+
+    server = multiprocessing.Process(target=_serve, args=(args.port, args.size_mb * 2**20), daemon=True)
+    server.start()
+    time.sleep(1.5)
+    work = tempfile.mkdtemp(prefix="hdm-bench-")
+    try:
+        print(f"{args.files} files x {args.size_mb} MiB, concurrency {args.concurrency}, "
+              f"{args.connections} connections per task, {os.cpu_count()} CPUs")
+        baseline = None
+        for workers in args.workers:
+            download_dir = os.path.join(work, f"w{workers}")
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--one", str(workers), "--dir", download_dir,
+                 "--files", str(args.files), "--concurrency", str(args.concurrency),
+                 "--connections", str(args.connections), "--port", str(args.port)],
+                cwd=SERVER_DIR, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            if result["failed"]:
+                raise SystemExit(f"{result['failed']} download(s) failed with {workers} workers")
+            rate = result["bytes"] / result["seconds"] / 2**20
+            baseline = baseline or rate
+            print(f"  workers {workers}: {result['seconds']:7.2f} s  {rate:8.1f} MiB/s  {rate / baseline:5.2f}x")
+            shutil.rmtree(download_dir, ignore_errors=True)
+    finally:
+        server.terminate()
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
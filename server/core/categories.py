@@ -0,0 +1,41 @@
+import os
+from typing import Optional
+from .settings import settings_manager, CategoryRule
+
+# Category folders for organize_files.
+#
+# The category is decided before a download starts (by extension when it is
+# added, then again with the Content-Type and size from the HEAD probe), so the
+# task's parts, state file and output are created in download_dir/<category>
+# and finishing is a rename on the same filesystem instead of a move.
+
+FOLDER_CATEGORY = "Gdrive Folders"
+DEFAULT_CATEGORY = "Others"
+
+def _normalize_ext(ext: str) -> str:
+    ext = ext.lower()
+    return ext if ext.startswith(".") else "." + ext
+
+def rule_matches(rule: CategoryRule, ext: str, mime_type: Optional[str], size: int) -> bool:
+    if rule.extensions or rule.mime_types:
+        by_ext = ext in [_normalize_ext(e) for e in rule.extensions]
+        by_mime = bool(mime_type) and any(mime_type.startswith(m.lower()) for m in rule.mime_types)
+        if not by_ext and not by_mime:
+            return False
+    mb = 1024 * 1024
+    if rule.min_size_mb and size < rule.min_size_mb * mb:
+        return False
+    if rule.max_size_mb and (size <= 0 or size > rule.max_size_mb * mb):
+        return False
+    return True
+
+def categorize(filename: str, mime_type: Optional[str] = None, size: int = 0) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    if mime_type:
+        mime_type = mime_type.split(";")[0].strip().lower()
+        if mime_type == "application/octet-stream":
+            mime_type = None # Says nothing about the content
+    for rule in settings_manager.settings.category_rules:
+        if rule_matches(rule, ext, mime_type, size):
+            return rule.category
+    return DEFAULT_CATEGORY
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+from .settings import settings_manager
+
+# Coalesced, crash-consistent state checkpointing. Hot paths mark a task
+# dirty; a loop snapshots dirty tasks every settings.checkpoint_interval
+# seconds and writes them in one executor batch (temp file + fsync + rename).
+
+def _fsync_dir(path: str):
+    # Make the rename itself durable. Not possible on every platform.
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write_json(path: str, data, sync_dir: bool = True) -> float:
+    """Write `data` as JSON so that `path` holds either the old or the new content.
+
+    Concurrent writers of the same path each get their own temp file, the last
+    rename wins. With sync_dir=False the caller fsyncs the directory (once for
+    a whole batch). Returns the time spent in fsync, in seconds.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            started = time.perf_counter()
+            os.fsync(f.fileno())
+            fsync_time = time.perf_counter() - started
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if sync_dir:
+        started = time.perf_counter()
+        _fsync_dir(directory)
+        fsync_time += time.perf_counter() - started
+
+    checkpoint_service.record_fsync(fsync_time)
+    return fsync_time
+
+class CheckpointService:
+    def __init__(self):
+        self._dirty: Dict[str, object] = {}
+        self._deleted = set() # Ids whose state file must not be written again
+        self._saved_at: Dict[str, float] = {} # Last synchronous save per task
+        self._runner: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._urgent: Optional[asyncio.Task] = None # Flushes started by save_now()
+        self._urgent_requested = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {
+            "flushes": 0,
+            "files_written": 0,
+            "fsync_count": 0,
+            "fsync_total_ms": 0.0,
+            "fsync_max_ms": 0.0,
+            "last_flush_ms": 0.0
+        }
+
+    def record_fsync(self, seconds: float):
+        ms = seconds * 1000
+        self.stats["fsync_count"] += 1
+        self.stats["fsync_total_ms"] += ms
+        self.stats["fsync_max_ms"] = max(self.stats["fsync_max_ms"], ms)
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        count = stats["fsync_count"]
+        stats["fsync_avg_ms"] = stats["fsync_total_ms"] / count if count else 0.0
+        stats["pending"] = len(self._dirty)
+        return stats
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        # The lock and flush tasks belong to one event loop. A new loop (e.g.
+        # consecutive run_batch() calls) starts over, whatever the old one left.
+        if loop is not self._loop:
+            self._loop = loop
+            self._flush_lock = asyncio.Lock()
+            self._runner = self._urgent = None
+
+    def mark_dirty(self, task):
+        self._dirty[task.id] = task
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # No loop (e.g. while loading), the next flush picks it up
+        self._bind(loop)
+        if self._runner is None or self._runner.done():
+            self._runner = loop.create_task(self._run())
+
+    def save_now(self, task):
+        # Status changes (completed, error, renamed...) don't wait for the
+        # interval: the next batch is written right away, off the loop.
+        # Whoever needs the file on disk (a worker loading it) awaits flush().
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.write_now(task) # No loop (executor threads, loading)
+            return
+        self._bind(loop)
+        self._dirty[task.id] = task
+        # A flush already writing its batch has swapped this task out, so it
+        # runs again afterwards
+        self._urgent_requested = True
+        if self._urgent is None or self._urgent.done():
+            self._urgent = loop.create_task(self._flush_urgent())
+
+    async def _flush_urgent(self):
+        while self._urgent_requested:
+            self._urgent_requested = False
+            await self.flush()
+
+    def write_now(self, task):
+        # Synchronous write, for when the file must be on disk before going on
+        # (e.g. before the old state file of a moved task is removed).
+        # A batch snapshotted before this, possibly with the old path, must
+        # not write it afterwards.
+        self._dirty.pop(task.id, None)
+        self._saved_at[task.id] = time.monotonic()
+        atomic_write_json(task.state_file, task.get_state())
+
+    def discard(self, task):
+        # Called when a task's files are deleted, so a pending or in-flight
+        # checkpoint doesn't bring its state file back
+        self._dirty.pop(task.id, None)
+        self._saved_at.pop(task.id, None)
+        self._deleted.add(task.id)
+
+    async def _run(self):
+        while self._dirty:
+            await asyncio.sleep(max(settings_manager.settings.checkpoint_interval, 0.1))
+            await self.flush()
+
+    async def flush(self):
+        self._bind(asyncio.get_running_loop())
+
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch, self._dirty = self._dirty, {}
+
+            # Snapshot on the loop so the writer thread never sees a half-updated task
+            taken_at = time.monotonic()
+            snapshots: List[Tuple[str, str, Dict]] = []
+            for task in batch.values():
+                try:
+                    snapshots.append((task.id, task.state_file, task.get_state()))
+                except Exception as e:
+                    print(f"Error snapshotting task {task.id}: {e}")
+
+            started = time.perf_counter()
+            await asyncio.get_running_loop().run_in_executor(None, self._write_batch, snapshots, taken_at)
+            self.stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+            self.stats["flushes"] += 1
+
+    def _write_batch(self, snapshots: List[Tuple[str, str, Dict]], taken_at: float):
+        directories = set()
+        for task_id, state_file, state in snapshots:
+            if task_id in self._deleted or self._saved_at.get(task_id, 0) > taken_at:
+                continue
+            try:
+                atomic_write_json(state_file, state, sync_dir=False)
+                directories.add(os.path.dirname(state_file) or ".")
+                self.stats["files_written"] += 1
+            except Exception as e:
+                print(f"Error writing checkpoint {state_file}: {e}")
+
+        # The renames of the whole batch made durable with one fsync per directory
+        for directory in directories:
+            started = time.perf_counter()
+            try:
+                _fsync_dir(directory)
+            except OSError as e:
+                print(f"Error syncing {directory}: {e}")
+            self.record_fsync(time.perf_counter() - started)
+
+checkpoint_service = CheckpointService()
@@ -0,0 +1,173 @@
+import json
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Tuple
+from .settings import settings_manager
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+# Content-addressed dedup.
+#
+# Every finished download is indexed under the content keys we know for it:
+#   <hash_type>:<checksum>:<size>  from a manifest checksum (verified on download)
+#   md5:<md5>:<size>               from Drive's md5Checksum (same namespace as a manifest md5)
+#   etag:<url>:<etag>              from the server's strong ETag
+# A new task with a matching key gets the existing bytes reflinked, hardlinked
+# or copied into place instead of downloading them again.
+#
+# The index is an append-only JSON-lines journal in .parts, so the API process
+# and worker processes can share it: writers append whole lines, readers pick
+# up new lines from where they stopped. Entries are validated (size and mtime)
+# before use, so files that were deleted or modified since are skipped.
+
+FICLONE = 0x40049409 # Linux ioctl: share the source's extents (btrfs, xfs, ...)
+
+def content_keys(size: int, hash_type: Optional[str] = None, checksum: Optional[str] = None,
+                 md5: Optional[str] = None, url: Optional[str] = None, etag: Optional[str] = None) -> List[str]:
+    keys = []
+    if size > 0:
+        if hash_type and checksum:
+            keys.append(f"{hash_type}:{checksum.lower()}:{size}")
+        if md5:
+            key = f"md5:{md5.lower()}:{size}"
+            if key not in keys:
+                keys.append(key)
+    # Weak ETags (W/"...") don't promise identical bytes
+    if url and etag and not etag.startswith("W/"):
+        keys.append(f"etag:{url}:{etag}")
+    return keys
+
+def _reflink(src: str, dst: str) -> bool:
+    if fcntl is None:
+        return False
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return True
+        except OSError:
+            pass
+    os.remove(dst)
+    return False
+
+def materialize(src: str, dst: str, mode: str) -> str:
+    """Make `dst` a copy of `src` as cheaply as possible. Returns the method used."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass # Other filesystem, or not supported
+
+    if _reflink(src, dst):
+        return "reflink"
+
+    shutil.copyfile(src, dst)
+    return "copy"
+
+class ContentIndex:
+    def __init__(self):
+        self.entries: Dict[str, List[Tuple[str, int, float]]] = {} # key -> [(path, size, mtime)]
+        self.stats = {"indexed": 0, "hits": 0, "bytes_saved": 0}
+        self._journal: Optional[str] = None
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _journal_path(self) -> str:
+        return os.path.join(settings_manager.settings.download_dir, ".parts", "content_index.jsonl")
+
+    def _refresh(self):
+        # Pick up lines appended since the last read (possibly by another process)
+        path = self._journal_path()
+        if path != self._journal:
+            # Download dir changed, start over
+            self._journal = path
+            self._offset = 0
+            self.entries = {}
+            self.stats = {"indexed": 0, "hits": 0, "bytes_saved": 0}
+
+        if not os.path.exists(path):
+            return
+        with open(path, 'r') as f:
+            f.seek(self._offset)
+            while True:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    break # Nothing more, or a line still being written
+                self._offset += len(line.encode())
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if "hit" in record:
+                    self.stats["hits"] += 1
+                    self.stats["bytes_saved"] += record.get("bytes", 0)
+                else:
+                    entry = (record["path"], record["size"], record["mtime"])
+                    for key in record["keys"]:
+                        self.entries.setdefault(key, []).append(entry)
+                    self.stats["indexed"] += 1
+
+    def _append(self, record: Dict):
+        path = self._journal_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One write of a whole line in append mode, so concurrent writers don't interleave
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+    def add(self, keys: List[str], path: str):
+        if not keys or settings_manager.settings.dedup_mode == "off":
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self._append({"keys": keys, "path": path, "size": st.st_size, "mtime": st.st_mtime})
+
+    def _find(self, keys: List[str], size: int) -> Optional[str]:
+        for key in keys:
+            # Newest first, skipping files that are gone or were changed since
+            for path, indexed_size, mtime in reversed(self.entries.get(key, [])):
+                if indexed_size != size:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_size == size and st.st_mtime == mtime:
+                    return path
+        return None
+
+    def link_existing(self, keys: List[str], size: int, dst: str) -> Optional[Tuple[str, str]]:
+        """Put existing bytes matching `keys` at `dst`. Returns (source, method) on a hit."""
+        mode = settings_manager.settings.dedup_mode
+        if mode == "off" or not keys or size <= 0:
+            return None
+
+        with self._lock:
+            self._refresh()
+            source = self._find(keys, size)
+            if source is None or os.path.abspath(source) == os.path.abspath(dst):
+                return None
+            try:
+                method = materialize(source, dst, mode)
+            except OSError as e:
+                print(f"Dedup from {source} failed: {e}")
+                return None
+            self._append({"hit": keys[0], "bytes": size})
+        return source, method
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            return dict(self.stats)
+
+content_index = ContentIndex()
@@ -0,0 +1,171 @@
+import os
+import shutil
+import struct
+from typing import Callable, Dict, Optional, Tuple
+from .settings import settings_manager
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+# Disk space budgeting across concurrent tasks.
+#
+# A task needs more than its own size while it runs: the .partN files, then the
+# merged copy (both exist until the merge finishes), then optionally the
+# extraction output. Without accounting for that, N large downloads started
+# together fill the disk halfway through and all of them fail.
+#
+# Before a task starts, process_queue() asks the budget to reserve what the
+# task still needs. Tasks that don't fit stay queued until space frees up.
+# Reservations shrink as the task writes bytes, since those bytes then show up
+# in the filesystem's own used space.
+
+class DiskBudget:
+    def __init__(self):
+        # task id -> (task, reserved bytes, downloaded_size at reservation time)
+        self.reservations: Dict[str, Tuple[object, int, int]] = {}
+
+    def required_bytes(self, task) -> int:
+        settings = settings_manager.settings
+        total = task.total_size
+        if total <= 0:
+            return 0 # Unknown size, nothing sensible to reserve
+
+        remaining = max(total - task.downloaded_size, 0)
+        required = remaining
+        # Multi-part tasks keep the parts around until the merged copy is complete
+        if getattr(task, 'parts_info', None) is not None:
+            required += total
+        if task.auto_extract:
+            required += int(total * settings.extract_space_factor)
+        return required
+
+    def _outstanding(self, exclude_id: str = None) -> int:
+        outstanding = 0
+        for task_id, (task, reserved, base) in self.reservations.items():
+            if task_id == exclude_id:
+                continue
+            written = max(task.downloaded_size - base, 0)
+            outstanding += max(reserved - written, 0)
+        return outstanding
+
+    def free_bytes(self, path: str) -> int:
+        try:
+            return shutil.disk_usage(path).free
+        except OSError:
+            return 0
+
+    def _target_dir(self, task) -> str:
+        # The filesystem the task writes to: its category folder once it has been placed there
+        path = os.path.dirname(getattr(task, 'filepath', None) or "")
+        while path and not os.path.exists(path):
+            path = os.path.dirname(path)
+        return path or task.download_dir
+
+    def try_reserve(self, task) -> bool:
+        required = self.required_bytes(task)
+        if required == 0:
+            self.reservations[task.id] = (task, 0, task.downloaded_size)
+            return True
+
+        margin = settings_manager.settings.min_free_space_mb * 1024 * 1024
+        available = self.free_bytes(self._target_dir(task)) - self._outstanding(exclude_id=task.id) - margin
+        if required > available:
+            return False
+
+        self.reservations[task.id] = (task, required, task.downloaded_size)
+        return True
+
+    def release(self, task):
+        self.reservations.pop(task.id, None)
+
+def preallocate(path: str, size: int):
+    """Reserve blocks for `path` up front so the merge can't run out of space halfway."""
+    if size <= 0 or not hasattr(os, 'posix_fallocate'):
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as e:
+        # Not supported by every filesystem (e.g. some network mounts), that's fine
+        print(f"Preallocation skipped for {path}: {e}")
+    finally:
+        os.close(fd)
+
+# fdatasync skips the metadata flush, but isn't available everywhere
+_datasync = getattr(os, 'fdatasync', os.fsync)
+
+def sync_file(fd: int):
+    _datasync(fd)
+
+FICLONERANGE = 0x4020940d # Linux ioctl: share a range of the source's extents
+COPY_CHUNK = 64 * 1024 * 1024 # Kernel copies go in steps of this, for progress
+FALLBACK_CHUNK = 1024 * 1024
+
+def _clone_range(src_fd: int, dst_fd: int, length: int, dst_offset: int) -> bool:
+    # Only works for block-aligned offsets on btrfs/xfs and the like, so it is a bonus
+    if fcntl is None or not hasattr(fcntl, 'ioctl'):
+        return False
+    try:
+        # struct file_clone_range: src_fd, src_offset, src_length, dest_offset
+        fcntl.ioctl(dst_fd, FICLONERANGE, struct.pack("qQQQ", src_fd, 0, length, dst_offset))
+        return True
+    except OSError:
+        return False
+
+def copy_into(src: str, dst: str, dst_offset: int, on_progress: Optional[Callable[[int], None]] = None) -> str:
+    """Copy all of `src` into the existing file `dst` at `dst_offset`. Returns the method used.
+
+    Tries a reflink, then copy_file_range and sendfile, which copy inside the
+    kernel, then a plain read/write loop. Each call opens its own descriptors,
+    so several parts can be copied into the same file at once.
+    """
+    on_progress = on_progress or (lambda n: None)
+    size = os.path.getsize(src)
+    copied = 0
+    with open(src, 'rb') as fsrc, open(dst, 'r+b') as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        if size > 0 and _clone_range(src_fd, dst_fd, size, dst_offset):
+            on_progress(size)
+            return "reflink"
+
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while copied < size:
+                    n = os.copy_file_range(src_fd, dst_fd, min(COPY_CHUNK, size - copied), copied, dst_offset + copied)
+                    if n == 0:
+                        break
+                    copied += n
+                    on_progress(n)
+                if copied >= size:
+                    return "copy_file_range"
+            except OSError:
+                pass # Not supported here (old kernel, some filesystems), continue where it stopped
+
+        if hasattr(os, 'sendfile'):
+            try:
+                # sendfile writes at the file position, which is this descriptor's own
+                os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+                while copied < size:
+                    n = os.sendfile(dst_fd, src_fd, copied, min(COPY_CHUNK, size - copied))
+                    if n == 0:
+                        break
+                    copied += n
+                    on_progress(n)
+                if copied >= size:
+                    return "sendfile"
+            except OSError:
+                pass # E.g. macOS, where the target must be a socket
+
+        fsrc.seek(copied)
+        fdst.seek(dst_offset + copied)
+        while True:
+            chunk = fsrc.read(FALLBACK_CHUNK)
+            if not chunk:
+                break
+            fdst.write(chunk)
+            on_progress(len(chunk))
+    return "copy"
+
+disk_budget = DiskBudget()
@@ -3,29 +3,71 @@ import aiohttp
 import aiofiles
 import os
 import json
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Deque
+from collections import deque
 from enum import Enum
 import time
 import shutil
-from .settings import settings_manager
+import hashlib
+from .settings import settings_manager, Settings
+from .transport import open_session
+from .disk import disk_budget, preallocate, sync_file, copy_into
+from .progress import progress_sampler
+from .checkpoint import checkpoint_service, atomic_write_json
+from .workers import worker_pool
+from .dedup import content_index, content_keys
+from .scheduler import global_limiter, scheduler
+from .names import name_index
+from .hosts import host_profiles
+from .categories import categorize, FOLDER_CATEGORY
+from .events import event_bus, publish_status, PROGRESS_STEP
+from .hooks import hook_runner
+from .reaper import reaper
 import functools
 
 print = functools.partial(print, flush=True)
 
+STREAM_MIN_SPLIT = 1024 * 1024 # Don't split segments smaller than this in streaming mode
+STREAM_WAIT = 10 # Seconds a stream reader waits for bytes that aren't on disk yet
+MERGE_CONCURRENCY = 4 # Parts copied into the output at the same time
+PAUSE_STOP_TIMEOUT = 10 # Seconds to wait for a paused download to close its connections
+
+def read_file_range(path: str, offset: int, length: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
 class RangeIgnoredError(Exception):
     """Raised when server ignores Range header and returns 200 OK instead of 206."""
     pass
 
+class ResourceChangedError(Exception):
+    """The remote file changed since the download started (If-Range got a full response)."""
+    pass
+
 class TaskStatus(str, Enum):
     PENDING = "pending"
     QUEUED = "queued"
     DOWNLOADING = "downloading"
     PAUSED = "paused"
+    MERGING = "merging"
     EXTRACTING = "extracting"
     COMPLETED = "completed"
     ERROR = "error"
     CANCELED = "canceled"
 
+_last_task_id = 0
+
+def new_task_id() -> str:
+    # Millisecond timestamp, bumped when several tasks are created within the
+    # same millisecond (bulk imports, Drive folders) so ids stay unique.
+    global _last_task_id
+    candidate = int(time.time() * 1000)
+    if candidate <= _last_task_id:
+        candidate = _last_task_id + 1
+    _last_task_id = candidate
+    return str(candidate)
+
 class RateLimiter:
     def __init__(self, rate_limit_kbps: int):
         self.rate_limit = rate_limit_kbps * 1024 # bytes per second
@@ -54,61 +96,186 @@ class RateLimiter:
                 await asyncio.sleep(wait_time)
 
 class DownloadTask:
-    def __init__(self, url: str, filename: str, download_dir: str, num_connections: int = 4, auto_extract: bool = False, headers: Dict[str, str] = None):
-        self.id = str(int(time.time() * 1000))  # Simple ID generation
+    def __init__(self, url: str, filename: str, download_dir: str, num_connections: int = 4, auto_extract: bool = False, headers: Dict[str, str] = None, auth: Optional[str] = None):
+        self.id = new_task_id()
         self.url = url
         self.filename = filename
         self.download_dir = download_dir
-        self.filepath = os.path.join(download_dir, filename)
         self.num_connections = num_connections
         self.auto_extract = auto_extract
+        # Owning DriveFolderTask, whose downloaded_size is kept in sync incrementally
+        self.parent = None
+        # A file of a Drive folder, the folder decides where it goes. Saved, unlike
+        # parent, so a worker process that loads the task from its state knows too.
+        self.in_folder = False
         self.status = TaskStatus.PENDING
         self.total_size = 0
+        self._milestone = 0 # Progress events published so far, in PROGRESS_STEP percent
         self.downloaded_size = 0
         self.parts_info = []  # List of (start, end, current)
+        # Maintained by the progress sampler while the task is active
         self.speed = 0
+        self.eta: Optional[int] = None # seconds
+        self.connection_speeds: List[int] = [] # bytes/s per part
         self.error_message = None
+        self.wait_reason = None # Why a queued task hasn't started yet
         self.rate_limiter = None
         self.speed_limit = 0 # kbps
         self.extraction_skipped = False
+        self.merged_size = 0 # Bytes copied into the output while merging
         self.supports_resume = False
         self._cancel_event = asyncio.Event()
-        self._pause_event = asyncio.Event()
-        self._pause_event.set() # Start unpaused
         self.headers = headers or {}
+        # Name of an auth provider (e.g. "drive") whose headers are resolved per request.
+        # Credentials are never frozen into self.headers since those get persisted.
+        self.auth = auth
         self.completed_at = 0 # Timestamp when completed
-        
-        # Hidden parts directory
-        self.parts_dir = os.path.join(download_dir, ".parts")
+        # Scheduling class, schedule windows can pause whole classes (see core/scheduler.py)
+        self.queue_class = "default"
+
+        # Streaming mode ("download while reading"): connections keep taking the
+        # most urgent unfinished segment, nearest to what the stream endpoint reads
+        self.streaming = False
+        self.stream_position = 0 # Last offset a reader asked for
+        # Rendered by the server per request (Drive exports of Google Docs): no size
+        # up front, no ranges, and nothing it does says anything about its host
+        self.export = False
+        self._active_parts = set() # Part ids a connection is downloading
+        self._preempt = set() # Active parts that should hand their remaining range back
+
+        # Host profile bookkeeping (see core/hosts.py)
+        self._ranges_seen = False # A 206 was recorded for this run
+        self._paused_in_run = False # Pauses make the run useless as a throughput sample
+        self._pause_requested = False # pause() was called during the current run, which then ends
+        self.resume_pending = False # Resumed while the paused run was still ending, see resume_task()
+        # A part other than 0 got a full response to its Range request, see download_part()
+        self._range_ignored = False
+
+        # Manifest (Metalink/JSON) data, see apply_manifest()
+        self.mirrors: List[str] = []
+        self.expected_size = 0
+        self.hash_type: Optional[str] = None
+        self.checksum: Optional[str] = None
+        self.piece_length = 0
+        self.piece_hashes: List[str] = []
+
+        # Validators captured at first contact. They are sent as If-Range on every
+        # segment so parts of two versions never get merged, and as If-None-Match /
+        # If-Modified-Since when refreshing a finished download.
+        # The ETag also identifies content for dedup, as does Drive's md5Checksum.
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        # The source the validators came from, mirrors have their own
+        self.validator_source: Optional[str] = None
+        self.remote_md5: Optional[str] = None
+        self.deduplicated_from: Optional[str] = None
+        self.content_type: Optional[str] = None
+
+        # Category folder the task lives in (parts, state file and output), None = download_dir.
+        # Decided before the download starts, see relocate().
+        self.category: Optional[str] = None
+        self._place(None)
+        self.task_runner: Optional[asyncio.Task] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        # WorkerHandle running this task in worker mode (see core/workers.py)
+        self.worker = None
+
+    def _place(self, category: Optional[str]):
+        self.category = category
+        base_dir = os.path.join(self.download_dir, category) if category else self.download_dir
+        self.filepath = os.path.join(base_dir, self.filename)
+
+        # Hidden parts directory, on the same filesystem as the output
+        self.parts_dir = os.path.join(base_dir, ".parts")
         
         # Ensure parts directory structure exists for nested files
-        if os.path.dirname(filename):
-            self.parts_dir = os.path.join(self.parts_dir, os.path.dirname(filename))
+        if os.path.dirname(self.filename):
+            self.parts_dir = os.path.join(self.parts_dir, os.path.dirname(self.filename))
             
         if not os.path.exists(self.parts_dir):
             os.makedirs(self.parts_dir)
             
-        self.state_file = os.path.join(self.parts_dir, f"{os.path.basename(filename)}.state.json")
+        self.state_file = os.path.join(self.parts_dir, f"{os.path.basename(self.filename)}.state.json")
         
         # Ensure destination directory exists
         dest_dir = os.path.dirname(self.filepath)
         if not os.path.exists(dest_dir):
             os.makedirs(dest_dir)
-        self.task_runner: Optional[asyncio.Task] = None
-        self.session: Optional[aiohttp.ClientSession] = None
 
-    async def _speed_monitor(self):
-        last_save_time = time.time()
-        while self.status in [TaskStatus.DOWNLOADING, TaskStatus.PAUSED]:
-            start_bytes = self.downloaded_size
-            await asyncio.sleep(1)
-            end_bytes = self.downloaded_size
-            self.speed = end_bytes - start_bytes
-            
-            # Save state every 5 seconds
-            if time.time() - last_save_time > 5:
-                self.save_state()
-                last_save_time = time.time()
+    def relocate(self, category: Optional[str]):
+        """Move the task (state file, parts, output) under download_dir/category.
+
+        Normally called before anything is downloaded, when only the state file
+        has to move. Parts and output are moved too if they exist.
+        """
+        if category == self.category:
+            return
+        old_state_file, old_filepath = self.state_file, self.filepath
+        old_parts = [self._part_file(i) for i in range(self._part_count())]
+        self._place(category)
+
+        for i, old_part in enumerate(old_parts):
+            if os.path.exists(old_part):
+                shutil.move(old_part, self._part_file(i))
+        if old_filepath != self.filepath and os.path.exists(old_filepath):
+            shutil.move(old_filepath, self.filepath)
+        if os.path.exists(old_state_file):
+            # The new state file must exist before the old one goes
+            checkpoint_service.write_now(self)
+            os.remove(old_state_file)
+
+    @classmethod
+    def from_state_file(cls, state_file: str, download_dir: str, num_connections: int) -> "DownloadTask":
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+        task = cls(state["url"], state["filename"], download_dir, num_connections, state.get("auto_extract", False))
+        task._place(state.get("category"))
+        task.load_state()
+        return task
+
+    @property
+    def status(self) -> TaskStatus:
+        return self._status
+
+    @status.setter
+    def status(self, value: TaskStatus):
+        old = getattr(self, '_status', None)
+        self._status = value
+        publish_status(self, old, value)
+
+    @property
+    def downloaded_size(self) -> int:
+        return self._downloaded_size
+
+    @downloaded_size.setter
+    def downloaded_size(self, value: int):
+        # Push the delta to the folder so its total never needs re-summing
+        if self.parent is not None:
+            self.parent.downloaded_size += value - self._downloaded_size
+        self._downloaded_size = value
+        if self.total_size > 0:
+            milestone = value * 100 // self.total_size // PROGRESS_STEP
+            if milestone != self._milestone:
+                # Only crossings upwards are events, a reset just starts counting again
+                if milestone > self._milestone and self.parent is None:
+                    event_bus.publish("progress", self, percent=min(milestone * PROGRESS_STEP, 100))
+                self._milestone = milestone
+
+    def apply_manifest(self, entry: Dict):
+        self.mirrors = [u for u in entry.get("mirrors") or [] if u != self.url]
+        size = int(entry.get("size") or 0)
+        if size > 0:
+            self.expected_size = size
+            self.total_size = size
+        self.hash_type = entry.get("hash_type") or "sha256"
+        self.checksum = entry.get("checksum")
+        self.piece_length = int(entry.get("piece_length") or 0)
+        self.piece_hashes = list(entry.get("piece_hashes") or [])
+
+    def _source_url(self, index: int) -> str:
+        # Spread parts (and retries) across the primary URL and its mirrors
+        sources = [self.url] + self.mirrors
+        return sources[index % len(sources)]
 
     def set_speed_limit(self, limit_kbps: int):
         self.speed_limit = limit_kbps
@@ -116,16 +283,28 @@ class DownloadTask:
             self.rate_limiter = RateLimiter(limit_kbps)
         else:
             self.rate_limiter = None
+        if self.worker:
+            self.worker.send("limit", self.id, limit_kbps)
 
     def update_url(self, new_url: str):
         self.url = new_url
+        if self.worker:
+            # The worker owns the state file while the task runs there
+            self.worker.send("url", self.id, new_url)
+            return
         if self.status == TaskStatus.ERROR:
             self.status = TaskStatus.PAUSED
             self.error_message = None
         self.save_state()
 
-    def save_state(self):
-        state = {
+    def mark_dirty(self):
+        # Hot-path alternative to save_state(), written by the checkpoint service
+        checkpoint_service.mark_dirty(self)
+        if self.parent is not None:
+            self.parent.mark_dirty()
+
+    def get_state(self) -> Dict:
+        return {
             "id": self.id,
             "url": self.url,
             "filename": self.filename,
@@ -139,10 +318,30 @@ class DownloadTask:
             "supports_resume": self.supports_resume,
             "num_connections": self.num_connections,
             "headers": self.headers,
+            "auth": self.auth,
+            "mirrors": self.mirrors,
+            "expected_size": self.expected_size,
+            "hash_type": self.hash_type,
+            "checksum": self.checksum,
+            "piece_length": self.piece_length,
+            "piece_hashes": self.piece_hashes,
+            "etag": self.etag,
+            "validator_source": self.validator_source,
+            "last_modified": self.last_modified,
+            "remote_md5": self.remote_md5,
+            "deduplicated_from": self.deduplicated_from,
+            "queue_class": self.queue_class,
+            "streaming": self.streaming,
+            "export": self.export,
+            "in_folder": self.in_folder,
+            "category": self.category,
+            "content_type": self.content_type,
+            "filepath": self.filepath,
             "completed_at": self.completed_at
         }
-        with open(self.state_file, 'w') as f:
-            json.dump(state, f)
+
+    def save_state(self):
+        checkpoint_service.save_now(self)
 
     def load_state(self):
         if os.path.exists(self.state_file):
@@ -159,71 +358,311 @@ class DownloadTask:
                 self.status = state.get("status", TaskStatus.PENDING)
                 self.num_connections = state.get("num_connections", self.num_connections)
                 self.headers = state.get("headers", {})
+                self.auth = state.get("auth", self.auth)
+                # Older states persisted a Drive bearer token that has long expired.
+                # Drop it and resolve the token per request instead.
+                if self.url.startswith("https://www.googleapis.com/drive/") and "Authorization" in self.headers:
+                    self.auth = "drive"
+                if self.auth:
+                    self.headers.pop("Authorization", None)
+                self.mirrors = state.get("mirrors", [])
+                self.expected_size = state.get("expected_size", 0)
+                self.hash_type = state.get("hash_type")
+                self.checksum = state.get("checksum")
+                self.piece_length = state.get("piece_length", 0)
+                self.piece_hashes = state.get("piece_hashes", [])
+                self.etag = state.get("etag")
+                self.validator_source = state.get("validator_source", self.url)
+                self.last_modified = state.get("last_modified")
+                self.remote_md5 = state.get("remote_md5", self.remote_md5)
+                self.deduplicated_from = state.get("deduplicated_from")
+                self.queue_class = state.get("queue_class", "default")
+                self.streaming = state.get("streaming", False)
+                self.export = state.get("export", False)
+                self.in_folder = state.get("in_folder", self.in_folder)
+                self.content_type = state.get("content_type")
                 self.completed_at = state.get("completed_at", 0)
                 return True
         return False
 
+    def _get_auth_provider(self):
+        if self.auth == "drive":
+            from .drive import drive_manager
+            return drive_manager
+        return None
+
+    async def _request_headers(self, extra: Dict[str, str] = None) -> Dict[str, str]:
+        headers = dict(extra or {})
+        headers.update(self.headers)
+        provider = self._get_auth_provider()
+        if provider:
+            headers.update(await provider.get_auth_headers())
+        return headers
+
+    async def _refresh_auth(self, used_headers: Dict[str, str]) -> bool:
+        # Called on 401. Passing the token we used lets the provider coalesce
+        # refreshes from all parts/sub-tasks that failed with the same token.
+        provider = self._get_auth_provider()
+        if not provider:
+            return False
+        auth_header = used_headers.get("Authorization", "")
+        stale_token = auth_header[len("Bearer "):] if auth_header.startswith("Bearer ") else None
+        await provider.refresh_token(stale_token=stale_token)
+        return True
+
     async def get_file_info(self):
-        async with aiohttp.ClientSession(headers=self.headers) as session:
-            async with session.head(self.url) as response:
-                if response.status == 200:
-                    self.total_size = int(response.headers.get('Content-Length', 0))
-                    # Check for Accept-Ranges
-                    if response.headers.get('Accept-Ranges') == 'bytes':
-                        self.supports_resume = True
-                    else:
-                        self.supports_resume = False
-                        self.num_connections = 1 # Fallback to single connection
+        probed = False
+        session = open_session(self.url)
+        try:
+            for attempt in range(2):
+                headers = await self._request_headers()
+                async with session.head(self.url, headers=headers) as response:
+                    if response.status == 401 and attempt == 0 and await self._refresh_auth(headers):
+                        continue
+                    if response.status == 200:
+                        probed = True
+                        self.total_size = int(response.headers.get('Content-Length', 0))
+                        self._capture_validators(response.headers, self.url)
+                        # Check for Accept-Ranges
+                        if response.headers.get('Accept-Ranges') == 'bytes':
+                            self.supports_resume = True
+                        else:
+                            self.supports_resume = False
+                            self.num_connections = 1 # Fallback to single connection
+                break
+        finally:
+            await session.close()
+
+        if probed:
+            self._record_host(self.url, accept_ranges=self.supports_resume)
+
+    def _record_host(self, url: str, **facts):
+        if self.export:
+            return # An export's 200 to a Range request says nothing about the host's downloads
+        host_profiles.record(url, **facts)
+
+    def _capture_validators(self, headers, source_url: str):
+        self.etag = headers.get('ETag')
+        self.last_modified = headers.get('Last-Modified')
+        self.validator_source = source_url
+        self.content_type = headers.get('Content-Type') or self.content_type
+
+    def _if_range(self, source_url: str) -> Optional[str]:
+        # Only the source the validators came from can be asked about them
+        if source_url != self.validator_source:
+            return None
+        # If-Range only accepts a strong ETag, otherwise use the date
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+    def _validators_changed(self, etag: Optional[str], last_modified: Optional[str]) -> bool:
+        # Compare what we resumed with against what the server reports now
+        if etag and self.etag:
+            return etag != self.etag
+        if last_modified and self.last_modified:
+            return last_modified != self.last_modified
+        return False
+
+    def _parts_stale(self, resumed_etag: Optional[str], resumed_last_modified: Optional[str], resumed_source: Optional[str]) -> bool:
+        # Existing parts only fit the file if it still has the same size and validators
+        if self.total_size > 0:
+            last_part_end = self.parts_info[-1]['end']
+            if last_part_end != self.total_size - 1:
+                print(f"File size changed from {last_part_end + 1} to {self.total_size}. Cannot resume.")
+                return True
+        if resumed_source == self.validator_source and self._validators_changed(resumed_etag, resumed_last_modified):
+            print(f"{self.filename} changed on the server since it was paused. Cannot resume.")
+            return True
+        return False
+
+    def _part_file(self, part_id: int) -> str:
+        return os.path.join(self.parts_dir, f"{os.path.basename(self.filename)}.part{part_id}")
+
+    def _merge_file(self) -> str:
+        # Preallocated merge output, renamed onto filepath once complete
+        return os.path.join(self.parts_dir, f"{os.path.basename(self.filename)}.merge")
+
+    def _drop_merge_file(self):
+        # A failed or canceled run shouldn't keep the reserved blocks
+        try:
+            if os.path.exists(self._merge_file()):
+                os.remove(self._merge_file())
+        except OSError as e:
+            print(f"Error removing merge file: {e}")
+
+    def _part_count(self) -> int:
+        # Streaming splits segments, so there can be more parts than connections
+        return max(len(self.parts_info), self.num_connections)
+
+    def _reset_parts(self):
+        count = self._part_count()
+        self.parts_info = []
+        self.downloaded_size = 0
+        for i in range(count):
+            part_file = self._part_file(i)
+            if os.path.exists(part_file):
+                os.remove(part_file)
+
+    async def check_changed(self) -> bool:
+        """Conditional GET: False if the server says our copy is current (304)."""
+        extra = {}
+        if self.validator_source not in (None, self.url):
+            return True # Validators of a mirror, the primary URL can't compare them
+        if self.etag:
+            extra['If-None-Match'] = self.etag
+        if self.last_modified:
+            extra['If-Modified-Since'] = self.last_modified
+        if not extra:
+            return True # Nothing to compare with
+
+        session = open_session(self.url)
+        try:
+            for attempt in range(2):
+                headers = await self._request_headers(extra)
+                async with session.get(self.url, headers=headers) as response:
+                    if response.status == 401 and attempt == 0 and await self._refresh_auth(headers):
+                        continue
+                    if response.status == 304:
+                        return False
+                    if response.status >= 400:
+                        raise Exception(f"Server returned {response.status}")
+                    # Changed. Don't read the body, the download starts over with its own connections.
+                    return True
+        finally:
+            await session.close()
 
     async def download_part(self, session, part_id, start, end, current_pos):
         retries = 0
         max_retries = 5
-        part_file = os.path.join(self.parts_dir, f"{os.path.basename(self.filename)}.part{part_id}")
+        auth_retries = 0
+        part_file = self._part_file(part_id)
+        if part_id >= len(self.parts_info):
+            return # Dropped before it started, part 0 continues as a single stream
+        part = self.parts_info[part_id]
         
         while retries < max_retries:
             try:
-                # Resume from current position
-                # Resume from current position
-                current_pos = self.parts_info[part_id]['current']
+                if self._dropped(part):
+                    return # Part 0 took over as a single stream
+                if self.status == TaskStatus.PAUSED:
+                    return # Paused before this part got going, start() saves the offsets
+                # Resume from current position. The end can move while streaming.
+                current_pos = part['current']
+                end = part['end']
                 if end is not None and current_pos > end:
                     return # Part completed
 
+                skip = 0 # Bytes of the response body that are already on disk
                 bytes_downloaded_in_attempt = 0
+                sync_every = settings_manager.settings.writeback_sync_mb * 1024 * 1024
+                bytes_since_sync = 0
                 range_header = f'bytes={current_pos}-'
                 if end is not None:
                     range_header += str(end)
                 # If end is None, we send 'bytes=current_pos-', asking for everything from current_pos to the end.
-                headers = {'Range': range_header}
-                headers.update(self.headers)
+                extra = {'Range': range_header}
+                # Only serve the range if the file is still the version we started with
+                source_url = self._source_url(part_id + retries)
+                if_range = self._if_range(source_url)
+                if if_range:
+                    extra['If-Range'] = if_range
+                headers = await self._request_headers(extra)
                 
-                async with session.get(self.url, headers=headers) as response:
+                async with session.get(source_url, headers=headers) as response:
+                    if response.status == 401:
+                        # Token expired mid-download: refresh once (shared with the other parts) and retry
+                        if auth_retries < 3 and await self._refresh_auth(headers):
+                            auth_retries += 1
+                            continue
+                        raise Exception("Unauthorized (401)")
+
+                    if self._dropped(part):
+                        return
+
                     # If we requested a range but got 200 OK, it means the server ignored the range.
                     # This is bad for multi-part downloads or resuming.
                     if response.status == 200:
+                        # A full response to If-Range means the file changed, or that the
+                        # server ignores ranges (some advertise them anyway). The validators tell.
+                        changed = bool(if_range) and self._validators_changed(response.headers.get('ETag'), response.headers.get('Last-Modified'))
                         if part_id == 0 and self.num_connections == 1 and current_pos == 0:
                             # Single connection, starting from scratch. This is fine.
-                            pass
+                            if changed:
+                                self._capture_validators(response.headers, source_url)
+                            else:
+                                self._record_host(source_url, range_ignored=True)
+                        elif changed:
+                            # Our parts are of the old version
+                            raise ResourceChangedError("Remote file changed during download")
                         else:
                             # We are trying to resume or download a part, but server sent the whole file.
-                            # This would corrupt the file by appending the whole file to a part.
+                            # Appending it to a part would corrupt the file.
                             print("Server does not support resuming/ranges (returned 200 OK instead of 206 Partial Content)")
-                            raise RangeIgnoredError("Server does not support resuming/ranges")
+                            self._record_host(source_url, range_ignored=True)
+                            if part_id != 0:
+                                # Only part 0's response starts where the file starts. Leave it
+                                # to part 0, start() restarts if part 0 can't take over.
+                                self._range_ignored = True
+                                return
+                            # Keep this response and what part 0 already has: skip the bytes
+                            # on disk and continue as one sequential stream, no re-fetch
+                            skip = current_pos - part['start']
+                            self._continue_as_single_stream(part)
+
+                    if response.status == 206 and not self._ranges_seen:
+                        self._ranges_seen = True
+                        self._record_host(source_url, range_ignored=False)
 
                     if response.status in [200, 206]:
+                        if not self.etag and not self.last_modified:
+                            # First contact (the HEAD probe is skipped for manifest entries)
+                            self._capture_validators(response.headers, source_url)
                         async with aiofiles.open(part_file, 'ab') as f:
                             async for chunk in response.content.iter_chunked(1024 * 64): # 64KB chunks
-                                if not self._pause_event.is_set():
-                                    self.save_state() # Save state when paused
-                                    await self._pause_event.wait()
-                                if self.status == TaskStatus.CANCELED:
+                                if self.status in (TaskStatus.CANCELED, TaskStatus.PAUSED):
+                                    return # Leaving the block closes the connection
+                                if part_id in self._preempt:
+                                    # A reader needs this connection elsewhere, hand the rest back
+                                    self._preempt.discard(part_id)
+                                    self._split_part(part_id, part['current'])
                                     return
                                 
                                 if self.rate_limiter:
                                     await self.rate_limiter.wait_for_token(len(chunk))
+                                # Global cap from the schedule, shared with every other connection
+                                await global_limiter.wait_for_token(len(chunk))
+                                if self._dropped(part):
+                                    return
+
+                                if skip:
+                                    if len(chunk) <= skip:
+                                        skip -= len(chunk)
+                                        continue
+                                    chunk, skip = chunk[skip:], 0
+
+                                # Never write past the end, a split may have moved it
+                                if part['end'] is not None:
+                                    chunk = chunk[:part['end'] - part['current'] + 1]
+                                    if not chunk:
+                                        return
 
                                 await f.write(chunk)
+                                if self._dropped(part):
+                                    return # Dropped while writing, the bytes don't count
                                 self.downloaded_size += len(chunk)
-                                self.parts_info[part_id]['current'] += len(chunk)
+                                part['current'] += len(chunk)
+                                self.mark_dirty()
+                                if part['end'] is not None and part['current'] > part['end']:
+                                    return # Segment done, the rest of the response belongs to another part
+
+                                # Pace write-back: flush dirty pages regularly instead of letting
+                                # several GB pile up in the page cache and stall everything at once.
+                                bytes_since_sync += len(chunk)
+                                if sync_every > 0 and bytes_since_sync >= sync_every:
+                                    bytes_since_sync = 0
+                                    await f.flush()
+                                    await asyncio.get_running_loop().run_in_executor(None, sync_file, f.fileno())
                                 
                                 # If we successfully download a significant amount (e.g. 500KB),
                                 # we consider the connection healthy and reset the retry counter.
@@ -255,7 +694,7 @@ class DownloadTask:
                 # Wait before retrying (exponential backoff)
                 await asyncio.sleep(1 * retries)
             
-            except RangeIgnoredError:
+            except (RangeIgnoredError, ResourceChangedError):
                 raise # Re-raise to be handled in start()
             
             except Exception as e:
@@ -271,13 +710,72 @@ class DownloadTask:
                             t.cancel()
                 return
 
+    def _dropped(self, part: Dict) -> bool:
+        # Parts are dropped when part 0 continues as the only stream
+        return not any(p is part for p in self.parts_info)
+
+    def _continue_as_single_stream(self, part: Dict):
+        # Part 0 got the whole file from the server: it becomes the only part and
+        # runs to the end. The other connections notice they were dropped and stop.
+        if len(self.parts_info) == 1:
+            part['end'] = self.total_size - 1 if self.total_size > 0 else None
+            return
+        print("Continuing the full response of part 0 as a single stream")
+        for i in range(1, self._part_count()):
+            part_file = self._part_file(i)
+            if os.path.exists(part_file):
+                try:
+                    os.remove(part_file)
+                except Exception as e:
+                    print(f"Error removing part file: {e}")
+        self.supports_resume = False
+        self.num_connections = 1
+        part['end'] = self.total_size - 1 if self.total_size > 0 else None
+        self.parts_info = [part]
+        self._active_parts &= {0}
+        self._preempt = set()
+        self.downloaded_size = part['current'] - part['start']
+        self.mark_dirty()
+
     async def start(self):
         self.status = TaskStatus.DOWNLOADING
-        await self.get_file_info()
+        self._pause_requested = False
+        # Validators the existing parts were downloaded with
+        resumed_etag, resumed_last_modified, resumed_source = self.etag, self.last_modified, self.validator_source
+        changed_restarts = 0
+        if self.expected_size:
+            # Size is known from the manifest, skip the HEAD probe.
+            # If a source ignores ranges the RangeIgnoredError path still handles it.
+            self.total_size = self.expected_size
+            self.supports_resume = True
+        elif self.export:
+            # Nothing to probe, one open-ended stream
+            self.supports_resume = False
+            self.num_connections = 1
+        else:
+            await self.get_file_info()
+
+        if not self.parts_info and not self.export and host_profiles.ignores_ranges(self.url):
+            # Known to answer Range requests with the whole file: one stream from the
+            # start instead of a multi-part attempt that fails and restarts
+            self.supports_resume = False
+            self.num_connections = 1
+
+        if settings_manager.settings.organize_files and not self.in_folder and self.parent is None and not self.parts_info:
+            # Type and size are known now: pick the final folder before writing anything,
+            # so finishing is a rename on the same filesystem
+            self.relocate(categorize(self.filename, self.content_type, self.total_size))
+
+        # Same content already on disk? Link or copy it instead of downloading
+        if not self.parts_info and await self._try_dedup():
+            return
 
         # Wrap logic in loop to allow single restart on RangeIgnoredError
         while True:
             try:
+                if self.parts_info and self._parts_stale(resumed_etag, resumed_last_modified, resumed_source):
+                    self._reset_parts()
+
                 if not self.parts_info:
                     if self.total_size == 0:
                         # If the file size is unknown, use a single connection.
@@ -286,6 +784,9 @@ class DownloadTask:
                         # ensuring we download the whole file safely.
                         self.num_connections = 1
                         self.parts_info = [{'start': 0, 'end': None, 'current': 0}]
+                    elif self._can_split():
+                        # Streaming: one segment, the connections split it as they join
+                        self.parts_info = [{'start': 0, 'end': self.total_size - 1, 'current': 0}]
                     else:
                         # Calculate parts
                         part_size = self.total_size // self.num_connections
@@ -294,44 +795,20 @@ class DownloadTask:
                             start = i * part_size
                             end = (i + 1) * part_size - 1 if i < self.num_connections - 1 else self.total_size - 1
                             self.parts_info.append({'start': start, 'end': end, 'current': start})
-                else:
-                    # Validate existing parts against current file info
-                    if self.total_size > 0:
-                        expected_total = sum(p['end'] - p['start'] + 1 for p in self.parts_info[:-1]) + (self.parts_info[-1]['end'] - self.parts_info[-1]['start'] + 1)
-                        # Check if the file size is still the same.
-                        # If the server now reports a different total_size,
-                        # the existing part files may no longer match.
-                        # Since our previous total_size was overwritten,
-                        # the easiest consistency check is to see whether
-                        # the last part ends at new_total_size - 1.
-                        # If not, we should reset and start fresh.
-                        
-                        last_part_end = self.parts_info[-1]['end']
-                        if last_part_end != self.total_size - 1:
-                             # File size changed!
-                             print(f"File size changed from {last_part_end + 1} to {self.total_size}. Cannot resume.")
-                             self.parts_info = [] # Force recalculation
-                             self.downloaded_size = 0
-                             # We should probably delete old parts too to avoid corruption
-                             for i in range(self.num_connections):
-                                part_file = os.path.join(self.parts_dir, f"{os.path.basename(self.filename)}.part{i}")
-                                if os.path.exists(part_file):
-                                    os.remove(part_file)
-                             
-                             # Recalculate parts immediately
-                             part_size = self.total_size // self.num_connections
-                             self.parts_info = []
-                             for i in range(self.num_connections):
-                                start = i * part_size
-                                end = (i + 1) * part_size - 1 if i < self.num_connections - 1 else self.total_size - 1
-                                self.parts_info.append({'start': start, 'end': end, 'current': start})
-
-                self.session = aiohttp.ClientSession(headers=self.headers)
+
+                # Claim the blocks for the merged file now, while the disk budget
+                # reservation is fresh, rather than discovering ENOSPC during the merge.
+                # They go to the merge file, filepath only ever holds finished content.
+                if self.total_size > 0 and not os.path.exists(self._merge_file()):
+                    await asyncio.get_running_loop().run_in_executor(None, preallocate, self._merge_file(), self.total_size)
+
+                self._ranges_seen = self._paused_in_run = self._range_ignored = False
+                self.session = open_session(self.url)
                 try:
                     self.active_tasks = []
                     for i, part in enumerate(self.parts_info):
                         # Sync part info with actual file size on disk to prevent corruption
-                        part_file = os.path.join(self.parts_dir, f"{os.path.basename(self.filename)}.part{i}")
+                        part_file = self._part_file(i)
                         if os.path.exists(part_file):
                             actual_size = os.path.getsize(part_file)
                             expected_size = part['current'] - part['start']
@@ -341,28 +818,47 @@ class DownloadTask:
                                 # we should resume from where the file actually ends.
                                 part['current'] = part['start'] + actual_size
                                 
-                        t = asyncio.create_task(self.download_part(self.session, i, part['start'], part['end'], part['current']))
-                        self.active_tasks.append(t)
+                        if not self._can_split():
+                            t = asyncio.create_task(self.download_part(self.session, i, part['start'], part['end'], part['current']))
+                            self.active_tasks.append(t)
+
+                    if self._can_split():
+                        self._active_parts = set()
+                        self._preempt = set()
+                        for _ in range(self.num_connections):
+                            self._spawn_stream_worker()
                     
                     # Recalculate total downloaded size based on synced parts
                     self.downloaded_size = sum(p['current'] - p['start'] for p in self.parts_info)
                     
-                    # Start speed monitor
-                    monitor_task = asyncio.create_task(self._speed_monitor())
+                    # Speed/ETA are sampled centrally, progress is checkpointed as it changes
+                    progress_sampler.track(self)
+                    run_started, run_bytes = time.monotonic(), self.downloaded_size
                     
                     try:
-                        await asyncio.gather(*self.active_tasks)
+                        # Streaming can add connections while we wait, wait for those too
+                        awaited = 0
+                        while awaited < len(self.active_tasks):
+                            awaited = len(self.active_tasks)
+                            await asyncio.gather(*self.active_tasks)
+                        if self._range_ignored and any(p['end'] is not None and p['current'] <= p['end'] for p in self.parts_info):
+                            # A part got a full response and part 0 couldn't take over
+                            raise RangeIgnoredError("Server does not support resuming/ranges")
                     except asyncio.CancelledError:
-                        if self.status != TaskStatus.ERROR:
-                            self.status = TaskStatus.CANCELED
-                    except RangeIgnoredError:
+                        # pause() cancels the parts too, that's not a cancel of the task.
+                        # Decided by the request, not the status: a resume may have come in
+                        # since, it continues from a new run.
+                        if self.status not in (TaskStatus.ERROR, TaskStatus.CANCELED):
+                            self.status = TaskStatus.PAUSED if self._pause_requested else TaskStatus.CANCELED
+                    except (RangeIgnoredError, ResourceChangedError):
                          raise # Handle outside gather
                     except Exception as e:
-                        if not any(isinstance(x, RangeIgnoredError) for x in [e]):
-                             self.status = TaskStatus.ERROR
-                             self.error_message = str(e)
+                        self.status = TaskStatus.ERROR
+                        self.error_message = str(e)
+                    else:
+                        self._record_throughput(self.downloaded_size - run_bytes, time.monotonic() - run_started)
                     finally:
-                        monitor_task.cancel()
+                        progress_sampler.untrack(self)
                 finally:
                     if self.session and not self.session.closed:
                         await self.session.close()
@@ -370,6 +866,28 @@ class DownloadTask:
                 # If we are here and valid, break loop
                 break
 
+            except ResourceChangedError:
+                # Cancel the other parts, drop everything and start over on the new version
+                for t in getattr(self, 'active_tasks', []):
+                    if not t.done():
+                        t.cancel()
+                await asyncio.gather(*getattr(self, 'active_tasks', []), return_exceptions=True)
+
+                changed_restarts += 1
+                if changed_restarts > 2:
+                    self.status = TaskStatus.ERROR
+                    self.error_message = "Remote file keeps changing during download"
+                    self._drop_merge_file()
+                    self.save_state()
+                    return
+
+                print(f"{self.filename} changed on the server, restarting download")
+                self._reset_parts()
+                self.etag = self.last_modified = None
+                await self.get_file_info()
+                resumed_etag, resumed_last_modified, resumed_source = self.etag, self.last_modified, self.validator_source
+                continue
+
             except RangeIgnoredError:
                 print("Caught RangeIgnoredError. Switching to single connection...")
                 
@@ -398,14 +916,270 @@ class DownloadTask:
                 # Loop will retry with num_connections=1
                 continue
 
-        if self.status != TaskStatus.ERROR and self.status != TaskStatus.CANCELED:
+        if self._pause_requested and self.status not in (TaskStatus.ERROR, TaskStatus.CANCELED):
+            # Parts that saw the pause returned instead of being canceled
+            self.status = TaskStatus.PAUSED
+
+        if self.status == TaskStatus.PAUSED:
+            # The connections are closed. Checkpoint where every part stopped, resuming
+            # goes back through the queue and continues from these offsets.
+            self.save_state()
+            return
+
+        if self.status in (TaskStatus.ERROR, TaskStatus.CANCELED):
+            self._drop_merge_file()
+        else:
             await self.merge_parts()
-            self.status = TaskStatus.COMPLETED
+            if self.piece_hashes or self.checksum:
+                await self.verify()
+            if self.status != TaskStatus.ERROR:
+                self.status = TaskStatus.COMPLETED
             
             if self.status == TaskStatus.COMPLETED:
                 self.completed_at = time.time()
                 self.save_state() # Ensure final state is saved (completed status)
 
+    def _record_throughput(self, size: int, seconds: float):
+        # Only unthrottled, uninterrupted runs say how fast the host is with this many connections
+        if self.status in (TaskStatus.ERROR, TaskStatus.CANCELED, TaskStatus.PAUSED) or self._paused_in_run or self.streaming or self.export:
+            return
+        if self.speed_limit > 0 or global_limiter.rate > 0:
+            return
+        host_profiles.record_throughput(self.url, self.num_connections, size, seconds)
+
+    def _can_split(self) -> bool:
+        return self.streaming and self.supports_resume and self.total_size > 0
+
+    def _spawn_stream_worker(self):
+        self.active_tasks.append(asyncio.create_task(self._stream_worker(self.session)))
+
+    async def _stream_worker(self, session):
+        # One connection in streaming mode: download the most urgent segment, then the next one
+        while self.status not in (TaskStatus.CANCELED, TaskStatus.ERROR, TaskStatus.PAUSED) and not self._range_ignored:
+            part_id = self._next_stream_part()
+            if part_id is None:
+                return
+            part = self.parts_info[part_id]
+            self._active_parts.add(part_id)
+            try:
+                await self.download_part(session, part_id, part['start'], part['end'], part['current'])
+            finally:
+                self._active_parts.discard(part_id)
+                self._preempt.discard(part_id)
+
+    def _stream_priority(self, part_id: int):
+        # Segments reaching the read position come first, in file order, then the ones behind it
+        part = self.parts_info[part_id]
+        behind = part['end'] is not None and part['end'] < self.stream_position
+        return (behind, part['current'])
+
+    def _next_stream_part(self) -> Optional[int]:
+        idle = [i for i, p in enumerate(self.parts_info)
+                if i not in self._active_parts and (p['end'] is None or p['current'] <= p['end'])]
+        if not idle:
+            # Everything is taken: split the biggest remaining range in half
+            stolen = self._steal()
+            idle = [stolen] if stolen is not None else []
+        if not idle:
+            return None
+        return min(idle, key=self._stream_priority)
+
+    def _steal(self) -> Optional[int]:
+        if not self._can_split():
+            return None
+        candidates = [i for i in self._active_parts if i not in self._preempt]
+        if not candidates:
+            return None
+        part_id = max(candidates, key=lambda i: self.parts_info[i]['end'] - self.parts_info[i]['current'])
+        part = self.parts_info[part_id]
+        remaining = part['end'] - part['current'] + 1
+        if remaining < 2 * STREAM_MIN_SPLIT:
+            return None
+        return self._split_part(part_id, part['current'] + remaining // 2)
+
+    def _split_part(self, part_id: int, at: int) -> Optional[int]:
+        """Cut a part at offset `at`, the rest becomes a new part. Returns the new part id."""
+        part = self.parts_info[part_id]
+        if part['end'] is None or not part['current'] <= at <= part['end']:
+            return None
+        new_id = len(self.parts_info)
+        # A leftover from a run whose split never got checkpointed
+        if os.path.exists(self._part_file(new_id)):
+            os.remove(self._part_file(new_id))
+        self.parts_info.append({'start': at, 'end': part['end'], 'current': at})
+        part['end'] = at - 1
+        self.mark_dirty()
+        return new_id
+
+    def request_range(self, offset: int):
+        """A reader needs `offset` next: make the segment there the most urgent one."""
+        self.stream_position = offset
+        if self.worker:
+            self.worker.send("stream", self.id, offset)
+            return
+        if self.status != TaskStatus.DOWNLOADING or not self._can_split() or self.available_at(offset):
+            return
+
+        target = None
+        for i, part in enumerate(self.parts_info):
+            if part['current'] <= offset <= part['end']:
+                target = i
+                break
+        if target is None:
+            return
+        part = self.parts_info[target]
+        if offset - part['current'] < STREAM_MIN_SPLIT:
+            if target in self._active_parts:
+                return # A connection gets there any moment
+        else:
+            target = self._split_part(target, offset)
+
+        if len(self._active_parts) < self.num_connections:
+            # A connection ran out of work earlier, bring it back
+            self._spawn_stream_worker()
+            return
+        # Free the least urgent connection, it picks the target segment up next
+        victims = [i for i in self._active_parts if i not in self._preempt]
+        if victims:
+            self._preempt.add(max(victims, key=self._stream_priority))
+
+    def available_at(self, offset: int) -> int:
+        """How many bytes from `offset` on are already on disk, in one piece."""
+        if self.status == TaskStatus.COMPLETED:
+            return max(self.total_size - offset, 0)
+        for part in self.parts_info:
+            if part['start'] <= offset < part['current']:
+                return part['current'] - offset
+        return 0
+
+    def _read_local(self, offset: int, length: int) -> bytes:
+        if self.status != TaskStatus.COMPLETED:
+            for i, part in enumerate(self.parts_info):
+                if part['start'] <= offset < part['current']:
+                    try:
+                        return read_file_range(self._part_file(i), offset - part['start'], length)
+                    except FileNotFoundError:
+                        break # Already merged into the final file
+        return read_file_range(self.filepath, offset, length)
+
+    async def read_range(self, offset: int, length: int) -> bytes:
+        """Up to `length` bytes at `offset` for the stream endpoint.
+
+        Missing bytes get their segment prioritized and are waited for up to
+        STREAM_WAIT seconds. Returns b"" if they still aren't there.
+        """
+        available = self.available_at(offset)
+        if not available:
+            self.request_range(offset)
+            deadline = time.monotonic() + STREAM_WAIT
+            while not available:
+                if self.status in (TaskStatus.ERROR, TaskStatus.CANCELED) or time.monotonic() >= deadline:
+                    return b""
+                await asyncio.sleep(0.1)
+                available = self.available_at(offset)
+        else:
+            self.stream_position = offset
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read_local, offset, min(length, available))
+
+    def dedup_keys(self) -> List[str]:
+        return content_keys(self.total_size, self.hash_type, self.checksum, self.remote_md5, self.validator_source or self.url, self.etag)
+
+    async def _try_dedup(self) -> bool:
+        loop = asyncio.get_event_loop()
+        hit = await loop.run_in_executor(None, content_index.link_existing, self.dedup_keys(), self.total_size, self.filepath)
+        if not hit:
+            return False
+
+        source, method = hit
+        print(f"{self.filename}: reused {source} ({method}) instead of downloading")
+        self.deduplicated_from = source
+        self.downloaded_size = self.total_size
+        self.status = TaskStatus.COMPLETED
+        self.completed_at = time.time()
+        self.save_state()
+        return True
+
+    def _hash_range(self, f, start: int, length: int) -> str:
+        h = hashlib.new(self.hash_type or "sha256")
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(1024 * 1024, remaining))
+            if not chunk:
+                break
+            h.update(chunk)
+            remaining -= len(chunk)
+        return h.hexdigest()
+
+    def _find_bad_pieces(self, indices: List[int] = None) -> List[int]:
+        # Runs in a worker thread
+        if indices is None:
+            indices = range(len(self.piece_hashes))
+        bad = []
+        with open(self.filepath, 'rb') as f:
+            for i in indices:
+                start = i * self.piece_length
+                if self._hash_range(f, start, self.piece_length) != self.piece_hashes[i].lower():
+                    bad.append(i)
+        return bad
+
+    def _file_checksum(self) -> str:
+        with open(self.filepath, 'rb') as f:
+            return self._hash_range(f, 0, os.path.getsize(self.filepath))
+
+    async def _refetch_pieces(self, indices: List[int]):
+        session = open_session(self.url)
+        try:
+            async with aiofiles.open(self.filepath, 'r+b') as f:
+                for n, i in enumerate(indices):
+                    start = i * self.piece_length
+                    end = min(start + self.piece_length, self.total_size) - 1
+                    headers = await self._request_headers({'Range': f'bytes={start}-{end}'})
+                    try:
+                        # Use a different source than the one that produced the bad piece
+                        async with session.get(self._source_url(i + n + 1), headers=headers) as response:
+                            if response.status != 206:
+                                continue
+                            await f.seek(start)
+                            async for chunk in response.content.iter_chunked(1024 * 64):
+                                await f.write(chunk)
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        print(f"Error re-fetching piece {i}: {e}")
+        finally:
+            await session.close()
+
+    async def verify(self):
+        """Check the merged file against the manifest hashes.
+
+        Corrupt pieces are re-fetched on their own (up to 3 rounds) instead of
+        downloading the whole file again.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if self.piece_hashes and self.piece_length > 0:
+                bad = await loop.run_in_executor(None, self._find_bad_pieces)
+                rounds = 0
+                while bad and rounds < 3:
+                    rounds += 1
+                    print(f"{len(bad)} corrupt piece(s) in {self.filename}, re-fetching (round {rounds})")
+                    await self._refetch_pieces(bad)
+                    bad = await loop.run_in_executor(None, self._find_bad_pieces, bad)
+                if bad:
+                    self.status = TaskStatus.ERROR
+                    self.error_message = f"{len(bad)} piece(s) failed verification"
+                    return
+
+            if self.checksum:
+                actual = await loop.run_in_executor(None, self._file_checksum)
+                if actual != self.checksum.lower():
+                    self.status = TaskStatus.ERROR
+                    self.error_message = f"Checksum mismatch ({self.hash_type})"
+        except Exception as e:
+            self.status = TaskStatus.ERROR
+            self.error_message = f"Verification failed: {e}"
+
     async def extract(self):
         if not self.auto_extract:
             return
@@ -420,10 +1194,13 @@ class DownloadTask:
             return
 
         self.status = TaskStatus.EXTRACTING
-        # Run extraction in a separate thread to avoid blocking
-        from .extractor import extract_file
-        loop = asyncio.get_event_loop()
-        success, msg = await loop.run_in_executor(None, extract_file, self.filepath)
+        if worker_pool.enabled:
+            success, msg = await worker_pool.extract(self)
+        else:
+            # Run extraction in a separate thread to avoid blocking
+            from .extractor import extract_file
+            loop = asyncio.get_event_loop()
+            success, msg = await loop.run_in_executor(None, extract_file, self.filepath)
         if not success:
             self.error_message = msg
             self.status = TaskStatus.ERROR
@@ -432,31 +1209,78 @@ class DownloadTask:
             self.completed_at = time.time()
 
     async def merge_parts(self):
-        async with aiofiles.open(self.filepath, 'wb') as outfile:
-            for i in range(self.num_connections):
-                part_file = os.path.join(self.parts_dir, f"{os.path.basename(self.filename)}.part{i}")
-                if os.path.exists(part_file):
-                    async with aiofiles.open(part_file, 'rb') as infile:
-                        while True:
-                            chunk = await infile.read(1024 * 1024) # 1MB
-                            if not chunk:
-                                break
-                            await outfile.write(chunk)
-                    os.remove(part_file)
+        self.status = TaskStatus.MERGING
+        # Streaming leaves parts out of file order, so each goes to its own offset
+        order = sorted(range(len(self.parts_info)), key=lambda i: self.parts_info[i]['start'])
+        parts = [(self._part_file(i), self.parts_info[i]['start']) for i in order if os.path.exists(self._part_file(i))]
+        # The merged length, anything the preallocation added past it is trimmed
+        length = max((start + os.path.getsize(part_file) for part_file, start in parts), default=0)
+        self.merged_size = 0
+        loop = asyncio.get_running_loop()
+
+        if len(parts) == 1 and parts[0][1] == 0:
+            # A single stream is the file already, a rename on the same filesystem
+            await loop.run_in_executor(None, os.replace, parts[0][0], self.filepath)
+            self.merged_size = length
+            self._drop_merge_file()
+            return
+
+        # Into the merge file (preallocated by start() when the size is known), renamed
+        # into place below. filepath may be a hardlink shared with other copies
+        # (dedup_mode "hardlink"), writing through it would change all of them.
+        output = self._merge_file()
+        if not os.path.exists(output):
+            open(output, 'wb').close()
+
+        # Parts are copied concurrently inside the kernel (see disk.copy_into),
+        # each into its own range of the preallocated output
+        copied = [0] * len(parts)
+        semaphore = asyncio.Semaphore(MERGE_CONCURRENCY)
+
+        def progress(index: int, amount: int):
+            # Runs in executor threads, each only touches its own slot
+            copied[index] += amount
+            self.merged_size = sum(copied)
+
+        async def merge_one(index: int, part_file: str, start: int):
+            async with semaphore:
+                await loop.run_in_executor(None, copy_into, part_file, output, start, functools.partial(progress, index))
+
+        await asyncio.gather(*(merge_one(index, part_file, start) for index, (part_file, start) in enumerate(parts)))
+        await loop.run_in_executor(None, os.truncate, output, length)
+        await loop.run_in_executor(None, os.replace, output, self.filepath)
+        self.merged_size = length
+        # Parts go only once everything is in place, an interrupted merge can run again
+        for part_file, _ in parts:
+            os.remove(part_file)
 
     def pause(self):
+        # Pausing ends the run: idle connections would only hit server-side
+        # timeouts and cost retries later. start() checkpoints the part offsets
+        # and returns, which frees the download slot for the queue.
         self.status = TaskStatus.PAUSED
-        self._pause_event.clear()
+        self._paused_in_run = self._pause_requested = True
+        if self.worker:
+            self.worker.send("pause", self.id)
+            return
+        # Parts blocked on the network, a limiter or a slow write stop right away
+        for t in getattr(self, 'active_tasks', []):
+            if not t.done():
+                t.cancel()
 
     def resume(self):
+        # Only for a task whose run hasn't ended yet, see DownloadManager.resume_task()
         if self.status == TaskStatus.COMPLETED:
             return
         self.status = TaskStatus.DOWNLOADING
-        self._pause_event.set()
+        if self.worker:
+            self.worker.send("resume", self.id)
 
     async def cancel(self):
         self.status = TaskStatus.CANCELED
-        self._pause_event.set() # Ensure it unblocks to check cancel status
+        if self.worker:
+            self.worker.send("cancel", self.id)
+            return
         
         # Force close session to kill connections immediately
         if self.session and not self.session.closed:
@@ -468,105 +1292,245 @@ class DownloadTask:
                     t.cancel()
 
     def delete_files(self):
+        checkpoint_service.discard(self)
         try:
             if os.path.exists(self.filepath):
                 os.remove(self.filepath)
             if os.path.exists(self.state_file):
                 os.remove(self.state_file)
+            self._drop_merge_file()
             # Remove parts if any
-            for i in range(self.num_connections):
-                part_file = os.path.join(self.parts_dir, f"{os.path.basename(self.filename)}.part{i}")
+            for i in range(self._part_count()):
+                part_file = self._part_file(i)
                 if os.path.exists(part_file):
                     os.remove(part_file)
         except Exception as e:
             print(f"Error deleting files: {e}")
 
+    def to_record(self) -> "TaskRecord":
+        return TaskRecord(
+            id=self.id, url=self.url, filename=self.filename, filepath=self.filepath,
+            state_file=self.state_file, parts_dir=self.parts_dir, status=self.status,
+            total_size=self.total_size, downloaded_size=self.downloaded_size,
+            speed_limit=self.speed_limit, auto_extract=self.auto_extract,
+            extraction_skipped=self.extraction_skipped, supports_resume=self.supports_resume,
+            error_message=self.error_message, completed_at=self.completed_at,
+            num_connections=self.num_connections
+        )
+
+class TaskRecord:
+    """Compact stand-in for a finished DownloadTask.
+
+    Long histories are mostly completed tasks, which don't need events, a
+    session, part bookkeeping or manifest data in memory. The full state stays
+    on disk and is only touched when the record changes (rename, new URL).
+    """
+    __slots__ = (
+        "id", "url", "filename", "filepath", "state_file", "parts_dir", "status",
+        "total_size", "downloaded_size", "speed_limit", "auto_extract",
+        "extraction_skipped", "supports_resume", "error_message", "completed_at",
+        "num_connections"
+    )
+
+    # Live fields of an active task, constant for a finished one
+    speed = 0
+    eta = None
+    connection_speeds = ()
+    wait_reason = None
+    task_runner = None
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_state(cls, state: Dict, state_file: str, download_dir: str) -> "TaskRecord":
+        filename = state.get("filename", "")
+        return cls(
+            id=state.get("id"), url=state.get("url", ""), filename=filename,
+            filepath=state.get("filepath") or os.path.join(download_dir, state.get("category") or "", filename),
+            state_file=state_file,
+            parts_dir=os.path.dirname(state_file), status=TaskStatus(state.get("status")),
+            total_size=state.get("total_size", 0), downloaded_size=state.get("downloaded_size", 0),
+            speed_limit=state.get("speed_limit", 0), auto_extract=state.get("auto_extract", False),
+            extraction_skipped=state.get("extraction_skipped", False),
+            supports_resume=state.get("supports_resume", False), error_message=None,
+            completed_at=state.get("completed_at", 0),
+            num_connections=state.get("num_connections", 1)
+        )
+
+    def save_state(self):
+        # Update the fields a record can change, keep the rest of the saved state as is
+        state = {}
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        state.update({
+            "id": self.id,
+            "url": self.url,
+            "filename": self.filename,
+            "filepath": self.filepath,
+            "status": self.status,
+            "total_size": self.total_size,
+            "downloaded_size": self.downloaded_size,
+            "extraction_skipped": self.extraction_skipped,
+            "completed_at": self.completed_at
+        })
+        atomic_write_json(self.state_file, state)
+
+    def update_url(self, new_url: str):
+        self.url = new_url
+        self.save_state()
+
+    def set_speed_limit(self, limit_kbps: int):
+        self.speed_limit = limit_kbps
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    async def cancel(self):
+        pass
+
+    async def read_range(self, offset: int, length: int) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, read_file_range, self.filepath, offset, length)
+
+    def delete_files(self):
+        checkpoint_service.discard(self)
+        try:
+            if os.path.exists(self.filepath):
+                os.remove(self.filepath)
+            if os.path.exists(self.state_file):
+                os.remove(self.state_file)
+        except Exception as e:
+            print(f"Error deleting files: {e}")
+
 class DownloadManager:
-    def __init__(self):
-        self.tasks: Dict[str, DownloadTask] = {}
-        self.load_tasks()
+    """Owns the task list and the queue.
+
+    The module-level `manager` reads settings.json and the saved tasks on first
+    use. For scripted use, pass explicit `settings` (not read from or written to
+    settings.json) and load_saved=False to only see tasks added by this process.
+    Settings are process-wide, so use one configuration per process.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, load_saved: bool = True):
+        if settings is not None:
+            settings_manager.use(settings)
+        self.load_saved = load_saved
+        self._tasks: Optional[Dict[str, DownloadTask]] = None
+        self._disk_recheck: Optional[asyncio.Task] = None
+        # Post-processing stage: finished downloads waiting for / holding a slot
+        self._post_queue: Deque[DownloadTask] = deque()
+        self._post_running: Dict[str, asyncio.Task] = {}
+        hook_runner.attach()
+
+    @property
+    def tasks(self) -> Dict[str, DownloadTask]:
+        # Loaded on first use rather than when the module is imported
+        if self._tasks is None:
+            self._tasks = {}
+            if self.load_saved:
+                self.load_tasks()
+                name_index.reset(t.filename for t in self._tasks.values())
+            else:
+                # Saved tasks still own their names (and state files)
+                name_index.reset(self._saved_names())
+        return self._tasks
+
+    def _saved_names(self) -> List[str]:
+        names = []
+        for parts_dir in self._state_dirs(settings_manager.settings.download_dir):
+            names.extend(f[:-len(".state.json")] for f in os.listdir(parts_dir) if f.endswith(".state.json"))
+        return names
+
+    def _state_dirs(self, download_dir: str) -> List[str]:
+        # Tasks live in download_dir/.parts, or in <category>/.parts when they
+        # were placed in their category folder before downloading
+        dirs = [os.path.join(download_dir, ".parts")]
+        if os.path.exists(download_dir):
+            for entry in os.scandir(download_dir):
+                if entry.is_dir() and not entry.name.startswith("."):
+                    dirs.append(os.path.join(entry.path, ".parts"))
+        return [d for d in dirs if os.path.isdir(d)]
 
     def load_tasks(self):
         settings = settings_manager.settings
-        parts_dir = os.path.join(settings.download_dir, ".parts")
-        if not os.path.exists(parts_dir):
-            return
-
-        for filename in os.listdir(parts_dir):
-            if filename.endswith(".state.json"):
-                try:
-                    filepath = os.path.join(parts_dir, filename)
-                    with open(filepath, 'r') as f:
-                        state = json.load(f)
+        for parts_dir in self._state_dirs(settings.download_dir):
+            for filename in os.listdir(parts_dir):
+                if filename.endswith(".state.json"):
+                    try:
+                        filepath = os.path.join(parts_dir, filename)
+                        with open(filepath, 'r') as f:
+                            state = json.load(f)
                     
-                    # Check if it's a folder task
-                    if state.get("type") == "folder":
-                        # Import here to avoid circular dependency if possible, or move import to top if safe
-                        from .drive_task import DriveFolderTask
+                        # Check if it's a folder task
+                        if state.get("type") == "folder":
+                            # Import here to avoid circular dependency if possible, or move import to top if safe
+                            from .drive_task import DriveFolderTask
                         
-                        folder_id = state.get("folder_id")
-                        name = state.get("name")
-                        if not folder_id or not name:
-                            continue
+                            folder_id = state.get("folder_id")
+                            name = state.get("name")
+                            if not folder_id or not name:
+                                continue
                             
-                        task = DriveFolderTask(
-                            folder_id, 
-                            name, 
-                            settings.download_dir, 
-                            settings.max_connections_per_task
-                        )
-                        if task.load_state():
-                             # If task was downloading, set to PAUSED
-                            if task.status == TaskStatus.DOWNLOADING:
-                                task.status = TaskStatus.PAUSED
-                            self.tasks[task.id] = task
-                        continue
+                            task = DriveFolderTask(
+                                folder_id, 
+                                name, 
+                                settings.download_dir, 
+                                settings.max_connections_per_task
+                            )
+                            if task.load_state():
+                                 # If task was downloading, set to PAUSED
+                                if task.status == TaskStatus.DOWNLOADING:
+                                    task.status = TaskStatus.PAUSED
+                                self.tasks[task.id] = task
+                            continue
 
-                    # Reconstruct task
-                    url = state.get("url", "")
-                    fname = state.get("filename", "")
-                    auto_extract = state.get("auto_extract", False)
+                        # Reconstruct task
+                        url = state.get("url", "")
+                        fname = state.get("filename", "")
                     
-                    if not url or not fname:
-                        continue
+                        if not url or not fname:
+                            continue
 
-                    task = DownloadTask(url, fname, settings.download_dir, settings.max_connections_per_task, auto_extract)
-                    task.load_state()
+                        # Finished tasks only need a compact record
+                        if state.get("status") == TaskStatus.COMPLETED:
+                            record = TaskRecord.from_state(state, filepath, settings.download_dir)
+                            self.tasks[record.id] = record
+                            continue
+
+                        task = DownloadTask.from_state_file(filepath, settings.download_dir, settings.max_connections_per_task)
                     
-                    # If task was downloading/extracting, set to PAUSED to avoid auto-start storm
-                    if task.status in [TaskStatus.DOWNLOADING, TaskStatus.EXTRACTING]:
-                        task.status = TaskStatus.PAUSED
+                        # If task was downloading/extracting, set to PAUSED to avoid auto-start storm
+                        if task.status in [TaskStatus.DOWNLOADING, TaskStatus.MERGING, TaskStatus.EXTRACTING]:
+                            task.status = TaskStatus.PAUSED
                     
-                    self.tasks[task.id] = task
-                except Exception as e:
-                    print(f"Error loading task state {filename}: {e}")
-
-    def get_unique_filename(self, filename: str) -> str:
-        settings = settings_manager.settings
-        filepath = os.path.join(settings.download_dir, filename)
-        if not os.path.exists(filepath):
-            return filename
-        
-        base, ext = os.path.splitext(filename)
-        counter = 1
-        while True:
-            new_filename = f"{base} ({counter}){ext}"
-            if not os.path.exists(os.path.join(settings.download_dir, new_filename)):
-                return new_filename
-            counter += 1
+                        self.tasks[task.id] = task
+                    except Exception as e:
+                        print(f"Error loading task state {filename}: {e}")
 
-    async def add_task(self, url: str, filename: str = None, auto_extract: bool = False, speed_limit: int = 0, max_connections: int = None, headers: Dict[str, str] = None):
+    async def add_task(self, url: str, filename: str = None, auto_extract: bool = False, speed_limit: int = 0, max_connections: int = None, headers: Dict[str, str] = None, auth: str = None, queue_class: str = "default", streaming: bool = False, export: bool = False):
         if not filename:
             filename = url.split('/')[-1] or "downloaded_file"
         
-        # Auto-rename if exists
-        filename = self.get_unique_filename(filename)
+        # Auto-rename if exists (also in the category folders), the name is reserved right away
+        filename = name_index.allocate(filename)
         
         settings = settings_manager.settings
-        # Use provided max_connections or fallback to settings
-        connections = max_connections if max_connections and max_connections > 0 else settings.max_connections_per_task
+        # Use provided max_connections, else what worked best for this host, else settings
+        connections = max_connections if max_connections and max_connections > 0 else host_profiles.connections_for(url, settings.max_connections_per_task)
         
-        task = DownloadTask(url, filename, settings.download_dir, connections, auto_extract, headers=headers)
+        task = DownloadTask(url, filename, settings.download_dir, connections, auto_extract, headers=headers, auth=auth)
+        task.queue_class = queue_class
+        task.streaming = streaming
+        task.export = export
+        if settings.organize_files:
+            # By extension for now, start() refines it once the type and size are known
+            task.relocate(categorize(filename))
         
         if speed_limit > 0:
             task.set_speed_limit(speed_limit)
@@ -578,12 +1542,73 @@ class DownloadManager:
         await self.process_queue()
         return task.id
 
-    async def add_drive_folder_task(self, folder_id: str, name: str, auto_extract: bool = False, speed_limit: int = 0, max_connections: int = None):
+    async def add_tasks_bulk(self, entries: List[Dict], auto_extract: bool = False, speed_limit: int = 0, max_connections: int = None, queue_class: str = "default"):
+        """Add many downloads at once.
+
+        Entries use the manifest format from core.manifest (only "url" is required,
+        sizes and piece hashes are applied to the task). Invalid URLs and duplicates
+        (same URL, or same explicit target name) are skipped. Unique names come
+        from an in-memory index instead of probing the disk per entry, all state
+        files are written in one batch and the queue is processed once.
+        """
+        from .manifest import is_valid_url, filename_from_url
+        settings = settings_manager.settings
+        explicit_connections = max_connections if max_connections and max_connections > 0 else None
+
+        known_urls = set(t.url for t in self.tasks.values())
+        requested_names = set()
+
+        added, duplicates, invalid = [], [], []
+        new_tasks = []
+        for entry in entries:
+            url = (entry.get("url") or "").strip()
+            if not is_valid_url(url):
+                invalid.append(url)
+                continue
+            if url in known_urls:
+                duplicates.append(url)
+                continue
+
+            filename = entry.get("filename")
+            if filename:
+                if filename in requested_names:
+                    duplicates.append(url)
+                    continue
+                requested_names.add(filename)
+            else:
+                filename = filename_from_url(url)
+
+            filename = name_index.allocate(filename)
+            known_urls.add(url)
+
+            connections = explicit_connections or host_profiles.connections_for(url, settings.max_connections_per_task)
+            task = DownloadTask(url, filename, settings.download_dir, connections, auto_extract)
+            task.apply_manifest(entry)
+            task.queue_class = queue_class
+            if settings.organize_files:
+                task.relocate(categorize(filename, size=task.total_size))
+            if speed_limit > 0:
+                task.set_speed_limit(speed_limit)
+            new_tasks.append(task)
+            added.append(task.id)
+
+        for task in new_tasks:
+            self.tasks[task.id] = task
+
+        # Persist everything in one batch, off the event loop
+        for task in new_tasks:
+            task.mark_dirty()
+        await checkpoint_service.flush()
+
+        await self.process_queue()
+        return {"added": added, "duplicates": duplicates, "invalid": invalid}
+
+    async def add_drive_folder_task(self, folder_id: str, name: str, auto_extract: bool = False, speed_limit: int = 0, max_connections: int = None, queue_class: str = "default"):
         from .drive_task import DriveFolderTask
         settings = settings_manager.settings
         
         # Auto-rename if exists
-        name = self.get_unique_filename(name)
+        name = name_index.allocate(name)
         
         connections = max_connections if max_connections and max_connections > 0 else settings.max_connections_per_task
 
@@ -595,12 +1620,66 @@ class DownloadManager:
             auto_extract=auto_extract,
             speed_limit=speed_limit
         )
+        task.queue_class = queue_class
         self.tasks[task.id] = task
         task.save_state()
         
         await self.process_queue()
         return task.id
 
+    async def sync_drive_folder(self, folder_id: str, name: str, delete_removed: bool = False, auto_extract: bool = False, speed_limit: int = 0, max_connections: int = None, queue_class: str = "default"):
+        # Mirror a Drive folder: the first sync is a normal clone, later ones
+        # reuse the existing task and only fetch what changed.
+        task = next((t for t in self.tasks.values() if getattr(t, 'folder_id', None) == folder_id), None)
+        if task is None:
+            task_id = await self.add_drive_folder_task(folder_id, name, auto_extract, speed_limit, max_connections, queue_class)
+            self.tasks[task_id].delete_removed = delete_removed
+            return task_id
+
+        if task.task_runner and not task.task_runner.done():
+            raise Exception("Folder is still downloading, sync it once it is done")
+
+        task.delete_removed = delete_removed
+        task.resync_pending = True
+        task.error_message = None
+        task.status = TaskStatus.QUEUED
+        task.save_state()
+        await self.process_queue()
+        return task.id
+
+    async def refresh_task(self, task_id: str) -> bool:
+        # Download a finished file again, but only if it changed on the server
+        task = self.tasks.get(task_id)
+        if not task:
+            raise Exception("Task not found")
+        if task.status != TaskStatus.COMPLETED:
+            raise Exception("Only finished downloads can be refreshed")
+        if hasattr(task, 'folder_id'):
+            raise Exception("Drive folders are refreshed with sync")
+
+        settings = settings_manager.settings
+        fresh = DownloadTask.from_state_file(task.state_file, settings.download_dir, settings.max_connections_per_task)
+        if not await fresh.check_changed():
+            return False
+
+        # Same task, downloaded again into the same place. The old copy is
+        # only replaced by the merge, once the new version is complete.
+        fresh.id = task.id
+        fresh.filepath = task.filepath
+        fresh.parts_info = []
+        fresh.downloaded_size = 0
+        fresh.total_size = 0
+        fresh.etag = fresh.last_modified = None
+        fresh.deduplicated_from = None
+        fresh.completed_at = 0
+        fresh.set_speed_limit(fresh.speed_limit)
+        fresh.status = TaskStatus.QUEUED
+        self.tasks[task.id] = fresh
+        fresh.save_state()
+
+        await self.process_queue()
+        return True
+
     async def resume_task(self, task_id: str):
         task = self.tasks.get(task_id)
         if not task:
@@ -609,62 +1688,176 @@ class DownloadManager:
         if task.status == TaskStatus.COMPLETED:
             return
 
-        # If task is already running (has a runner and not done), just resume event
         if task.task_runner and not task.task_runner.done():
-            task.resume()
-        else:
-            # Task is cold (restored from disk or error), needs to be restarted
+            if not isinstance(task, DownloadTask) or task.status != TaskStatus.PAUSED:
+                # Folders stay in their run while paused, resume in place
+                task.resume()
+                return
+            # A paused download is still closing its connections, let its run end.
+            # Resuming the run that is going away would only have it end as canceled.
+            if not await self._wait_stopped(task):
+                task.resume_pending = True
+                asyncio.create_task(self._resume_when_stopped(task))
+                return
+            if task.status == TaskStatus.COMPLETED:
+                return
+
+        # Back through the queue: it waits for a free slot and picks up from the saved offsets
+        task.status = TaskStatus.QUEUED
+        await self.process_queue()
+
+    async def _resume_when_stopped(self, task):
+        await asyncio.wait({task.task_runner})
+        # Unless it was paused again in the meantime
+        if task.resume_pending and task.status == TaskStatus.PAUSED and self.tasks.get(task.id) is task:
+            task.resume_pending = False
             task.status = TaskStatus.QUEUED
             await self.process_queue()
 
+    async def pause_task(self, task_id: str):
+        task = self.tasks.get(task_id)
+        if not task:
+            return
+        if isinstance(task, DownloadTask):
+            task.resume_pending = False
+        task.pause()
+        # A paused task doesn't hold a download slot, start the next queued one
+        await self.process_queue()
+
+    async def _wait_stopped(self, task) -> bool:
+        # True once the task's runner has ended
+        if task.task_runner and not task.task_runner.done():
+            await asyncio.wait({task.task_runner}, timeout=PAUSE_STOP_TIMEOUT)
+        return task.task_runner is None or task.task_runner.done()
+
     async def process_queue(self):
-        settings = settings_manager.settings
-        active_downloads = sum(1 for t in self.tasks.values() if t.status == TaskStatus.DOWNLOADING)
+        # The schedule can lower the concurrency and hold back whole queue classes
+        scheduler.ensure_running(self)
+        max_concurrent = scheduler.max_concurrent_downloads()
+        # A merge still holds its slot: it is part of the run and saturates the disk
+        active_downloads = sum(1 for t in self.tasks.values() if t.status in (TaskStatus.DOWNLOADING, TaskStatus.MERGING))
         
-        if active_downloads < settings.max_concurrent_downloads:
-            # Find queued tasks
-            for task in self.tasks.values():
-                if task.status == TaskStatus.PENDING or task.status == TaskStatus.QUEUED:
-                    if active_downloads < settings.max_concurrent_downloads:
-                        task.status = TaskStatus.DOWNLOADING
-                        task.task_runner = asyncio.create_task(self._run_task(task))
-                        active_downloads += 1
-                    else:
+        waiting_for_disk = False
+        
+        if active_downloads < max_concurrent:
+            # Find queued tasks, someone is waiting to play streaming ones so they go first
+            queued = [t for t in self.tasks.values() if t.status == TaskStatus.PENDING or t.status == TaskStatus.QUEUED]
+            queued.sort(key=lambda t: not getattr(t, 'streaming', False))
+            for task in queued:
+                if scheduler.is_paused(task):
+                    task.status = TaskStatus.QUEUED
+                    task.wait_reason = "Paused by schedule"
+                    continue
+                if active_downloads < max_concurrent:
+                    # Don't start what can't fit on disk, keep it queued instead
+                    if not disk_budget.try_reserve(task):
                         task.status = TaskStatus.QUEUED
+                        task.wait_reason = "Waiting for free disk space"
+                        waiting_for_disk = True
+                        continue
+                    task.wait_reason = None
+                    task.status = TaskStatus.DOWNLOADING
+                    task.task_runner = asyncio.create_task(self._run_task(task))
+                    active_downloads += 1
+                else:
+                    task.status = TaskStatus.QUEUED
+
+        if waiting_for_disk:
+            self._schedule_disk_recheck()
+
+    def _schedule_disk_recheck(self):
+        # Space can also be freed outside of HDM, so poll while something is waiting
+        if self._disk_recheck and not self._disk_recheck.done():
+            return
+
+        async def recheck():
+            await asyncio.sleep(30)
+            await self.process_queue()
+
+        self._disk_recheck = asyncio.create_task(recheck())
 
     async def _run_task(self, task: DownloadTask):
-        await task.start()
-        # After task finishes (complete or error), process queue again
+        try:
+            if worker_pool.enabled and isinstance(task, DownloadTask):
+                await worker_pool.run(task)
+            else:
+                await task.start()
+        except BaseException:
+            disk_budget.release(task)
+            raise
+
         if task.status == TaskStatus.COMPLETED:
+            # The bytes are on disk, so the download slot goes to the next task right
+            # away. Organizing, indexing and extraction queue for a post-processing slot.
+            event_bus.publish("downloaded", task)
+            self._post_queue.append(task)
+            self._start_post_processing()
+        else:
+            disk_budget.release(task)
+            if task.status == TaskStatus.ERROR:
+                event_bus.publish("failed", task)
+
+        # After task finishes (complete or error), process queue again
+        await self.process_queue()
+
+    def _start_post_processing(self):
+        limit = max(settings_manager.settings.max_post_processing, 1)
+        while self._post_queue and len(self._post_running) < limit:
+            task = self._post_queue.popleft()
+            self._post_running[task.id] = asyncio.create_task(self._post_process(task))
+
+    async def _post_process(self, task: DownloadTask):
+        try:
+            if self.tasks.get(task.id) is not task:
+                return # Removed while it waited
+
             if settings_manager.settings.organize_files:
-                self.organize_file(task)
-            
+                # Usually a no-op, file tasks are downloaded into their category folder.
+                # Anything else may be a copy to another filesystem, so off the loop.
+                loop = asyncio.get_event_loop()
+                moved = await loop.run_in_executor(None, self.organize_file, task)
+                if moved and isinstance(task, DownloadTask):
+                    task.save_state() # Remember where it went
+
+            if isinstance(task, DownloadTask):
+                # Index the file at its final path so identical downloads can reuse it
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, content_index.add, task.dedup_keys(), task.filepath)
+
             if task.auto_extract:
                 await task.extract()
-        
+                if task.status == TaskStatus.COMPLETED and not task.extraction_skipped:
+                    event_bus.publish("extracted", task)
+
+            event_bus.publish("failed" if task.status == TaskStatus.ERROR else "finished", task)
+        except Exception as e:
+            print(f"Post-processing {task.filename} failed: {e}")
+        finally:
+            disk_budget.release(task)
+            self._post_running.pop(task.id, None)
+            self._start_post_processing()
+
+        # Keep only a compact record of finished file downloads in memory
+        if isinstance(task, DownloadTask) and task.status == TaskStatus.COMPLETED and self.tasks.get(task.id) is task:
+            self.tasks[task.id] = task.to_record()
+
+        # Extraction space is free again, something may have waited for it
         await self.process_queue()
 
-    def organize_file(self, task: DownloadTask):
+    async def wait_post_processing(self):
+        """Wait until every finished download has been post-processed."""
+        while self._post_queue or self._post_running:
+            await asyncio.gather(*list(self._post_running.values()), return_exceptions=True)
+
+    def organize_file(self, task: DownloadTask) -> bool:
+        # Returns True if the file was moved
         try:
             # Check for Drive Folder Task
             # We can check for folder_id attribute or type name in state
             if hasattr(task, 'folder_id'):
-                 category = "Gdrive Folders"
+                 category = FOLDER_CATEGORY
             else:
-                ext = os.path.splitext(task.filename)[1].lower()
-                category = "Others"
-                if ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
-                    category = "Images"
-                elif ext in ['.mp4', '.mkv', '.avi', '.mov']:
-                    category = "Videos"
-                elif ext in ['.mp3', '.wav', '.flac']:
-                    category = "Music"
-                elif ext in ['.zip', '.rar', '.7z', '.tar', '.gz']:
-                    category = "Archives"
-                elif ext in ['.exe', '.msi', '.deb', '.rpm']:
-                    category = "Programs"
-                elif ext in ['.pdf', '.doc', '.docx', '.txt']:
-                    category = "Documents"
+                category = categorize(task.filename, getattr(task, 'content_type', None), task.total_size)
 
             target_dir = os.path.join(task.download_dir, category)
             if not os.path.exists(target_dir):
@@ -678,10 +1871,11 @@ class DownloadManager:
             if os.path.exists(task.filepath):
                 # Check if we are trying to move to the same location
                 if os.path.abspath(task.filepath) == os.path.abspath(new_path):
-                    return
+                    return False
 
                 shutil.move(task.filepath, new_path)
                 task.filepath = new_path # Update path
+                return True
                 
                 # If it's a folder task, we might need to update sub-tasks paths?
                 # But sub-tasks are done. And their paths are relative to the folder.
@@ -692,6 +1886,7 @@ class DownloadManager:
                 
         except Exception as e:
             print(f"Error organizing file: {e}")
+        return False
 
     def get_task(self, task_id: str):
         return self.tasks.get(task_id)
@@ -699,6 +1894,35 @@ class DownloadManager:
     def get_all_tasks(self):
         return self.tasks.values()
 
+    def remove_task(self, task_id: str, delete_file: bool = False) -> bool:
+        # Only takes the task out of the list, the reaper stops it and removes
+        # its files in the background. Returns False if there is no such task.
+        task = self.tasks.pop(task_id, None)
+        if task is None:
+            return False
+
+        cancel = task.status in [TaskStatus.DOWNLOADING, TaskStatus.PAUSED, TaskStatus.PENDING, TaskStatus.QUEUED, TaskStatus.MERGING]
+        if cancel:
+            # If task was incomplete, force delete files (parts)
+            delete_file = True
+        if task in self._post_queue:
+            self._post_queue.remove(task)
+            disk_budget.release(task)
+
+        reaper.submit(task, cancel, delete_file, wait_for=[getattr(task, 'task_runner', None), self._post_running.get(task_id)])
+        return True
+
+    def remove_tasks(self, task_ids: List[str], delete_file: bool = False) -> Dict[str, List[str]]:
+        removed, missing = [], []
+        for task_id in task_ids:
+            (removed if self.remove_task(task_id, delete_file) else missing).append(task_id)
+        return {"deleted": removed, "not_found": missing}
+
+    def clear_completed(self, delete_file: bool = False) -> List[str]:
+        # Still post-processing counts as running, it is left alone
+        task_ids = [t.id for t in self.tasks.values() if t.status == TaskStatus.COMPLETED and t.id not in self._post_running and t not in self._post_queue]
+        return self.remove_tasks(task_ids, delete_file)["deleted"]
+
     async def rename_task(self, task_id: str, new_filename: str):
         task = self.tasks.get(task_id)
         if not task:
@@ -707,11 +1931,14 @@ class DownloadManager:
         if task.filename == new_filename:
             return
 
+        if task.status == TaskStatus.MERGING:
+            raise Exception("Cannot rename while the parts are being merged")
+
         # Check if new filename exists
         # Use current directory of the file to preserve category (e.g. Archives/)
         current_dir = os.path.dirname(task.filepath)
         new_filepath = os.path.join(current_dir, new_filename)
-        if os.path.exists(new_filepath):
+        if not name_index.reserve(new_filename):
              raise Exception("File with this name already exists")
 
         # Handle active task
@@ -719,12 +1946,22 @@ class DownloadManager:
         if task.status in [TaskStatus.DOWNLOADING, TaskStatus.EXTRACTING]:
             was_running = True
             task.pause()
-            # Wait a bit for pause to take effect and file handles to close
-            await asyncio.sleep(0.5)
+            if task.worker:
+                # The worker would keep writing under the old name, take the task back first
+                await worker_pool.release(task)
+            elif isinstance(task, DownloadTask):
+                # Pausing ends the run, wait for it so the file handles are closed
+                await self._wait_stopped(task)
+            else:
+                # Wait a bit for pause to take effect and file handles to close
+                await asyncio.sleep(0.5)
 
         try:
             old_filename = task.filename
-            
+
+            # Pending or in-flight checkpoints still use the old path, let them land first
+            await checkpoint_service.flush()
+
             # 1. Rename State File
             old_state_file = task.state_file
             # Note: This logic needs to be careful about paths. 
@@ -739,11 +1976,14 @@ class DownloadManager:
             task.state_file = new_state_file
 
             # 2. Rename Parts
-            for i in range(task.num_connections):
+            for i in range(max(task.num_connections, len(getattr(task, 'parts_info', None) or []))):
                 old_part = os.path.join(task.parts_dir, f"{os.path.basename(old_filename)}.part{i}")
                 new_part = os.path.join(task.parts_dir, f"{os.path.basename(new_filename)}.part{i}")
                 if os.path.exists(old_part):
                     os.rename(old_part, new_part)
+            old_merge = os.path.join(task.parts_dir, f"{os.path.basename(old_filename)}.merge")
+            if os.path.exists(old_merge):
+                os.rename(old_merge, os.path.join(task.parts_dir, f"{new_basename}.merge"))
 
             # 3. Rename Final File (if exists/completed)
             if os.path.exists(task.filepath):
@@ -756,8 +1996,11 @@ class DownloadManager:
 
         except Exception as e:
             # Try to revert? For now just raise
+            name_index.release(new_filename)
             raise Exception(f"Rename failed: {e}")
 
+        name_index.release(old_filename)
+
         # Resume if it was running
         if was_running:
             await self.resume_task(task.id)
@@ -1,21 +1,116 @@
 import os
 import pickle
+import asyncio
+import datetime
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import quote
+from .settings import settings_manager
 
 # If modifying these scopes, delete the file token.pickle.
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
+# Refresh the access token this long before it actually expires so that
+# in-flight requests never race the expiry.
+TOKEN_REFRESH_MARGIN = 300 # seconds
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+SHORTCUT_MIME = 'application/vnd.google-apps.shortcut'
+NATIVE_PREFIX = 'application/vnd.google-apps.'
+
+# Listings are the bulk of a big folder scan: ask for the largest page and only
+# the fields the scanner uses (no links, owners, permissions, ...)
+LIST_PAGE_SIZE = 1000
+LIST_FIELDS = "nextPageToken, files(id, name, mimeType, size, md5Checksum, modifiedTime, shortcutDetails(targetId, targetMimeType))"
+FILE_FIELDS = "id, name, mimeType, size, md5Checksum, modifiedTime, shortcutDetails(targetId, targetMimeType)"
+
+# Google Docs & co. have no bytes of their own, they are exported. The format
+# per kind is picked in settings.drive_export_formats (kind -> extension).
+EXPORT_FORMATS = {
+    "document": {
+        "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "odt": "application/vnd.oasis.opendocument.text",
+        "pdf": "application/pdf",
+        "rtf": "application/rtf",
+        "txt": "text/plain",
+        "md": "text/markdown",
+        "epub": "application/epub+zip",
+    },
+    "spreadsheet": {
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "ods": "application/vnd.oasis.opendocument.spreadsheet",
+        "pdf": "application/pdf",
+        "csv": "text/csv", # First sheet only
+    },
+    "presentation": {
+        "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        "odp": "application/vnd.oasis.opendocument.presentation",
+        "pdf": "application/pdf",
+    },
+    "drawing": {
+        "pdf": "application/pdf",
+        "png": "image/png",
+        "jpg": "image/jpeg",
+        "svg": "image/svg+xml",
+    },
+    "script": {
+        "json": "application/vnd.google-apps.script+json",
+    },
+}
+
+def is_native(mime_type: str) -> bool:
+    return mime_type.startswith(NATIVE_PREFIX)
+
+def export_format(mime_type: str) -> Optional[Tuple[str, str]]:
+    """(extension, export MIME type) for a Google-native file, None if it isn't exported."""
+    kind = mime_type[len(NATIVE_PREFIX):]
+    extension = settings_manager.settings.drive_export_formats.get(kind, "")
+    export_mime = EXPORT_FORMATS.get(kind, {}).get(extension)
+    if not export_mime:
+        return None # Forms, sites, maps, ... or turned off
+    return extension, export_mime
+
+def file_url(file_id: str, mime_type: str = "") -> Optional[str]:
+    """URL that downloads a Drive file (an export for Google-native files), None if it can't be."""
+    if is_native(mime_type):
+        export = export_format(mime_type)
+        if not export:
+            return None
+        return f"https://www.googleapis.com/drive/v3/files/{file_id}/export?mimeType={quote(export[1], safe='')}"
+    return f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media&supportsAllDrives=true"
+
+def export_name(name: str, mime_type: str) -> str:
+    # Local name of a Google-native file: the Drive title plus the export extension
+    export = export_format(mime_type) if is_native(mime_type) else None
+    if export and not name.lower().endswith("." + export[0]):
+        return f"{name}.{export[0]}"
+    return name
+
 class DriveManager:
     def __init__(self):
-        self.creds = None
+        self._creds = None
+        self._creds_loaded = False
         self.service = None
         self.credentials_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'credentials.json')
         self.token_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'token.pickle')
-        # Try to load credentials on init, but don't start flow
-        self.load_credentials()
+        # Async token management (created lazily, needs a running loop)
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def creds(self):
+        # Saved credentials are loaded on first use instead of at import (never starts a flow)
+        if not self._creds_loaded:
+            self._creds_loaded = True
+            self.load_credentials()
+        return self._creds
+
+    @creds.setter
+    def creds(self, value):
+        self._creds_loaded = True
+        self._creds = value
 
     def load_credentials(self):
         if os.path.exists(self.token_path):
@@ -94,28 +189,144 @@ class DriveManager:
             self.authenticate()
         return {"Authorization": f"Bearer {self.creds.token}"}
 
-    def list_files(self, folder_id: str = 'root', page_token: Optional[str] = None) -> Dict:
+    def _seconds_until_expiry(self) -> Optional[float]:
+        if not self.creds or not getattr(self.creds, 'expiry', None):
+            return None
+        # google-auth stores expiry as a naive UTC datetime
+        now = datetime.datetime.utcnow()
+        return (self.creds.expiry - now).total_seconds()
+
+    def _needs_refresh(self) -> bool:
+        if not self.creds or not self.creds.token:
+            return True
+        remaining = self._seconds_until_expiry()
+        return remaining is not None and remaining < TOKEN_REFRESH_MARGIN
+
+    def _refresh_sync(self):
+        # Runs in a worker thread, never on the event loop
+        if not self.creds:
+            self.load_credentials()
+        if not self.creds or not self.creds.refresh_token:
+            self.authenticate()
+            return
+        self.creds.refresh(Request())
+        with open(self.token_path, 'wb') as token:
+            pickle.dump(self.creds, token)
+        self.service = build('drive', 'v3', credentials=self.creds)
+
+    async def refresh_token(self, stale_token: Optional[str] = None):
+        """Refresh the access token off the event loop.
+
+        Concurrent callers are coalesced: everyone waiting on the lock who saw
+        the same stale token gets the result of a single refresh.
+        """
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+
+        async with self._refresh_lock:
+            if stale_token is not None and self.creds and self.creds.token != stale_token:
+                return # Somebody else already refreshed while we waited
+            if stale_token is None and not self._needs_refresh():
+                return
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._refresh_sync)
+            except Exception as e:
+                print(f"Error refreshing token: {e}")
+
+    def _ensure_refresher(self):
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        # Proactively refresh shortly before expiry so downloads never see a 401
+        # for an expired token in the first place.
+        while self.creds and self.creds.refresh_token:
+            remaining = self._seconds_until_expiry()
+            if remaining is None:
+                return
+            delay = remaining - TOKEN_REFRESH_MARGIN
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.refresh_token()
+            # Back off a little if the refresh failed so we don't spin
+            if self._needs_refresh():
+                await asyncio.sleep(30)
+
+    async def get_auth_headers(self) -> Dict[str, str]:
+        """Current Authorization header, resolved per request."""
+        if self._needs_refresh():
+            await self.refresh_token()
+        if not self.creds or not self.creds.token:
+            raise Exception("Not authenticated")
+        self._ensure_refresher()
+        return {"Authorization": f"Bearer {self.creds.token}"}
+
+    def list_files(self, folder_id: str = 'root', page_token: Optional[str] = None, fields: str = LIST_FIELDS) -> Dict:
         if not self.service:
             self.authenticate()
             if not self.service:
                 raise Exception("Not authenticated")
 
+        # Shared drives (and folders shared from them) are only listed with both flags
         results = self.service.files().list(
             q=f"'{folder_id}' in parents and trashed = false",
-            pageSize=100,
-            fields="nextPageToken, files(id, name, mimeType, size, webContentLink)",
-            pageToken=page_token
+            pageSize=LIST_PAGE_SIZE,
+            fields=fields,
+            pageToken=page_token,
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True
         ).execute()
         
         return results
 
-    def get_file_metadata(self, file_id: str) -> Dict:
+    def get_start_page_token(self) -> str:
+        if not self.service:
+            self.authenticate()
+            if not self.service:
+                raise Exception("Not authenticated")
+
+        return self.service.changes().getStartPageToken(supportsAllDrives=True).execute()['startPageToken']
+
+    def list_changes(self, page_token: str) -> Dict:
+        """All changes since `page_token`, and the token to use next time."""
+        if not self.service:
+            self.authenticate()
+            if not self.service:
+                raise Exception("Not authenticated")
+
+        changes = []
+        while True:
+            results = self.service.changes().list(
+                pageToken=page_token,
+                pageSize=1000,
+                fields="nextPageToken, newStartPageToken, changes(fileId, removed, file(name, mimeType, size, md5Checksum, modifiedTime, parents, trashed))",
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ).execute()
+            changes.extend(results.get('changes', []))
+            if 'newStartPageToken' in results:
+                return {"changes": changes, "new_token": results['newStartPageToken']}
+            page_token = results['nextPageToken']
+
+    def get_file_metadata(self, file_id: str, fields: str = FILE_FIELDS) -> Dict:
         if not self.service:
             self.authenticate()
             
         return self.service.files().get(
             fileId=file_id,
-            fields="id, name, mimeType, size, webContentLink"
+            fields=fields,
+            supportsAllDrives=True
         ).execute()
 
+    def resolve(self, file_id: str) -> Dict:
+        """Metadata of `file_id`, or of its target if it is a shortcut (keeping the shortcut's name)."""
+        metadata = self.get_file_metadata(file_id)
+        if metadata.get("mimeType") != SHORTCUT_MIME:
+            return metadata
+        target_id = metadata.get("shortcutDetails", {}).get("targetId")
+        if not target_id:
+            raise Exception(f"Shortcut {metadata.get('name', file_id)} has no target")
+        return dict(self.get_file_metadata(target_id), name=metadata.get("name"))
+
 drive_manager = DriveManager()
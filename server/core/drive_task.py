@@ -1,142 +1,322 @@
 import asyncio
 import os
+import sys
 import json
 import time
-from typing import List, Dict, Optional
-from .downloader import DownloadTask, TaskStatus, settings_manager
-from .drive import drive_manager
+import shutil
+from array import array
+from typing import List, Dict, Optional, Tuple
+from .downloader import DownloadTask, TaskStatus, settings_manager, new_task_id
+from .drive import drive_manager, file_url, export_name, is_native, FOLDER_MIME, SHORTCUT_MIME
+from .progress import progress_sampler
+from .checkpoint import checkpoint_service
+from .workers import worker_pool
+from .dedup import content_index
+from .events import publish_status
+
+# Per-file states in FolderFileTable.states
+FILE_PENDING = 0
+FILE_DONE = 1
+FILE_ERROR = 2
+
+def _safe_name(name: str) -> str:
+    # Sanitize name
+    return "".join([c for c in name if c.isalpha() or c.isdigit() or c in " ._-()"]).strip()
+
+def _same_version(old: "FolderFileTable", i: int, new: "FolderFileTable", j: int) -> bool:
+    # md5 is the strongest signal; Google-native files have none, so fall back
+    # to modifiedTime, and to the size for tables saved before sync support.
+    if old.md5s[i] and new.md5s[j]:
+        return old.md5s[i] == new.md5s[j]
+    if old.modified[i] and new.modified[j]:
+        return old.modified[i] == new.modified[j] and old.sizes[i] == new.sizes[j]
+    return old.sizes[i] == new.sizes[j]
+
+class FolderFileTable:
+    """Column-oriented table of the files in a Drive folder.
+
+    Big folders have 100k+ files. A dict per file plus a DownloadTask per file
+    (with its events, headers and part list) costs hundreds of MB, so instead
+    each attribute is a single list/array for the whole folder.
+    """
+    __slots__ = ("ids", "paths", "mime_types", "md5s", "modified", "sizes", "downloaded", "states")
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.paths: List[str] = [] # Relative path, including the root folder name
+        self.mime_types: List[str] = []
+        # Remote version, used by sync to tell changed files from unchanged ones
+        self.md5s: List[str] = []
+        self.modified: List[str] = []
+        self.sizes = array('q')
+        self.downloaded = array('q')
+        self.states = bytearray()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, file_id: str, relative_path: str, mime_type: str, size: int, md5: str = "", modified: str = ""):
+        self.ids.append(file_id)
+        self.paths.append(relative_path)
+        # Only a handful of distinct mime types, share the strings
+        self.mime_types.append(sys.intern(mime_type))
+        self.md5s.append(md5)
+        self.modified.append(modified)
+        self.sizes.append(size)
+        self.downloaded.append(0)
+        self.states.append(FILE_PENDING)
+
+    def to_state(self) -> Dict:
+        return {
+            "ids": list(self.ids),
+            "paths": list(self.paths),
+            "mime_types": list(self.mime_types),
+            "md5s": list(self.md5s),
+            "modified": list(self.modified),
+            "sizes": self.sizes.tolist(),
+            "downloaded": self.downloaded.tolist(),
+            "states": list(self.states)
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "FolderFileTable":
+        table = cls()
+        table.ids = list(state.get("ids", []))
+        table.paths = list(state.get("paths", []))
+        table.mime_types = [sys.intern(m) for m in state.get("mime_types", [])]
+        # Tables saved before sync support have no remote versions
+        table.md5s = list(state.get("md5s", [""] * len(table.ids)))
+        table.modified = list(state.get("modified", [""] * len(table.ids)))
+        table.sizes = array('q', state.get("sizes", []))
+        table.downloaded = array('q', state.get("downloaded", []))
+        table.states = bytearray(state.get("states", []))
+        return table
 
 class DriveFolderTask:
     def __init__(self, folder_id: str, name: str, download_dir: str, max_connections: int = 4, auto_extract: bool = False, speed_limit: int = 0):
-        self.id = str(int(time.time() * 1000))
+        self.id = new_task_id()
         self.folder_id = folder_id
         self.name = name # Folder name
         self.filename = name # For compatibility with UI which expects filename
         self.url = f"https://drive.google.com/drive/folders/{folder_id}" # Construct URL
         self.download_dir = download_dir
-        
+
         # Determine base path based on organization settings
         if settings_manager.settings.organize_files:
             self.filepath = os.path.join(download_dir, "Gdrive Folders", name)
         else:
             self.filepath = os.path.join(download_dir, name) # Base path for the folder
-            
+
         self.max_connections = max_connections
-        
+
         self.status = TaskStatus.PENDING
         self.total_size = 0 # Sum of all file sizes (if known)
-        self.downloaded_size = 0
+        self.downloaded_size = 0 # Kept up to date by the sub-tasks (see DownloadTask.parent)
         self.speed = 0
+        self.eta: Optional[int] = None
+        self.connection_speeds: List[int] = []
         self.speed_limit = speed_limit
         self.auto_extract = auto_extract
         self.extraction_skipped = False
         self.supports_resume = True
         self.error_message = None
+        self.wait_reason = None
         self.completed_at = 0
-        
-        self.sub_tasks: List[DownloadTask] = []
-        self.files_metadata = [] # List of dicts: {id, name, mimeType, size, relative_path}
+        self.queue_class = "default"
+
+        self.files = FolderFileTable()
+        # DownloadTasks only exist for files that are currently in flight (table index -> task)
+        self.sub_tasks: Dict[int, DownloadTask] = {}
         self.scanned = False
-        
+
+        # Sync: folder id -> relative path of every folder in the tree, the Drive
+        # changes feed position at the last scan, and what the last sync did
+        self.folders: Dict[str, str] = {}
+        self.changes_token: Optional[str] = None
+        self.resync_pending = False
+        self.delete_removed = False
+        self.sync_stats: Optional[Dict] = None
+
         self.task_runner: Optional[asyncio.Task] = None
         self._cancel_event = asyncio.Event()
         self._pause_event = asyncio.Event()
         self._pause_event.set()
-        
+
         # Hidden metadata directory
         self.meta_dir = os.path.join(download_dir, ".parts")
         if not os.path.exists(self.meta_dir):
             os.makedirs(self.meta_dir)
         self.state_file = os.path.join(self.meta_dir, f"{name}.state.json")
 
+    @property
+    def status(self) -> TaskStatus:
+        return self._status
+
+    @status.setter
+    def status(self, value: TaskStatus):
+        old = getattr(self, '_status', None)
+        self._status = value
+        publish_status(self, old, value)
+
+    def _sub_filename(self, index: int) -> str:
+        return self._local_filename(self.files.paths[index])
+
+    def _local_filename(self, relative_path: str) -> str:
+        # Filename is the full relative path inside download_dir; relative_path
+        # already includes the root folder name.
+        # Determine effective filename based on organization settings
+        final_filename = relative_path
+        if settings_manager.settings.organize_files:
+            final_filename = os.path.join("Gdrive Folders", final_filename)
+        return final_filename
+
+    def _make_sub_task(self, index: int) -> DownloadTask:
+        task = self._file_task(self.files.ids[index], self.files.paths[index], self.files.mime_types[index])
+        # Lets dedup find the same file elsewhere (other folders, earlier clones)
+        task.remote_md5 = self.files.md5s[index] or None
+        return task
+
+    def _file_task(self, file_id: str, relative_path: str, mime_type: str = "") -> DownloadTask:
+        # Google-native files are exported. If their kind was turned off since the
+        # scan, the plain download fails and the file is marked as failed.
+        url = file_url(file_id, mime_type) or file_url(file_id)
+        task = DownloadTask(
+            url=url,
+            filename=self._local_filename(relative_path),
+            download_dir=self.download_dir,
+            num_connections=self.max_connections,
+            auth="drive",
+            auto_extract=self.auto_extract
+        )
+
+        task.export = is_native(mime_type)
+        task.in_folder = True
+        if self.speed_limit > 0:
+            task.set_speed_limit(self.speed_limit)
+
+        # Pick up a partially downloaded file. Attach to the folder afterwards:
+        # bytes already on disk were counted when they were downloaded.
+        task.load_state()
+        task.parent = self
+        return task
+
     async def start(self):
         self.status = TaskStatus.DOWNLOADING
-        
-        if not self.scanned:
-            await self._scan_folder()
-        
-        # Create sub-tasks if not already created
-        if not self.sub_tasks and self.files_metadata:
-            self._create_sub_tasks()
-            
+
+        try:
+            if not self.scanned:
+                await self._scan_folder()
+            elif self.resync_pending:
+                await self._resync()
+        except Exception as e:
+            self.status = TaskStatus.ERROR
+            self.error_message = f"Folder scan failed: {e}"
+            self.save_state()
+            return
+
         # Run sub-tasks (downloads inside the folder).
         # Since this folder is treated as a single task in DownloadManager,
         # we must manage all child downloads ourselves.
         #
-        # We'll control concurrency with a semaphore so only a limited number
-        # of files download at the same time. For now, we allow 2 concurrent
+        # A fixed number of workers pull pending files from the table, so only
+        # the files in flight get a DownloadTask. For now, we allow 2 concurrent
         # file downloads to keep things stable.
+        pending = (i for i in range(len(self.files)) if self.files.states[i] != FILE_DONE)
+
+        async def worker():
+            for index in pending:
+                # Wait if paused
+                if not self._pause_event.is_set():
+                    self.mark_dirty()
+                    await self._pause_event.wait()
 
-        semaphore = asyncio.Semaphore(2) 
-        
-        async def run_sub_task(task: DownloadTask):
-            async with semaphore:
                 if self.status != TaskStatus.DOWNLOADING:
                     return
-                
-                # We need to manually run the sub-task's start
-                # But sub-task start() assumes it's being run by DownloadManager?
-                # It mostly just needs to run.
-                
-                # Hook into sub-task updates to update our own progress
-                # This is tricky. We can poll them or they can callback.
-                # Polling in _monitor is easier.
-                
-                await task.start()
-
-        self.active_runners = []
-        for task in self.sub_tasks:
-            if task.status == TaskStatus.COMPLETED:
-                continue
-                
-            if self.status != TaskStatus.DOWNLOADING:
-                break
-                
-            # Wait if paused
-            if not self._pause_event.is_set():
-                self.save_state()
-                await self._pause_event.wait()
-                
-            if self.status == TaskStatus.CANCELED:
-                break
 
-            # Create runner
-            runner = asyncio.create_task(run_sub_task(task))
-            self.active_runners.append(runner)
-        
-        # Monitor progress
-        monitor = asyncio.create_task(self._monitor_progress())
-        
+                await self._run_file(index)
+
+        self.active_runners = [asyncio.create_task(worker()) for _ in range(2)]
+
+        # Monitor progress (sub-tasks mark us dirty for checkpointing as bytes arrive)
+        progress_sampler.track(self)
+
         try:
             await asyncio.gather(*self.active_runners)
         except Exception as e:
             self.error_message = str(e)
             self.status = TaskStatus.ERROR
         finally:
-            monitor.cancel()
-            
+            progress_sampler.untrack(self)
+
         # Check completion
-        if all(t.status == TaskStatus.COMPLETED for t in self.sub_tasks):
+        if self.status == TaskStatus.CANCELED:
+            return
+        failed = self.files.states.count(FILE_ERROR)
+        if failed:
+            self.status = TaskStatus.ERROR
+            self.error_message = f"{failed} file(s) failed to download"
+            self.save_state()
+        elif self.files.states.count(FILE_DONE) == len(self.files):
             self.status = TaskStatus.COMPLETED
             self.completed_at = time.time()
             self._sync_progress() # Ensure sizes match for UI
             self.save_state()
 
+    async def _run_file(self, index: int):
+        task = self._make_sub_task(index)
+        estimated_size = task.total_size if task.total_size > 0 else self.files.sizes[index]
+
+        if task.status != TaskStatus.COMPLETED:
+            self.sub_tasks[index] = task
+            try:
+                while True:
+                    # Downloaded bytes are pushed to us by the sub-task as they arrive
+                    if worker_pool.enabled:
+                        await worker_pool.run(task)
+                    else:
+                        await task.start()
+                    if task.status != TaskStatus.PAUSED:
+                        break
+                    # Pausing the folder closed this file's connections. Once the
+                    # folder resumes, the file continues from its saved offsets.
+                    await self._pause_event.wait()
+                    if self.status != TaskStatus.DOWNLOADING:
+                        break
+            finally:
+                self.sub_tasks.pop(index, None)
+                task.parent = None
+
+        self.files.downloaded[index] = task.downloaded_size
+        if task.status == TaskStatus.COMPLETED:
+            self.files.states[index] = FILE_DONE
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, content_index.add, task.dedup_keys(), task.filepath)
+            # The folder table is authoritative for finished files, drop the sub-task state
+            checkpoint_service.discard(task)
+            if os.path.exists(task.state_file):
+                os.remove(task.state_file)
+        elif task.status == TaskStatus.ERROR:
+            self.files.states[index] = FILE_ERROR
+
+        # Correct our total once the real size is known, instead of re-summing every file
+        actual_size = task.downloaded_size if task.status == TaskStatus.COMPLETED else task.total_size
+        if actual_size > 0:
+            self.total_size += actual_size - estimated_size
+        self.mark_dirty()
+
     def _sync_progress(self):
         downloaded = 0
         current_total_size = 0
-        
-        for i, t in enumerate(self.sub_tasks):
-            downloaded += t.downloaded_size
-            
-            # If task is completed, use its downloaded size as total size to ensure 100%
-            if t.status == TaskStatus.COMPLETED:
-                current_total_size += t.downloaded_size
-            elif t.total_size > 0:
-                current_total_size += t.total_size
-            elif i < len(self.files_metadata):
-                current_total_size += int(self.files_metadata[i].get('size', 0))
-        
+
+        for i in range(len(self.files)):
+            downloaded += self.files.downloaded[i]
+
+            # If file is completed, use its downloaded size as total size to ensure 100%
+            if self.files.states[i] == FILE_DONE:
+                current_total_size += self.files.downloaded[i]
+            else:
+                current_total_size += self.files.sizes[i]
+
         self.downloaded_size = downloaded
         self.total_size = current_total_size
         self.speed = 0
@@ -146,214 +326,308 @@ class DriveFolderTask:
         # This might take a while for large folders.
         # We should probably do this iteratively or allow it to be paused?
         # For now, simple recursive.
-        
-        self.files_metadata = []
-        await self._recursive_scan(self.folder_id, self.name)
+
+        # Remember where the changes feed is before listing, so nothing that
+        # changes during the scan is missed by the next sync
+        await self._save_changes_token()
+        self.files = FolderFileTable()
+        self.folders = {}
+        await self._recursive_scan(self.folder_id, self.name, self.files)
+        self.total_size = sum(self.files.sizes)
         self.scanned = True
         self.save_state()
 
-    async def _recursive_scan(self, folder_id: str, current_path: str):
+    async def _save_changes_token(self):
+        loop = asyncio.get_running_loop()
+        try:
+            self.changes_token = await loop.run_in_executor(None, drive_manager.get_start_page_token)
+        except Exception as e:
+            print(f"Could not get Drive changes token: {e}")
+            self.changes_token = None
+
+    async def _recursive_scan(self, folder_id: str, current_path: str, table: FolderFileTable):
+        # Shared drives are included, shortcuts are followed: a shortcut to a file
+        # is that file under the shortcut's name, a shortcut to a folder is scanned
+        # like a subfolder. Google Docs & co. become exports (see _add_file()).
+        self.folders[folder_id] = current_path
+        loop = asyncio.get_running_loop()
         page_token = None
         while True:
             if self.status == TaskStatus.CANCELED:
                 return
-                
-            results = drive_manager.list_files(folder_id, page_token)
+
+            # Blocking HTTP call, keep it off the event loop
+            results = await loop.run_in_executor(None, drive_manager.list_files, folder_id, page_token)
             files = results.get('files', [])
             page_token = results.get('nextPageToken')
 
             for file in files:
-                name = file['name']
-                fid = file['id']
-                mime = file['mimeType']
-                size = int(file.get('size', 0))
-                
-                # Sanitize name
-                safe_name = "".join([c for c in name if c.isalpha() or c.isdigit() or c in " ._-()"]).strip()
-                rel_path = os.path.join(current_path, safe_name)
-                
-                if mime == 'application/vnd.google-apps.folder':
-                    await self._recursive_scan(fid, rel_path)
+                if file['mimeType'] == SHORTCUT_MIME:
+                    file = await self._resolve_shortcut(file)
+                    if file is None:
+                        continue
+
+                if file['mimeType'] == FOLDER_MIME:
+                    if file['id'] in self.folders:
+                        continue # A shortcut back into the tree
+                    await self._recursive_scan(file['id'], os.path.join(current_path, _safe_name(file['name'])), table)
                 else:
-                    self.files_metadata.append({
-                        'id': fid,
-                        'name': safe_name,
-                        'relative_path': rel_path,
-                        'size': size,
-                        'mimeType': mime
-                    })
-                    self.total_size += size
-            
+                    self._add_file(table, file, current_path)
+
             if not page_token:
                 break
 
-    def _create_sub_tasks(self):
-        headers = drive_manager.get_headers()
-        for meta in self.files_metadata:
-            # Check if task already exists (resume logic)
-            # We need to map metadata to subtasks.
-            # For now, just recreate them. DownloadTask has resume logic if file exists.
-            
-            url = f"https://www.googleapis.com/drive/v3/files/{meta['id']}?alt=media"
-            # Filename should be the full relative path inside download_dir
-            # But DownloadTask expects filename to be relative to download_dir?
-            # Actually DownloadTask takes download_dir and filename.
-            # If filename has slashes, it handles it.
-            
-            # We want the file to be at: download_dir / relative_path
-            # relative_path includes the root folder name.
-            # So if we pass download_dir as root, and filename as relative_path, it works.
-            
-            # Determine effective filename based on organization settings
-            final_filename = meta['relative_path']
-            if settings_manager.settings.organize_files:
-                 final_filename = os.path.join("Gdrive Folders", final_filename)
-
-            task = DownloadTask(
-                url=url,
-                filename=final_filename,
-                download_dir=self.download_dir,
-                num_connections=self.max_connections,
-                headers=headers,
-                auto_extract=self.auto_extract
-            )
-            
-            if self.speed_limit > 0:
-                task.set_speed_limit(self.speed_limit)
-            
-            # Restore state if possible
-            # We need to know the ID of the subtask if we want to restore it perfectly.
-            # But DownloadTask generates a new ID on init.
-            # We should probably save subtask IDs in our state.
-            
-            self.sub_tasks.append(task)
-
-    async def _monitor_progress(self):
-        while self.status in [TaskStatus.DOWNLOADING, TaskStatus.PAUSED]:
-            if self.status == TaskStatus.PAUSED:
-                self.speed = 0
-                await asyncio.sleep(1)
+    async def _resolve_shortcut(self, shortcut: Dict) -> Optional[Dict]:
+        details = shortcut.get('shortcutDetails') or {}
+        target_id = details.get('targetId')
+        if not target_id:
+            return None
+        if details.get('targetMimeType') == FOLDER_MIME:
+            return {'id': target_id, 'name': shortcut['name'], 'mimeType': FOLDER_MIME}
+        # The listing only describes the shortcut, size and version come from the target
+        loop = asyncio.get_running_loop()
+        try:
+            target = await loop.run_in_executor(None, drive_manager.get_file_metadata, target_id)
+        except Exception as e:
+            # Target trashed, or not shared with us
+            print(f"Skipping shortcut {shortcut['name']}: {e}")
+            return None
+        return dict(target, name=shortcut['name'])
+
+    def _add_file(self, table: FolderFileTable, file: Dict, parent_path: str):
+        mime = file.get('mimeType', "")
+        if is_native(mime) and not file_url(file['id'], mime):
+            return # Forms, sites, ... can't be exported (or their kind is turned off)
+        # Exports get their format's extension, their size is only known once downloaded
+        rel_path = os.path.join(parent_path, _safe_name(export_name(file.get('name', file['id']), mime)))
+        table.append(file['id'], rel_path, mime, int(file.get('size', 0)),
+                     file.get('md5Checksum', ""), file.get('modifiedTime', ""))
+
+    async def _resync(self):
+        """Bring the file table up to date with Drive, keeping files that didn't change."""
+        started = time.time()
+        remote = None
+        mode = "changes"
+        if self.changes_token and self.folders:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(None, drive_manager.list_changes, self.changes_token)
+                remote = self._apply_changes(result["changes"])
+                if remote is not None:
+                    self.changes_token = result["new_token"]
+            except Exception as e:
+                print(f"Drive changes feed failed, rescanning folder: {e}")
+
+        if remote is None:
+            # No token yet, or a folder in the tree changed: list everything again
+            mode = "rescan"
+            folders = self.folders
+            await self._save_changes_token()
+            remote = FolderFileTable()
+            self.folders = {}
+            try:
+                await self._recursive_scan(self.folder_id, self.name, remote)
+            except Exception:
+                self.folders = folders
+                raise
+
+        loop = asyncio.get_running_loop()
+        stats, stale = await loop.run_in_executor(None, self._merge_remote, remote)
+        # Back on the loop: swap the table in and drop the partial downloads that
+        # won't be resumed (sub-tasks and the checkpoint service aren't thread-safe)
+        old = self.files
+        self.files = remote
+        for i in stale:
+            self._discard_partial(old, i)
+        stats["mode"] = mode
+        stats["seconds"] = round(time.time() - started, 2)
+        self.sync_stats = stats
+        self.resync_pending = False
+        self._sync_progress()
+        self.save_state()
+
+    def _apply_changes(self, changes: List[Dict]) -> Optional[FolderFileTable]:
+        # Build the new remote table from the current one plus the changes feed.
+        # Returns None when only a rescan can tell what happened (folder moves,
+        # renames and deletions change the paths of everything below them).
+        index = {fid: i for i, fid in enumerate(self.files.ids)}
+        removed = set()
+        updated: Dict[int, Dict] = {}
+        added: List[Dict] = []
+
+        for change in changes:
+            fid = change['fileId']
+            file = change.get('file') or {}
+            if fid in self.folders or file.get('mimeType') in (FOLDER_MIME, SHORTCUT_MIME):
+                # Shortcuts need resolving, which only the scan does
+                if fid in self.folders or any(p in self.folders for p in file.get('parents', [])):
+                    return None
                 continue
 
-            downloaded = 0
-            speed = 0
-            current_total_size = 0
-            
-            for i, t in enumerate(self.sub_tasks):
-                downloaded += t.downloaded_size
-                speed += t.speed
-                
-                # Update total size based on actual task size if available
-                # Fallback to metadata size if task hasn't started or size unknown
-                if t.total_size > 0:
-                    current_total_size += t.total_size
-                elif i < len(self.files_metadata):
-                    current_total_size += int(self.files_metadata[i].get('size', 0))
-            
-            self.downloaded_size = downloaded
-            self.total_size = current_total_size
-            self.speed = speed
-            
-            # Save state occasionally
-            await asyncio.sleep(2)
-            self.save_state()
+            gone = change.get('removed') or file.get('trashed')
+            parents = [p for p in file.get('parents', []) if p in self.folders]
+            if fid in index:
+                if gone or not parents:
+                    removed.add(index[fid])
+                else:
+                    updated[index[fid]] = dict(file, id=fid, parent=parents[0])
+            elif parents and not gone:
+                added.append(dict(file, id=fid, parent=parents[0]))
 
-    def save_state(self):
-        # We need to save the state of sub-tasks too?
-        # DownloadTask saves its own state.
-        # We just need to save our metadata and list of sub-tasks (ids?)
-        
-        sub_task_states = []
-        for t in self.sub_tasks:
-            t.save_state() # Ensure they are saved
-            sub_task_states.append({
-                'id': t.id,
-                'filename': t.filename,
-                'status': t.status
-            })
-
-        state = {
+        remote = FolderFileTable()
+        old = self.files
+        for i in range(len(old)):
+            if i in removed:
+                continue
+            file = updated.get(i)
+            if file is None:
+                remote.append(old.ids[i], old.paths[i], old.mime_types[i], old.sizes[i], old.md5s[i], old.modified[i])
+            else:
+                added.append(file)
+        for file in added:
+            self._add_file(remote, file, self.folders[file['parent']])
+        return remote
+
+    def _merge_remote(self, remote: FolderFileTable) -> Tuple[Dict, List[int]]:
+        # Carry local progress over to the new remote table. Unchanged files stay
+        # done (and are moved if they were renamed), changed files are downloaded
+        # again, and files that are gone from Drive are optionally deleted.
+        # Runs in the executor: only completed files are touched here (plain file
+        # moves/removals). Returns the stats and the indices in the current table
+        # whose partial downloads the caller discards on the loop.
+        old = self.files
+        stale: List[int] = []
+        old_index = {fid: i for i, fid in enumerate(old.ids)}
+        stats = {"added": 0, "changed": 0, "unchanged": 0, "moved": 0, "removed": 0}
+
+        for j in range(len(remote)):
+            i = old_index.pop(remote.ids[j], None)
+            if i is None:
+                stats["added"] += 1
+                continue
+
+            if not _same_version(old, i, remote, j):
+                stats["changed"] += 1
+                stale.append(i)
+                continue
+
+            old_path = self._local_path(old.paths[i])
+            new_path = self._local_path(remote.paths[j])
+            if old.states[i] == FILE_DONE:
+                if old_path != new_path and os.path.exists(old_path):
+                    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                    os.replace(old_path, new_path)
+                    stats["moved"] += 1
+                if not os.path.exists(new_path):
+                    # Removed locally, fetch it again
+                    stats["changed"] += 1
+                    continue
+                remote.states[j] = FILE_DONE
+                remote.downloaded[j] = old.downloaded[i]
+            elif old_path != new_path:
+                # Partial download under the old name, start it over under the new one
+                stale.append(i)
+            stats["unchanged"] += 1
+
+        for i in old_index.values():
+            stats["removed"] += 1
+            if old.states[i] == FILE_DONE:
+                if self.delete_removed:
+                    path = self._local_path(old.paths[i])
+                    if os.path.exists(path):
+                        os.remove(path)
+            else:
+                stale.append(i)
+
+        return stats, stale
+
+    def _local_path(self, relative_path: str) -> str:
+        return os.path.join(self.download_dir, self._local_filename(relative_path))
+
+    def _discard_partial(self, table: FolderFileTable, index: int):
+        # Drop parts and state of a file that won't be resumed
+        if table.states[index] == FILE_DONE:
+            return
+        task = self._file_task(table.ids[index], table.paths[index], table.mime_types[index])
+        task.parent = None
+        task.delete_files()
+
+    def mark_dirty(self):
+        checkpoint_service.mark_dirty(self)
+
+    def get_state(self) -> Dict:
+        return {
             "type": "folder",
             "id": self.id,
             "folder_id": self.folder_id,
             "name": self.name,
             "status": self.status,
             "scanned": self.scanned,
-            "files_metadata": self.files_metadata,
+            "files": self.files.to_state(),
+            "folders": self.folders,
+            "changes_token": self.changes_token,
+            "resync_pending": self.resync_pending,
+            "delete_removed": self.delete_removed,
+            "sync_stats": self.sync_stats,
+            "queue_class": self.queue_class,
             "total_size": self.total_size,
             "downloaded_size": self.downloaded_size,
-            "sub_tasks": sub_task_states,
             "auto_extract": self.auto_extract,
             "speed_limit": self.speed_limit,
             "max_connections": self.max_connections,
             "completed_at": self.completed_at
         }
-        
-        with open(self.state_file, 'w') as f:
-            json.dump(state, f)
+
+    def save_state(self):
+        # Files in flight save their own (part) state, finished files live in our table
+        for t in self.sub_tasks.values():
+            t.save_state()
+        checkpoint_service.save_now(self)
+
+    def _load_legacy_files(self, state: Dict):
+        # Older states kept a list of dicts plus per-file sub-task statuses
+        saved_sub_tasks = {s['filename']: s for s in state.get('sub_tasks', [])}
+        self.files = FolderFileTable()
+        for i, meta in enumerate(state.get('files_metadata', [])):
+            size = int(meta.get('size', 0))
+            self.files.append(meta['id'], meta['relative_path'], meta.get('mimeType', ''), size)
+            saved = saved_sub_tasks.get(self._sub_filename(i))
+            if saved and saved.get('status') == TaskStatus.COMPLETED:
+                self.files.states[i] = FILE_DONE
+                self.files.downloaded[i] = size
 
     def load_state(self):
         if not os.path.exists(self.state_file):
             return False
-            
+
         try:
             with open(self.state_file, 'r') as f:
                 state = json.load(f)
-                
+
             self.id = state.get('id', self.id)
             self.folder_id = state.get('folder_id')
             self.name = state.get('name')
             self.status = state.get('status', TaskStatus.PENDING)
             self.scanned = state.get('scanned', False)
-            self.files_metadata = state.get('files_metadata', [])
+            self.folders = state.get('folders', {})
+            self.changes_token = state.get('changes_token')
+            self.resync_pending = state.get('resync_pending', False)
+            self.delete_removed = state.get('delete_removed', False)
+            self.sync_stats = state.get('sync_stats')
+            self.queue_class = state.get('queue_class', 'default')
             self.total_size = state.get('total_size', 0)
             self.downloaded_size = state.get('downloaded_size', 0)
             self.auto_extract = state.get('auto_extract', False)
             self.speed_limit = state.get('speed_limit', 0)
             self.max_connections = state.get('max_connections', 4)
             self.completed_at = state.get('completed_at', 0)
-            
-            # Restore sub-tasks
-            # We need to re-instantiate them.
-            # We can use the metadata to recreate them, and then load their individual states.
-            
-            self.sub_tasks = []
-            headers = drive_manager.get_headers()
-            
-            # Map of filename to subtask state for easier lookup
-            saved_sub_tasks = {s['filename']: s for s in state.get('sub_tasks', [])}
-            
-            for meta in self.files_metadata:
-                url = f"https://www.googleapis.com/drive/v3/files/{meta['id']}?alt=media"
-                
-                # Determine effective filename based on organization settings
-                final_filename = meta['relative_path']
-                if settings_manager.settings.organize_files:
-                     final_filename = os.path.join("Gdrive Folders", final_filename)
-                
-                task = DownloadTask(
-                    url=url,
-                    filename=final_filename,
-                    download_dir=self.download_dir,
-                    num_connections=self.max_connections,
-                    headers=headers,
-                    auto_extract=self.auto_extract
-                )
-                
-                if self.speed_limit > 0:
-                    task.set_speed_limit(self.speed_limit)
-                
-                # Try to load state
-                if task.load_state():
-                    # If loaded, good.
-                    pass
-                else:
-                    # If not found on disk, maybe we have some info in our saved state?
-                    # Not really, DownloadTask state is authoritative.
-                    pass
-                
-                self.sub_tasks.append(task)
-                
+
+            # Sub-tasks are created on demand when their file is downloaded
+            if 'files' in state:
+                self.files = FolderFileTable.from_state(state['files'])
+            else:
+                self._load_legacy_files(state)
+
             return True
         except Exception as e:
             print(f"Error loading folder task: {e}")
@@ -362,7 +636,7 @@ class DriveFolderTask:
     def pause(self):
         self.status = TaskStatus.PAUSED
         self._pause_event.clear()
-        for t in self.sub_tasks:
+        for t in self.sub_tasks.values():
             if t.status == TaskStatus.DOWNLOADING:
                 t.pause()
 
@@ -370,19 +644,16 @@ class DriveFolderTask:
         if self.status == TaskStatus.COMPLETED:
             return
         self.status = TaskStatus.DOWNLOADING
+        # Paused files end their run, _run_file() starts them again once it has
+        # ended. Resuming a run that is still unwinding would leave it canceled.
         self._pause_event.set()
-        
-        # Resume all paused sub-tasks
-        for t in self.sub_tasks:
-            if t.status == TaskStatus.PAUSED:
-                t.resume()
 
     async def cancel(self):
         self.status = TaskStatus.CANCELED
         self._pause_event.set()
-        for t in self.sub_tasks:
+        for t in list(self.sub_tasks.values()):
             await t.cancel()
-        
+
         if self.task_runner:
             self.task_runner.cancel()
 
@@ -395,13 +666,17 @@ class DriveFolderTask:
         # TODO: Implement rate limiting for folder tasks (propagate to subtasks or global limiter)
 
     def delete_files(self):
+        checkpoint_service.discard(self)
+        for t in self.sub_tasks.values():
+            checkpoint_service.discard(t)
+
         # Delete all files
-        import shutil
         if os.path.exists(self.filepath):
             shutil.rmtree(self.filepath)
         if os.path.exists(self.state_file):
             os.remove(self.state_file)
-        
-        # Delete sub-task states
-        for t in self.sub_tasks:
-            t.delete_files()
+
+        # Delete part files and states of unfinished files
+        for parts_root in [os.path.join(self.meta_dir, "Gdrive Folders", self.name), os.path.join(self.meta_dir, self.name)]:
+            if os.path.isdir(parts_root):
+                shutil.rmtree(parts_root)
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+# Task lifecycle events.
+#
+# Tasks and the manager publish what happens to them, subscribers react without
+# the publisher knowing about them (user hooks, the UI's event stream, ...).
+#
+#   status       every status change of a top-level task (old, new)
+#   progress     a download passed another PROGRESS_STEP percent (percent)
+#   downloaded   all bytes are on disk, the download slot is free again
+#   extracted    auto-extraction succeeded
+#   finished     post-processing (organize, index, extract) is done
+#   failed       the task ended in an error, in any stage
+#
+# publish() never blocks and never runs a subscriber inline: events go through
+# a bounded queue and one dispatcher delivers them on the event loop. Async
+# subscribers are awaited there, so they should hand long work off (see
+# core/hooks.py). Without subscribers for a type, publishing it costs nothing.
+
+QUEUE_SIZE = 10000 # Events beyond this are dropped while subscribers catch up
+PROGRESS_STEP = 25 # percent
+
+class EventBus:
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._runner: Optional[asyncio.Task] = None
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0, "errors": 0}
+
+    def subscribe(self, event_type: str, callback: Callable):
+        """Call `callback(event)` for events of `event_type` ("*" for all). It may be async."""
+        self._subscribers.setdefault(event_type, []).append(callback)
+
+    def unsubscribe(self, event_type: str, callback: Callable):
+        callbacks = self._subscribers.get(event_type, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def _listeners(self, event_type: str) -> List[Callable]:
+        return self._subscribers.get(event_type, []) + self._subscribers.get("*", [])
+
+    def publish(self, event_type: str, task=None, **data):
+        if not self._listeners(event_type):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # No loop (loading, executor threads), nobody could be listening yet
+
+        event = {"type": event_type, "time": time.time()}
+        if task is not None:
+            event.update({
+                "task_id": task.id,
+                "filename": task.filename,
+                "filepath": getattr(task, 'filepath', None),
+                "url": task.url,
+                "status": _plain(task.status),
+                "total_size": getattr(task, 'total_size', 0),
+                "category": getattr(task, 'category', None),
+            })
+        event.update(data)
+
+        if self._runner is None or self._runner.done():
+            # First event on this loop (the CLI may run several)
+            self._queue = asyncio.Queue(QUEUE_SIZE)
+            self._runner = loop.create_task(self._run())
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return
+        self.stats["published"] += 1
+
+    async def _run(self):
+        while True:
+            event = await self._queue.get()
+            try:
+                for callback in self._listeners(event["type"]):
+                    try:
+                        result = callback(event)
+                        if asyncio.iscoroutine(result):
+                            await result
+                        self.stats["delivered"] += 1
+                    except Exception as e:
+                        self.stats["errors"] += 1
+                        print(f"Event subscriber failed on {event['type']}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def drain(self):
+        """Wait until every published event has been delivered."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats["queued"] = self._queue.qsize() if self._queue else 0
+        stats["subscribers"] = {event_type: len(callbacks) for event_type, callbacks in self._subscribers.items() if callbacks}
+        return stats
+
+def _plain(status) -> str:
+    # TaskStatus members -> "downloading" etc., so events serialize the same everywhere
+    return getattr(status, 'value', status)
+
+def publish_status(task, old, new):
+    # Called by the tasks' status setters. Drive sub-tasks are reported through their folder.
+    if old != new and getattr(task, 'parent', None) is None:
+        event_bus.publish("status", task, old=_plain(old), new=_plain(new))
+
+event_bus = EventBus()
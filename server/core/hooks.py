@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from .settings import settings_manager, Hook
+from .events import event_bus
+
+# User hooks (settings.hooks): shell commands and webhooks on task events.
+#
+# They run in their own small thread pool, never on the event loop or in a
+# download slot, so a slow command or an unreachable webhook only delays other
+# hooks. Commands get the event in HDM_* environment variables, nothing is
+# interpolated into the command line.
+#
+# Hooks run arbitrary commands as the server user and POST to any URL, so they
+# are trusted configuration: they come only from settings.json, edited locally.
+# The settings API keeps the configured hooks and ignores any it is sent.
+
+HOOK_EVENTS = ("downloaded", "extracted", "finished", "failed")
+
+class HookRunner:
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers = 0
+        self._attached = False
+        self.stats = {"runs": 0, "failures": 0}
+
+    def attach(self):
+        if self._attached:
+            return
+        self._attached = True
+        for event_type in HOOK_EVENTS:
+            event_bus.subscribe(event_type, self.on_event)
+
+    def on_event(self, event: Dict):
+        for hook in settings_manager.settings.hooks:
+            if event["type"] in hook.events and (hook.command or hook.url):
+                self._pool().submit(self._run, hook, event)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        workers = max(settings_manager.settings.hook_workers, 1)
+        if self._executor is None or workers != self._workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False) # Running hooks finish on their own
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hdm-hook")
+            self._workers = workers
+        return self._executor
+
+    def _environment(self, event: Dict) -> Dict[str, str]:
+        env = dict(os.environ)
+        for key, value in event.items():
+            env[f"HDM_{key.upper()}"] = "" if value is None else str(value)
+        return env
+
+    def _run(self, hook: Hook, event: Dict):
+        try:
+            if hook.command:
+                result = subprocess.run(hook.command, shell=True, env=self._environment(event),
+                                        timeout=hook.timeout, capture_output=True, text=True)
+                if result.returncode != 0:
+                    raise Exception(f"exit code {result.returncode}: {result.stderr.strip()[:200]}")
+            if hook.url:
+                import urllib.request
+                request = urllib.request.Request(
+                    hook.url, data=json.dumps(event).encode(),
+                    headers={"Content-Type": "application/json"}, method="POST")
+                with urllib.request.urlopen(request, timeout=hook.timeout) as response:
+                    response.read()
+            self.stats["runs"] += 1
+        except Exception as e:
+            self.stats["failures"] += 1
+            print(f"Hook for {event['type']} of {event.get('filename')} failed: {e}")
+
+    def shutdown(self, wait: bool = True):
+        # Lets the CLI wait for hooks before exiting
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+hook_runner = HookRunner()
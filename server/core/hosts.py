@@ -0,0 +1,165 @@
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from .settings import settings_manager
+from .checkpoint import atomic_write_json
+
+# Per-host performance profiles, consulted for new tasks. Kept in memory per
+# host and shared with other processes (download workers) through
+# .parts/host_profiles.json, read in place on first use and afterwards only
+# read and written in the executor:
+#
+#   accept_ranges   Accept-Ranges from the last probe
+#   range_ignored   a Range request got a full 200 response
+#   speeds          {connections: EWMA bytes/s} of finished downloads
+#
+# Facts older than PROFILE_TTL are ignored. On conflicts the newer profile of
+# a host wins, a lost update is simply learned again later.
+
+PROFILE_TTL = 7 * 24 * 3600 # seconds
+SPEED_SMOOTHING = 0.3 # Weight of a new throughput sample
+MIN_SAMPLE_BYTES = 4 * 1024 * 1024 # Downloads smaller than this say little about throughput
+REFRESH_INTERVAL = 30 # seconds between looks for updates by other processes
+
+def host_key(url: str) -> Optional[str]:
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if not host:
+            return None
+        return f"{host}:{parts.port}" if parts.port else host
+    except ValueError:
+        return None
+
+class HostProfiles:
+    def __init__(self):
+        self.profiles: Dict[str, Dict] = {}
+        self._path: Optional[str] = None
+        self._mtime = 0.0
+        self._checked = 0.0
+        self._lock = threading.Lock() # Guards profiles
+        self._io_lock = threading.Lock() # One file sync at a time
+
+    def _profiles_path(self) -> str:
+        return os.path.join(settings_manager.settings.download_dir, ".parts", "host_profiles.json")
+
+    def _load(self):
+        path = self._profiles_path()
+        if path != self._path:
+            # First use or download dir changed: the only read done in place
+            with self._lock:
+                self._path = path
+                self._mtime = 0.0
+                self.profiles = {}
+            self._sync(write=False)
+        elif time.monotonic() - self._checked > REFRESH_INTERVAL:
+            self._in_background(write=False)
+
+    def _in_background(self, write: bool):
+        self._checked = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._sync(write) # No loop (scripts, executor threads)
+            return
+        loop.run_in_executor(None, self._sync, write)
+
+    def _sync(self, write: bool):
+        """Merge what other processes wrote to the file, then write ours if asked."""
+        with self._io_lock:
+            path = self._path
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != self._mtime:
+                try:
+                    with open(path, 'r') as f:
+                        on_disk = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Error reading host profiles: {e}")
+                    on_disk = {}
+                with self._lock:
+                    for key, profile in on_disk.items():
+                        if profile.get("updated", 0) > self.profiles.get(key, {}).get("updated", 0):
+                            self.profiles[key] = profile
+                self._mtime = mtime
+            if not write:
+                return
+
+            with self._lock:
+                snapshot = copy.deepcopy(self.profiles)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                atomic_write_json(path, snapshot)
+                self._mtime = os.path.getmtime(path)
+            except OSError as e:
+                print(f"Error saving host profiles: {e}")
+
+    def _fresh(self, url: str) -> Optional[Dict]:
+        profile = self.profiles.get(host_key(url) or "")
+        if profile and time.time() - profile.get("updated", 0) < PROFILE_TTL:
+            return profile
+        return None
+
+    def get(self, url: str) -> Optional[Dict]:
+        self._load()
+        with self._lock:
+            profile = self._fresh(url)
+            return dict(profile) if profile else None
+
+    def ignores_ranges(self, url: str) -> bool:
+        profile = self.get(url)
+        return bool(profile and profile.get("range_ignored"))
+
+    def connections_for(self, url: str, default: int) -> int:
+        """Connection count for a new task: the best measured one, at most `default`."""
+        profile = self.get(url)
+        if not profile:
+            return default
+        if profile.get("range_ignored"):
+            return 1
+        speeds = {int(n): speed for n, speed in profile.get("speeds", {}).items() if int(n) <= default}
+        if default not in speeds:
+            return default # Measure the configured count before preferring another
+        return max(speeds, key=speeds.get)
+
+    def record(self, url: str, **facts):
+        """Store facts about the host of `url` (accept_ranges, range_ignored)."""
+        key = host_key(url)
+        if not key:
+            return
+        self._load()
+        with self._lock:
+            profile = self.profiles.setdefault(key, {})
+            if all(profile.get(name) == value for name, value in facts.items()) and self._fresh(url):
+                return # Nothing new, skip the write
+            profile.update(facts)
+            profile["updated"] = time.time()
+        self._in_background(write=True)
+
+    def record_throughput(self, url: str, connections: int, size: int, seconds: float):
+        key = host_key(url)
+        if not key or size < MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        speed = size / seconds
+        self._load()
+        with self._lock:
+            profile = self.profiles.setdefault(key, {})
+            speeds = profile.setdefault("speeds", {})
+            previous = speeds.get(str(connections))
+            speeds[str(connections)] = speed if previous is None else previous + SPEED_SMOOTHING * (speed - previous)
+            profile["updated"] = time.time()
+        self._in_background(write=True)
+
+    def get_all(self) -> Dict[str, Dict]:
+        self._load()
+        with self._lock:
+            return {key: dict(profile) for key, profile in self.profiles.items()}
+
+host_profiles = HostProfiles()
@@ -0,0 +1,156 @@
+import os
+import json
+import xml.etree.ElementTree as ET
+from typing import List, Dict, Optional
+from urllib.parse import urlparse, unquote
+
+# Parsers for the bulk import formats. Every parser returns a list of entries:
+#   {
+#     "url": str,                   # primary source
+#     "filename": Optional[str],
+#     "mirrors": List[str],         # additional sources for the same bytes
+#     "size": int,                  # 0 if unknown
+#     "hash_type": Optional[str],   # hashlib name, e.g. "sha256"
+#     "checksum": Optional[str],    # whole-file hash
+#     "piece_length": int,          # 0 if no piece hashes
+#     "piece_hashes": List[str],
+#   }
+
+# Preferred order when a Metalink file lists several whole-file hashes
+HASH_PREFERENCE = ["sha512", "sha384", "sha256", "sha1", "md5"]
+
+def is_valid_url(url: str) -> bool:
+    parsed = urlparse(url)
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+def filename_from_url(url: str) -> str:
+    path = urlparse(url).path
+    return unquote(path.split('/')[-1]) or "downloaded_file"
+
+def normalize_hash_type(hash_type: Optional[str]) -> Optional[str]:
+    # Metalink uses IANA names ("sha-256"), hashlib wants "sha256"
+    if not hash_type:
+        return None
+    return hash_type.lower().replace("-", "")
+
+def make_entry(url: str, filename: Optional[str] = None, **fields) -> Dict:
+    entry = {
+        "url": url,
+        "filename": filename,
+        "mirrors": [],
+        "size": 0,
+        "hash_type": None,
+        "checksum": None,
+        "piece_length": 0,
+        "piece_hashes": [],
+    }
+    entry.update({k: v for k, v in fields.items() if v is not None})
+    return entry
+
+def parse_url_list(text: str) -> List[Dict]:
+    """One URL per line. Blank lines and lines starting with '#' are ignored."""
+    entries = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        entries.append(make_entry(line))
+    return entries
+
+def _local_name(tag: str) -> str:
+    # Strip the XML namespace: "{urn:ietf:params:xml:ns:metalink}file" -> "file"
+    return tag.rsplit('}', 1)[-1]
+
+def _children(el, name: str):
+    return [c for c in el if _local_name(c.tag) == name]
+
+def parse_metalink(text: str) -> List[Dict]:
+    """Metalink 4 (RFC 5854) files with sizes, hashes, piece hashes and mirrors."""
+    root = ET.fromstring(text)
+    entries = []
+    for file_el in root.iter():
+        if _local_name(file_el.tag) != "file":
+            continue
+
+        # Lower priority value means preferred source
+        url_els = sorted(_children(file_el, "url"), key=lambda u: int(u.get("priority", 999999)))
+        urls = [u.text.strip() for u in url_els if u.text and u.text.strip()]
+        if not urls:
+            continue
+
+        size = 0
+        for size_el in _children(file_el, "size"):
+            size = int(size_el.text.strip())
+
+        hashes = {}
+        for hash_el in _children(file_el, "hash"):
+            hash_type = normalize_hash_type(hash_el.get("type"))
+            if hash_type and hash_el.text:
+                hashes[hash_type] = hash_el.text.strip().lower()
+        hash_type = next((h for h in HASH_PREFERENCE if h in hashes), None)
+
+        piece_length = 0
+        piece_hashes = []
+        piece_hash_type = None
+        for pieces_el in _children(file_el, "pieces"):
+            piece_hash_type = normalize_hash_type(pieces_el.get("type"))
+            piece_length = int(pieces_el.get("length", 0))
+            piece_hashes = [h.text.strip().lower() for h in _children(pieces_el, "hash") if h.text]
+
+        # Pieces and the whole-file hash share a single hash_type on the task.
+        # Prefer the piece type since that is what allows partial repair.
+        checksum = hashes.get(piece_hash_type) if piece_hashes else (hashes.get(hash_type) if hash_type else None)
+
+        name = file_el.get("name")
+        entries.append(make_entry(
+            urls[0],
+            os.path.basename(name) if name else None,
+            mirrors=urls[1:],
+            size=size,
+            hash_type=piece_hash_type if piece_hashes else hash_type,
+            checksum=checksum,
+            piece_length=piece_length if piece_hashes else 0,
+            piece_hashes=piece_hashes,
+        ))
+    return entries
+
+def parse_json_manifest(text: str) -> List[Dict]:
+    """A list of files, or {"files": [...]}, using the entry keys above.
+
+    "urls" may be given instead of "url"/"mirrors".
+    """
+    data = json.loads(text)
+    items = data.get("files", []) if isinstance(data, dict) else data
+
+    entries = []
+    for item in items:
+        if isinstance(item, str):
+            entries.append(make_entry(item))
+            continue
+        urls = list(item.get("urls") or [])
+        if item.get("url"):
+            urls.insert(0, item["url"])
+        urls += [u for u in item.get("mirrors") or [] if u not in urls]
+        if not urls:
+            continue
+        entries.append(make_entry(
+            urls[0],
+            item.get("filename") or item.get("name"),
+            mirrors=urls[1:],
+            size=int(item.get("size") or 0),
+            hash_type=normalize_hash_type(item.get("hash_type")),
+            checksum=(item.get("checksum") or "").lower() or None,
+            piece_length=int(item.get("piece_length") or 0),
+            piece_hashes=[h.lower() for h in item.get("piece_hashes") or []],
+        ))
+    return entries
+
+def parse_import_file(filename: str, data: bytes) -> List[Dict]:
+    text = data.decode("utf-8-sig", errors="replace")
+    ext = os.path.splitext(filename or "")[1].lower()
+    stripped = text.lstrip()
+    if ext in (".metalink", ".meta4") or stripped.startswith("<"):
+        return parse_metalink(text)
+    if ext == ".json" or stripped.startswith(("{", "[")):
+        return parse_json_manifest(text)
+    return parse_url_list(text)
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+from .settings import settings_manager
+
+# Unique file names without probing the disk.
+#
+# A name is taken if a task uses it (reserved) or something with that name is on
+# disk, either in download_dir or in one of its subfolders, which is where
+# organize_file puts finished downloads (Videos/, Archives/, ...). Everything
+# lives in sets, and numbering continues from a per-name counter, so an
+# allocation is O(1) no matter how many "name (n).ext" copies exist.
+#
+# Names are reserved when they are handed out, before any file exists, so two
+# adds of the same name can't both get it. The disk side is re-listed at most
+# every RESCAN_INTERVAL to pick up files created or deleted outside HDM.
+
+RESCAN_INTERVAL = 60 # seconds
+
+class NameIndex:
+    def __init__(self):
+        self.reserved: Set[str] = set() # Names used by tasks
+        self.on_disk: Set[str] = set() # Names found in download_dir and its category folders
+        self._counters: Dict[str, int] = {} # name -> next number to try
+        self._download_dir: Optional[str] = None
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+    def reset(self, task_names: Iterable[str]):
+        with self._lock:
+            self.reserved = set(task_names)
+            self._counters = {}
+            self._scanned_at = 0.0
+
+    def _scan(self) -> Set[str]:
+        names = set()
+        root = self._download_dir
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            return names
+        for entry in entries:
+            names.add(entry.name)
+            if entry.is_dir() and not entry.name.startswith("."):
+                try:
+                    names.update(os.listdir(entry.path))
+                except OSError:
+                    pass
+        return names
+
+    def _refresh(self):
+        download_dir = settings_manager.settings.download_dir
+        if download_dir != self._download_dir or time.monotonic() - self._scanned_at > RESCAN_INTERVAL:
+            self._download_dir = download_dir
+            self.on_disk = self._scan()
+            self._scanned_at = time.monotonic()
+
+    def _taken(self, name: str) -> bool:
+        return name in self.reserved or name in self.on_disk
+
+    def is_taken(self, name: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return self._taken(name)
+
+    def allocate(self, filename: str) -> str:
+        """Reserve `filename`, or the first free "name (n).ext" if it is taken."""
+        with self._lock:
+            self._refresh()
+            if not self._taken(filename):
+                self.reserved.add(filename)
+                return filename
+
+            base, ext = os.path.splitext(filename)
+            # Continue numbering where the last allocation of this name stopped
+            counter = self._counters.get(filename, 1)
+            while self._taken(f"{base} ({counter}){ext}"):
+                counter += 1
+            new_filename = f"{base} ({counter}){ext}"
+            self._counters[filename] = counter + 1
+            self.reserved.add(new_filename)
+            return new_filename
+
+    def reserve(self, name: str) -> bool:
+        """Reserve exactly `name`. False if it is already taken."""
+        with self._lock:
+            self._refresh()
+            if self._taken(name):
+                return False
+            self.reserved.add(name)
+            return True
+
+    def release(self, name: str):
+        # The task and its files are gone
+        with self._lock:
+            self.reserved.discard(name)
+            self.on_disk.discard(name)
+
+name_index = NameIndex()
@@ -0,0 +1,88 @@
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional
+
+# Central speed/ETA sampler.
+#
+# Instead of every task (and every Drive sub-task) running its own
+# "sleep(1) and diff" coroutine, active tasks register here and a single loop
+# samples all of them on the same tick. Speeds are smoothed with an EWMA whose
+# weight depends on the real elapsed time, so a late tick doesn't produce a
+# spike, and the ETA is derived from the smoothed speed.
+
+SAMPLE_INTERVAL = 1.0 # seconds
+SMOOTHING_WINDOW = 3.0 # EWMA time constant in seconds
+
+class _Sample:
+    __slots__ = ("downloaded", "parts", "time")
+
+    def __init__(self, downloaded: int, parts: List[int], now: float):
+        self.downloaded = downloaded
+        self.parts = parts
+        self.time = now
+
+def _part_positions(task) -> List[int]:
+    return [p['current'] for p in getattr(task, 'parts_info', None) or []]
+
+class ProgressSampler:
+    def __init__(self):
+        self.tasks: Dict[str, object] = {}
+        self._samples: Dict[str, _Sample] = {}
+        self._runner: Optional[asyncio.Task] = None
+
+    def track(self, task):
+        self.tasks[task.id] = task
+        self._samples[task.id] = _Sample(task.downloaded_size, _part_positions(task), time.monotonic())
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    def untrack(self, task):
+        self.tasks.pop(task.id, None)
+        self._samples.pop(task.id, None)
+        task.speed = 0
+        task.eta = None
+        task.connection_speeds = []
+
+    async def _run(self):
+        while self.tasks:
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            now = time.monotonic()
+            for task_id, task in list(self.tasks.items()):
+                self._sample(task, self._samples[task_id], now)
+
+    def _sample(self, task, last: _Sample, now: float):
+        elapsed = now - last.time
+        if elapsed <= 0:
+            return
+
+        positions = _part_positions(task)
+        if getattr(task, 'status', None) == "paused":
+            task.speed = 0
+            task.eta = None
+            task.connection_speeds = [0] * len(positions)
+        else:
+            weight = 1 - math.exp(-elapsed / SMOOTHING_WINDOW)
+
+            instant = max(task.downloaded_size - last.downloaded, 0) / elapsed
+            task.speed = int(weight * instant + (1 - weight) * task.speed)
+
+            # Per-connection rates. The part layout can change (e.g. falling back
+            # to a single connection), in which case we start over.
+            previous = task.connection_speeds if len(task.connection_speeds) == len(positions) else [0] * len(positions)
+            if len(last.parts) == len(positions):
+                task.connection_speeds = [
+                    int(weight * max(cur - old, 0) / elapsed + (1 - weight) * prev)
+                    for cur, old, prev in zip(positions, last.parts, previous)
+                ]
+            else:
+                task.connection_speeds = previous
+
+            remaining = task.total_size - task.downloaded_size
+            task.eta = int(remaining / task.speed) if task.speed > 0 and task.total_size > 0 else None
+
+        last.downloaded = task.downloaded_size
+        last.parts = positions
+        last.time = now
+
+progress_sampler = ProgressSampler()
@@ -0,0 +1,70 @@
+import asyncio
+import functools
+import os
+from typing import Dict, List, Optional
+from .names import name_index
+from .checkpoint import checkpoint_service
+
+# Background teardown of deleted tasks. The manager takes a task out of its
+# list and hands it over; the reaper cancels it, waits for it to stop and
+# removes its files in the executor, REAP_IO_CONCURRENCY at a time. The name
+# stays reserved until the files are gone. When the files are kept, only the
+# state file is removed so the task doesn't come back on the next start.
+
+REAP_IO_CONCURRENCY = 2
+REAP_STOP_TIMEOUT = 30 # seconds to wait for a canceled task to stop
+
+def _remove_state(task):
+    if os.path.exists(task.state_file):
+        os.remove(task.state_file)
+
+class Reaper:
+    def __init__(self):
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._io_slots: Optional[asyncio.Semaphore] = None
+        self.stats = {"reaped": 0, "failed": 0}
+
+    def submit(self, task, cancel: bool, delete_files: bool, wait_for: List[asyncio.Task] = ()):
+        """Tear `task` down in the background. `wait_for`: runners to let finish first."""
+        self._jobs[task.id] = asyncio.create_task(self._reap(task, cancel, delete_files, list(wait_for)))
+
+    async def _reap(self, task, cancel: bool, delete_files: bool, wait_for: List[asyncio.Task]):
+        # No checkpoint may write the state file again from here on
+        checkpoint_service.discard(task)
+        try:
+            if cancel:
+                await task.cancel()
+            # Let file handles close before the files go
+            running = {t for t in wait_for if t is not None and not t.done()}
+            if running:
+                await asyncio.wait(running, timeout=REAP_STOP_TIMEOUT)
+
+            if self._io_slots is None:
+                self._io_slots = asyncio.Semaphore(REAP_IO_CONCURRENCY)
+            async with self._io_slots:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, task.delete_files if delete_files else functools.partial(_remove_state, task))
+            if delete_files:
+                # Kept files still hold their name
+                name_index.release(task.filename)
+            self.stats["reaped"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"Error tearing down {task.filename}: {e}")
+        finally:
+            self._jobs.pop(task.id, None)
+
+    @property
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    async def drain(self):
+        while self._jobs:
+            await asyncio.gather(*list(self._jobs.values()), return_exceptions=True)
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats["pending"] = self.pending
+        return stats
+
+reaper = Reaper()
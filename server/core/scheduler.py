@@ -0,0 +1,165 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Optional, Set
+from .settings import settings_manager, ScheduleWindow
+
+# Time-of-day bandwidth policies.
+#
+# settings.schedule holds windows (days + start/end time) that, while active,
+# set a global bandwidth cap, override max_concurrent_downloads and pause whole
+# queue classes (task.queue_class, e.g. "bulk"). Overlapping windows combine:
+# the lowest cap and concurrency win, paused classes add up.
+#
+# The cap is one token bucket shared by every connection of every task, so it
+# is changed in place and running connections just slow down or speed up,
+# nothing is restarted. Per-task limits still apply on top of it.
+
+CHECK_INTERVAL = 30 # seconds between schedule evaluations
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def window_active(window: ScheduleWindow, now: datetime) -> bool:
+    start, end = _minutes(window.start), _minutes(window.end)
+    minute = now.hour * 60 + now.minute
+    day = now.weekday() # 0 = Monday
+    if start == end:
+        return day in window.days # All day
+    if start < end:
+        return day in window.days and start <= minute < end
+    # Wraps past midnight: the early hours belong to the previous day's window
+    if minute >= start:
+        return day in window.days
+    if minute < end:
+        return (day - 1) % 7 in window.days
+    return False
+
+class GlobalRateLimiter:
+    """Token bucket shared by all connections. The rate can change at any time."""
+
+    def __init__(self):
+        self.rate = 0 # bytes per second, 0 = unlimited
+        self.tokens = 0.0
+        self.last_check = time.monotonic()
+        self.lock: Optional[asyncio.Lock] = None
+
+    def set_rate(self, rate_kbps: int):
+        rate = max(rate_kbps, 0) * 1024
+        if rate != self.rate:
+            self.rate = rate
+            self.tokens = min(self.tokens, rate)
+            self.last_check = time.monotonic()
+
+    async def wait_for_token(self, amount: int):
+        if self.rate <= 0:
+            return
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+
+        async with self.lock:
+            while self.rate > 0:
+                now = time.monotonic()
+                self.tokens = min(self.tokens + (now - self.last_check) * self.rate, self.rate)
+                self.last_check = now
+
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+
+                # Short sleeps so a rate change takes effect right away
+                await asyncio.sleep(min((amount - self.tokens) / self.rate, 0.25))
+
+global_limiter = GlobalRateLimiter()
+
+class Scheduler:
+    def __init__(self):
+        self.policy: Dict = self._default_policy()
+        self.paused_by_schedule: Set[str] = set() # Task ids we paused
+        self.manager = None # DownloadManager whose queue the schedule applies to
+        self._runner: Optional[asyncio.Task] = None
+
+    def _default_policy(self) -> Dict:
+        return {"windows": [], "max_speed_kbps": 0, "max_concurrent_downloads": None, "paused_classes": []}
+
+    def evaluate(self, now: Optional[datetime] = None) -> Dict:
+        now = now or datetime.now()
+        policy = self._default_policy()
+        paused = set()
+        for window in settings_manager.settings.schedule:
+            if not window_active(window, now):
+                continue
+            policy["windows"].append(window.name or f"{window.start}-{window.end}")
+            if window.max_speed_kbps > 0:
+                current = policy["max_speed_kbps"]
+                policy["max_speed_kbps"] = min(current, window.max_speed_kbps) if current else window.max_speed_kbps
+            if window.max_concurrent_downloads is not None:
+                current = policy["max_concurrent_downloads"]
+                policy["max_concurrent_downloads"] = min(current, window.max_concurrent_downloads) if current is not None else window.max_concurrent_downloads
+            paused.update(window.paused_classes)
+        policy["paused_classes"] = sorted(paused)
+        return policy
+
+    def max_concurrent_downloads(self) -> int:
+        limit = self.policy["max_concurrent_downloads"]
+        return settings_manager.settings.max_concurrent_downloads if limit is None else limit
+
+    def is_paused(self, task) -> bool:
+        return getattr(task, 'queue_class', 'default') in self.policy["paused_classes"]
+
+    def ensure_running(self, manager=None):
+        if manager is not None:
+            self.manager = manager
+        if self._runner is None or self._runner.done():
+            self.policy = self.evaluate()
+            self._set_rate(self.policy["max_speed_kbps"])
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(CHECK_INTERVAL)
+            try:
+                await self.apply()
+            except Exception as e:
+                print(f"Error applying schedule: {e}")
+
+    def _set_rate(self, rate_kbps: int):
+        global_limiter.set_rate(rate_kbps)
+        from .workers import worker_pool
+        worker_pool.set_global_rate(rate_kbps)
+
+    async def apply(self):
+        """Re-evaluate the schedule and reconfigure running and queued tasks."""
+        from .downloader import TaskStatus
+        if self.manager is None:
+            from .downloader import manager
+            self.manager = manager
+        manager = self.manager
+
+        self.policy = self.evaluate()
+        self._set_rate(self.policy["max_speed_kbps"])
+
+        for task in list(manager.tasks.values()):
+            if task.status == TaskStatus.DOWNLOADING and self.is_paused(task):
+                task.pause()
+                task.wait_reason = "Paused by schedule"
+                self.paused_by_schedule.add(task.id)
+
+        for task_id in list(self.paused_by_schedule):
+            task = manager.tasks.get(task_id)
+            if task is None or task.status != TaskStatus.PAUSED:
+                # Deleted, or the user took over
+                self.paused_by_schedule.discard(task_id)
+            elif not self.is_paused(task):
+                self.paused_by_schedule.discard(task_id)
+                task.wait_reason = None
+                await manager.resume_task(task_id)
+
+        # Concurrency may have changed, and paused classes may be allowed again
+        await manager.process_queue()
+
+    def get_status(self) -> Dict:
+        return dict(self.policy, paused_by_schedule=sorted(self.paused_by_schedule))
+
+scheduler = Scheduler()
@@ -1,20 +1,113 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
+from typing import Dict, List, Optional
 import json
 import os
 
+class ScheduleWindow(BaseModel):
+    # Active on these weekdays (0 = Monday) between start and end (local "HH:MM").
+    # An end before the start runs past midnight, start == end is the whole day.
+    name: str = ""
+    days: List[int] = [0, 1, 2, 3, 4, 5, 6]
+    start: str = "09:00"
+    end: str = "18:00"
+    max_speed_kbps: int = 0 # Global cap over all downloads, 0 = no cap
+    max_concurrent_downloads: Optional[int] = None # Overrides the setting while active
+    paused_classes: List[str] = [] # Queue classes that don't run while active
+
+    @validator('start', 'end')
+    def check_time(cls, value: str) -> str:
+        # Rejected here, before settings.json is written and the scheduler parses it
+        hours, _, minutes = value.partition(":")
+        if not (hours.isdigit() and minutes.isdigit() and len(hours) <= 2 and len(minutes) == 2
+                and 0 <= int(hours) <= 23 and 0 <= int(minutes) <= 59):
+            raise ValueError(f"Invalid time {value!r}, expected HH:MM (00:00-23:59)")
+        return value
+
+class CategoryRule(BaseModel):
+    # Files matching the rule go to download_dir/<category> (see core/categories.py).
+    # Matches if the extension or the MIME type (a prefix like "video/") is listed,
+    # and the size is within min/max. Empty criteria match anything.
+    category: str
+    extensions: List[str] = []
+    mime_types: List[str] = []
+    min_size_mb: int = 0
+    max_size_mb: int = 0 # 0 = no upper bound
+
+class Hook(BaseModel):
+    # Runs when one of `events` happens to a task (see core/events.py): a shell
+    # command, with the task in HDM_* environment variables, and/or a POST of
+    # the event as JSON to `url`.
+    events: List[str] = ["finished"]
+    command: str = ""
+    url: str = ""
+    timeout: int = 60 # seconds
+
+DEFAULT_CATEGORY_RULES = [
+    CategoryRule(category="Images", extensions=['.jpg', '.jpeg', '.png', '.gif', '.webp'], mime_types=["image/"]),
+    CategoryRule(category="Videos", extensions=['.mp4', '.mkv', '.avi', '.mov'], mime_types=["video/"]),
+    CategoryRule(category="Music", extensions=['.mp3', '.wav', '.flac'], mime_types=["audio/"]),
+    CategoryRule(category="Archives", extensions=['.zip', '.rar', '.7z', '.tar', '.gz']),
+    CategoryRule(category="Programs", extensions=['.exe', '.msi', '.deb', '.rpm']),
+    CategoryRule(category="Documents", extensions=['.pdf', '.doc', '.docx', '.txt']),
+]
+
 class Settings(BaseModel):
     download_dir: str = os.path.join(os.path.expanduser("~"), "Downloads", "HDM")
     max_concurrent_downloads: int = 3
     max_connections_per_task: int = 4
     organize_files: bool = True
+    # First matching rule picks the category folder, "Others" if none matches
+    category_rules: List[CategoryRule] = DEFAULT_CATEGORY_RULES
+    # Hosts (and their subdomains) downloaded over a shared, multiplexed HTTP/2 client.
+    # Needs httpx[http2]; falls back to HTTP/1.1 otherwise.
+    http2_hosts: List[str] = []
+    http2_max_connections: int = 2
+    # Disk budgeting: keep this much free, and reserve room for extraction output
+    # as a multiple of the archive size when auto-extract is on.
+    min_free_space_mb: int = 512
+    extract_space_factor: float = 1.0
+    # fdatasync part files every N MB written so dirty pages don't pile up (0 = never)
+    writeback_sync_mb: int = 64
+    # How often dirty task states are written to disk, in seconds
+    checkpoint_interval: float = 5.0
+    # Run downloads and extraction in this many worker processes (0 = all in the API process)
+    worker_processes: int = 0
+    # Reuse bytes already downloaded (see core/dedup.py): "reflink" (copy-on-write
+    # clone, else copy), "hardlink" (else reflink/copy), "copy" or "off"
+    dedup_mode: str = "reflink"
+    # Time-of-day bandwidth policies, see core/scheduler.py
+    schedule: List[ScheduleWindow] = []
+    # Finished downloads are organized, indexed and extracted outside the download
+    # slots, this many at a time
+    max_post_processing: int = 1
+    # User hooks, run by this many threads (see core/hooks.py). Only read from
+    # settings.json, POST /api/settings can't change them.
+    hooks: List[Hook] = []
+    hook_workers: int = 2
+    # Google Docs, Sheets, ... are exported from Drive: kind -> file extension
+    # (see EXPORT_FORMATS in core/drive.py), a missing or empty kind is skipped
+    drive_export_formats: Dict[str, str] = {
+        "document": "docx", "spreadsheet": "xlsx", "presentation": "pptx", "drawing": "pdf", "script": "json",
+    }
 
 class SettingsManager:
     def __init__(self, config_file="settings.json"):
         self.config_file = config_file
-        self.settings = Settings()
-        self.load_settings()
+        # Read on first use rather than at import, so importing core has no side effects
+        self._settings: Optional[Settings] = None
+
+    @property
+    def settings(self) -> Settings:
+        if self._settings is None:
+            self.load_settings()
+        return self._settings
+
+    @settings.setter
+    def settings(self, value: Settings):
+        self._settings = value
 
     def load_settings(self):
+        self.settings = Settings()
         if os.path.exists(self.config_file):
             with open(self.config_file, 'r') as f:
                 data = json.load(f)
@@ -29,6 +122,12 @@ class SettingsManager:
         if not os.path.exists(self.settings.download_dir):
             os.makedirs(self.settings.download_dir)
 
+    def use(self, settings: Settings):
+        # Explicit configuration (library/CLI use): nothing is read from or written to config_file
+        self.settings = settings
+        if not os.path.exists(self.settings.download_dir):
+            os.makedirs(self.settings.download_dir)
+
     def save_settings(self, new_settings: Settings):
         self.settings = new_settings
         with open(self.config_file, 'w') as f:
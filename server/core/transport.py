@@ -0,0 +1,157 @@
+import asyncio
+import aiohttp
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from .settings import settings_manager
+
+# HTTP/2 transport for many-small-file workloads.
+#
+# aiohttp only speaks HTTP/1.1, so every file (and every range segment) needs
+# its own TCP+TLS connection. For hosts listed in settings.http2_hosts we use a
+# shared httpx client instead, which multiplexes all requests to that host over
+# a couple of HTTP/2 connections. httpx[http2] is optional (see
+# requirements-http2.txt): without it we fall back to aiohttp.
+#
+# Both transports expose the small subset of the aiohttp API that DownloadTask
+# uses: session.get()/head() as async context managers, response.status,
+# response.headers, response.content.iter_chunked(), session.close()/closed.
+
+try:
+    import httpx
+    import h2 # http2=True needs it, installed by the httpx[http2] extra
+except ImportError:
+    httpx = None
+
+_h2_clients: Dict[str, "httpx.AsyncClient"] = {}
+_warned_missing_h2 = False
+
+def use_http2(url: str) -> bool:
+    global _warned_missing_h2
+    hosts = settings_manager.settings.http2_hosts
+    if not hosts:
+        return False
+
+    host = (urlparse(url).hostname or "").lower()
+    matched = any(host == h.lower() or host.endswith("." + h.lower()) for h in hosts)
+    if matched and httpx is None:
+        if not _warned_missing_h2:
+            print("HTTP/2 requested but httpx[http2] is not installed, using HTTP/1.1")
+            _warned_missing_h2 = True
+        return False
+    return matched
+
+def _get_h2_client(url: str) -> "httpx.AsyncClient":
+    parsed = urlparse(url)
+    key = f"{parsed.scheme}://{parsed.netloc}"
+    client = _h2_clients.get(key)
+    if client is None or client.is_closed:
+        max_connections = max(1, settings_manager.settings.http2_max_connections)
+        client = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            timeout=httpx.Timeout(30.0, read=300.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        _h2_clients[key] = client
+    return client
+
+class _H2Content:
+    def __init__(self, response: "httpx.Response"):
+        self._response = response
+
+    async def iter_chunked(self, n: int):
+        try:
+            async for chunk in self._response.aiter_bytes(n):
+                yield chunk
+        except httpx.TransportError as e:
+            # Surface as an aiohttp error so the retry logic treats both transports the same
+            raise aiohttp.ClientPayloadError(str(e)) from e
+
+class _H2Response:
+    def __init__(self, response: "httpx.Response"):
+        self.status = response.status_code
+        self.headers = response.headers
+        self.content = _H2Content(response)
+
+class _H2Request:
+    def __init__(self, session: "Http2Session", method: str, url: str, headers: Optional[Dict[str, str]], follow_redirects: bool):
+        self._session = session
+        self._method = method
+        self._url = url
+        self._headers = headers
+        self._follow_redirects = follow_redirects
+        self._response: Optional["httpx.Response"] = None
+
+    async def __aenter__(self) -> _H2Response:
+        if self._session.closed:
+            raise aiohttp.ClientError("Session is closed")
+        client = self._session.client
+        request = client.build_request(self._method, self._url, headers=self._headers)
+        try:
+            self._response = await client.send(request, stream=True, follow_redirects=self._follow_redirects)
+        except httpx.TransportError as e:
+            raise aiohttp.ClientError(str(e)) from e
+        self._session._open_responses.add(self._response)
+        return _H2Response(self._response)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._response is not None:
+            self._session._open_responses.discard(self._response)
+            await self._response.aclose()
+
+class Http2Session:
+    """Per-task view over the shared, multiplexed HTTP/2 client of a host.
+
+    Closing it only closes the streams this task opened; the underlying
+    connections stay in the pool for the other tasks.
+    """
+
+    def __init__(self, url: str):
+        self.client = _get_h2_client(url)
+        self.closed = False
+        self._open_responses = set()
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> _H2Request:
+        return _H2Request(self, "GET", url, headers, follow_redirects=True)
+
+    def head(self, url: str, headers: Optional[Dict[str, str]] = None) -> _H2Request:
+        # Same default as aiohttp: HEAD does not follow redirects
+        return _H2Request(self, "HEAD", url, headers, follow_redirects=False)
+
+    async def close(self):
+        self.closed = True
+        for response in list(self._open_responses):
+            await response.aclose()
+        self._open_responses.clear()
+
+# HTTP/1.1 sessions share one keep-alive connection pool per event loop, so the
+# HEAD probe, the parts and resumes reuse connections. Closing a session leaves
+# the pool alone.
+_pool: Optional[aiohttp.TCPConnector] = None
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _get_pool() -> aiohttp.TCPConnector:
+    global _pool, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool.closed or _pool_loop is not loop:
+        # No limit, the tasks bound their own connection counts
+        _pool = aiohttp.TCPConnector(limit=0)
+        _pool_loop = loop
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None and not _pool.closed:
+        await _pool.close()
+    _pool = None
+    clients = list(_h2_clients.values())
+    _h2_clients.clear()
+    for client in clients:
+        if not client.is_closed:
+            await client.aclose()
+
+def open_session(url: str):
+    """Open a session for downloading `url` using the transport configured for its host."""
+    if use_http2(url):
+        return Http2Session(url)
+    return aiohttp.ClientSession(connector=_get_pool(), connector_owner=False)
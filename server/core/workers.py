@@ -0,0 +1,334 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from .settings import settings_manager, Settings
+
+# Multi-process worker mode.
+#
+# With settings.worker_processes > 0 the API process becomes a control plane:
+# DownloadManager still owns the queue, the task list and every decision, but
+# the heavy part of a task (its connections, writing, merging, hashing and
+# extraction) runs in one of N worker processes, each with its own event loop.
+#
+# Control plane -> worker: per-worker command queue ("download", "extract",
+# "pause", "resume", "cancel", "release", "limit", "url", "stream", "settings", "rate",
+# "stop").
+# Worker -> control plane: one shared event queue. Every REPORT_INTERVAL each
+# worker sends a single batched snapshot of all its tasks, which the control
+# plane copies onto its own DownloadTask objects, so the API, the UI and the
+# Drive folder aggregation keep working unchanged.
+#
+# A task's state file belongs to the worker while it runs there. The worker
+# flushes its checkpoints before reporting a task as done.
+
+REPORT_INTERVAL = 0.5 # seconds
+
+# Task attributes mirrored from the worker to the control plane
+PROGRESS_FIELDS = (
+    "status", "total_size", "downloaded_size", "speed", "eta", "connection_speeds",
+    "parts_info", "num_connections", "supports_resume", "error_message",
+    "extraction_skipped", "completed_at", "filepath", "etag", "last_modified", "validator_source", "deduplicated_from",
+    "content_type", "category", "parts_dir", "state_file", "merged_size"
+)
+
+def _snapshot(task) -> Dict:
+    return {field: getattr(task, field) for field in PROGRESS_FIELDS}
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+def _worker_main(inbox, outbox, settings_data: Dict):
+    settings_manager.settings = Settings(**settings_data)
+    try:
+        asyncio.run(_Worker(inbox, outbox).run())
+    except KeyboardInterrupt:
+        pass
+
+class _Worker:
+    def __init__(self, inbox, outbox):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.tasks = {} # task id -> DownloadTask running here
+        self.jobs: Dict[str, asyncio.Task] = {}
+
+    async def run(self):
+        reporter = asyncio.create_task(self._report_loop())
+        loop = asyncio.get_running_loop()
+        while True:
+            command, args = await loop.run_in_executor(None, self.inbox.get)
+            if command == "stop":
+                break
+            try:
+                self._handle(command, *args)
+            except Exception as e:
+                print(f"Worker {os.getpid()}: error handling {command}: {e}")
+
+        # Leave running downloads paused and resumable
+        for task in self.tasks.values():
+            task.pause()
+            task.save_state()
+        jobs = list(self.jobs.values())
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        from .checkpoint import checkpoint_service
+        await checkpoint_service.flush()
+        reporter.cancel()
+        from .transport import close_pool
+        await close_pool()
+
+    def _handle(self, command: str, task_id: str, *args):
+        if command == "download":
+            self.jobs[task_id] = asyncio.create_task(self._download(task_id, *args))
+        elif command == "extract":
+            self.jobs[task_id] = asyncio.create_task(self._extract(task_id, *args))
+        elif command == "settings":
+            settings_manager.settings = Settings(**args[0])
+        elif command == "rate":
+            from .scheduler import global_limiter
+            global_limiter.set_rate(args[0])
+        else:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return
+            if command == "pause":
+                task.pause()
+            elif command == "resume":
+                task.resume()
+            elif command == "limit":
+                task.set_speed_limit(args[0])
+            elif command == "url":
+                task.update_url(args[0])
+            elif command == "stream":
+                task.request_range(args[0])
+            elif command == "release":
+                # Hand the task back to the control plane, paused and saved
+                task.pause()
+                task.save_state()
+                self.jobs[task_id].cancel()
+            elif command == "cancel":
+                # Only deletion cancels a task, so its state must not be written again
+                from .checkpoint import checkpoint_service
+                checkpoint_service.discard(task)
+                asyncio.create_task(task.cancel())
+
+    async def _download(self, task_id: str, state_file: str, download_dir: str):
+        from .downloader import DownloadTask, TaskStatus
+        from .checkpoint import checkpoint_service
+
+        task = None
+        try:
+            task = DownloadTask.from_state_file(state_file, download_dir, 1)
+            task.set_speed_limit(task.speed_limit)
+            self.tasks[task_id] = task
+            await task.start()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Worker {os.getpid()}: task {task_id} failed: {e}")
+            if task is not None:
+                task.status = TaskStatus.ERROR
+                task.error_message = str(e)
+        finally:
+            self.tasks.pop(task_id, None)
+            self.jobs.pop(task_id, None)
+
+        await checkpoint_service.flush()
+        if task is not None:
+            result = _snapshot(task)
+        else:
+            result = {"status": TaskStatus.ERROR, "error_message": "Could not load task state"}
+        self.outbox.put(("done", task_id, result))
+
+    async def _extract(self, task_id: str, filepath: str):
+        from .extractor import extract_file
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(None, extract_file, filepath)
+        except Exception as e:
+            result = (False, str(e))
+        finally:
+            self.jobs.pop(task_id, None)
+        self.outbox.put(("extracted", task_id, result))
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(REPORT_INTERVAL)
+            if self.tasks:
+                self.outbox.put(("progress", None, {tid: _snapshot(t) for tid, t in self.tasks.items()}))
+
+# ---------------------------------------------------------------------------
+# Control plane side
+# ---------------------------------------------------------------------------
+
+class WorkerHandle:
+    def __init__(self, ctx, outbox):
+        self.inbox = ctx.Queue()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(self.inbox, outbox, settings_manager.settings.dict()),
+            daemon=True
+        )
+        self.process.start()
+        self.jobs = set() # Task ids currently running on this worker
+
+    def send(self, command: str, task_id: Optional[str] = None, *args):
+        self.inbox.put((command, (task_id,) + args))
+
+class WorkerPool:
+    def __init__(self):
+        self.workers: List[WorkerHandle] = []
+        self._ctx = None
+        self._outbox = None
+        self._reader: Optional[threading.Thread] = None
+        self._watchdog: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, Tuple[object, asyncio.Future, str]] = {} # task id -> (task, future, command)
+        self.global_rate_kbps = 0 # Scheduler cap, split evenly between the workers
+
+    @property
+    def enabled(self) -> bool:
+        return settings_manager.settings.worker_processes > 0
+
+    def _ensure_started(self):
+        self._loop = asyncio.get_running_loop()
+        if self._ctx is None:
+            # Fresh interpreters, nothing inherited from the API process (sockets, loop, threads)
+            self._ctx = multiprocessing.get_context("spawn")
+            self._outbox = self._ctx.Queue()
+            self._reader = threading.Thread(target=self._read_events, daemon=True)
+            self._reader.start()
+
+        while len(self.workers) < settings_manager.settings.worker_processes:
+            worker = WorkerHandle(self._ctx, self._outbox)
+            worker.send("rate", None, self._worker_rate())
+            self.workers.append(worker)
+
+        if self._watchdog is None or self._watchdog.done():
+            self._watchdog = asyncio.create_task(self._watch())
+
+    def _pick(self) -> WorkerHandle:
+        self._ensure_started()
+        wanted = settings_manager.settings.worker_processes
+        return min(self.workers[:wanted], key=lambda w: len(w.jobs))
+
+    async def _submit(self, worker: WorkerHandle, task, command: str, *args):
+        future = self._loop.create_future()
+        self._pending[task.id] = (task, future, command)
+        worker.jobs.add(task.id)
+        worker.send(command, task.id, *args)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Whoever was waiting is gone (e.g. a Drive folder was canceled), stop the remote side too
+            worker.send("cancel", task.id)
+            raise
+        finally:
+            self._pending.pop(task.id, None)
+            worker.jobs.discard(task.id)
+            self._retire_idle()
+
+    async def run(self, task):
+        """Run task.start() in a worker process, mirroring its progress onto `task`."""
+        # Hand over the latest state (url, limits, parts), the worker loads the task from it
+        task.save_state()
+        from .checkpoint import checkpoint_service
+        await checkpoint_service.flush()
+        worker = self._pick()
+        task.worker = worker
+        try:
+            result = await self._submit(worker, task, "download", task.state_file, task.download_dir)
+            self._apply(task, result)
+        finally:
+            task.worker = None
+
+    async def extract(self, task) -> Tuple[bool, str]:
+        return await self._submit(self._pick(), task, "extract", task.filepath)
+
+    async def release(self, task):
+        """Stop running `task` remotely (it ends up paused) and wait for its runner to finish."""
+        if task.worker:
+            task.worker.send("release", task.id)
+        if task.task_runner and not task.task_runner.done():
+            await asyncio.wait({task.task_runner}, timeout=10)
+
+    def _worker_rate(self) -> int:
+        if self.global_rate_kbps <= 0:
+            return 0
+        return max(self.global_rate_kbps // max(settings_manager.settings.worker_processes, 1), 1)
+
+    def set_global_rate(self, rate_kbps: int):
+        self.global_rate_kbps = rate_kbps
+        for worker in self.workers:
+            worker.send("rate", None, self._worker_rate())
+
+    def update_settings(self, settings: Settings):
+        for worker in self.workers:
+            worker.send("settings", None, settings.dict())
+
+    def _apply(self, task, fields: Dict):
+        for field, value in fields.items():
+            setattr(task, field, value)
+
+    def _read_events(self):
+        # Blocking reads off the event loop, handled on it
+        while True:
+            try:
+                event = self._outbox.get()
+            except (EOFError, OSError):
+                return
+            self._loop.call_soon_threadsafe(self._handle_event, *event)
+
+    def _handle_event(self, kind: str, task_id: Optional[str], payload):
+        if kind == "progress":
+            for tid, fields in payload.items():
+                pending = self._pending.get(tid)
+                if pending:
+                    self._apply(pending[0], fields)
+            return
+
+        pending = self._pending.get(task_id)
+        if pending and not pending[1].done():
+            pending[1].set_result(payload)
+
+    async def _watch(self):
+        # A worker that dies takes its jobs with it: fail them and start a replacement
+        while self.workers:
+            await asyncio.sleep(1)
+            for worker in list(self.workers):
+                if worker.process.is_alive():
+                    continue
+                print(f"Worker process {worker.process.pid} exited with code {worker.process.exitcode}")
+                self.workers.remove(worker)
+                for task_id in list(worker.jobs):
+                    pending = self._pending.get(task_id)
+                    if pending and not pending[1].done():
+                        if pending[2] == "extract":
+                            pending[1].set_result((False, "Worker process exited"))
+                        else:
+                            pending[1].set_result({"status": "error", "error_message": "Worker process exited"})
+            if self.enabled:
+                self._ensure_started()
+
+    def _retire_idle(self):
+        # The worker count was lowered in settings: stop extra workers once they are idle
+        wanted = settings_manager.settings.worker_processes
+        for worker in self.workers[wanted:]:
+            if not worker.jobs:
+                worker.send("stop")
+                self.workers.remove(worker)
+
+    async def shutdown(self):
+        for worker in self.workers:
+            worker.send("stop")
+        loop = asyncio.get_running_loop()
+        for worker in self.workers:
+            await loop.run_in_executor(None, worker.process.join, 10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self.workers = []
+
+worker_pool = WorkerPool()
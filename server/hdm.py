@@ -0,0 +1,284 @@
+"""Headless Hana Download Manager: a CLI and a small Python API for batch jobs.
+
+Command line (run from the server directory):
+
+    python hdm.py get URL [URL ...] [-i list.txt|file.meta4|manifest.json]
+    python hdm.py drive FOLDER_OR_FILE_ID_OR_LINK [--name NAME]
+
+Progress goes to stderr. With --json a summary is printed to stdout. The exit
+code is 0 if everything completed, 1 if anything failed or was rejected, 130
+if interrupted (unfinished downloads stay resumable) and 2 for usage errors.
+
+Python:
+
+    from hdm import run_batch
+    from core.settings import Settings
+
+    summary = asyncio.run(run_batch(Settings(download_dir="/data/in"), urls=[...]))
+
+Nothing is read or started when this module (or core) is imported. The server
+and the CLI can share a download directory: the CLI leaves tasks it didn't add
+alone.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+PROGRESS_INTERVAL = 1.0 # seconds between progress updates
+LOG_PROGRESS_EVERY = 10 # when stderr isn't a terminal, print a line every N updates
+
+FINISHED = ("completed", "error", "canceled")
+
+def drive_id(value: str) -> str:
+    # Accepts a bare id or a Drive link (/folders/<id>, /d/<id>, ?id=<id>)
+    for pattern in (r"/folders/([\w-]+)", r"/d/([\w-]+)", r"[?&]id=([\w-]+)"):
+        match = re.search(pattern, value)
+        if match:
+            return match.group(1)
+    return value
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+async def _add_drive(manager, item: str, name: Optional[str], options: Dict) -> str:
+    from core.drive import drive_manager, file_url, export_name, is_native, FOLDER_MIME
+
+    loop = asyncio.get_running_loop()
+    # Shortcuts resolve to their target
+    metadata = await loop.run_in_executor(None, drive_manager.resolve, drive_id(item))
+    file_id, mime_type = metadata["id"], metadata.get("mimeType", "")
+    name = name or metadata.get("name") or file_id
+    if mime_type == FOLDER_MIME:
+        return await manager.add_drive_folder_task(file_id, name, **options)
+    url = file_url(file_id, mime_type)
+    if url is None:
+        raise Exception(f"Google files of type {mime_type} can't be exported")
+    return await manager.add_task(url, export_name(name, mime_type), auth="drive", export=is_native(mime_type), **options)
+
+def _task_summary(task) -> Dict:
+    return {
+        "id": task.id,
+        "url": task.url,
+        "filename": task.filename,
+        "path": task.filepath,
+        "status": task.status,
+        "size": task.total_size,
+        "error": task.error_message,
+    }
+
+async def run_batch(settings=None, urls: List[str] = (), entries: List[Dict] = (), drive: List[str] = (),
+                    drive_name: Optional[str] = None, auto_extract: bool = False, speed_limit: int = 0,
+                    max_connections: Optional[int] = None, queue_class: str = "default",
+                    on_progress: Optional[Callable[[List], None]] = None) -> Dict:
+    """Download URLs, manifest entries and Drive files/folders, wait for all of them.
+
+    `settings` is a core.settings.Settings, None reads settings.json. Returns a
+    summary dict: completed/failed task summaries, rejected URLs, bytes, seconds.
+    """
+    from core.downloader import DownloadManager
+    from core.manifest import make_entry
+    from core.checkpoint import checkpoint_service
+    from core.workers import worker_pool
+    from core.events import event_bus
+    from core.hooks import hook_runner
+    from core.reaper import reaper
+    from core.transport import close_pool
+
+    started = time.monotonic()
+    manager = DownloadManager(settings, load_saved=False)
+    options = dict(auto_extract=auto_extract, speed_limit=speed_limit, max_connections=max_connections, queue_class=queue_class)
+
+    task_ids: List[str] = []
+    rejected: List[Dict] = []
+    try:
+        all_entries = [make_entry(url) for url in urls] + list(entries)
+        if all_entries:
+            result = await manager.add_tasks_bulk(all_entries, **options)
+            task_ids.extend(result["added"])
+            rejected.extend({"url": u, "reason": "duplicate"} for u in result["duplicates"])
+            rejected.extend({"url": u, "reason": "invalid"} for u in result["invalid"])
+
+        for item in drive:
+            try:
+                task_ids.append(await _add_drive(manager, item, drive_name, options))
+            except Exception as e:
+                rejected.append({"url": item, "reason": str(e)})
+
+        while True:
+            tasks = [manager.tasks[task_id] for task_id in task_ids if task_id in manager.tasks]
+            if on_progress:
+                on_progress(tasks)
+            if all(t.status in FINISHED for t in tasks):
+                break
+            await asyncio.sleep(PROGRESS_INTERVAL)
+        # Extraction and the rest of post-processing run after the download counts as done
+        await manager.wait_post_processing()
+    finally:
+        # Unfinished downloads stay paused and resumable
+        for task_id in task_ids:
+            task = manager.tasks.get(task_id)
+            if task is not None and task.status not in FINISHED:
+                task.pause()
+                task.save_state()
+        await worker_pool.shutdown()
+        await reaper.drain()
+        await checkpoint_service.flush()
+        await close_pool()
+        # Let hooks for the last events run before the process exits
+        await event_bus.drain()
+        await asyncio.get_running_loop().run_in_executor(None, hook_runner.shutdown)
+
+    tasks = [manager.tasks[task_id] for task_id in task_ids]
+    completed = [_task_summary(t) for t in tasks if t.status == "completed"]
+    failed = [_task_summary(t) for t in tasks if t.status != "completed"]
+    return {
+        "completed": completed,
+        "failed": failed,
+        "rejected": rejected,
+        "bytes": sum(t["size"] for t in completed),
+        "seconds": round(time.monotonic() - started, 1),
+    }
+
+class _ProgressPrinter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.interactive = stream.isatty()
+        self.updates = 0
+
+    def __call__(self, tasks: List):
+        self.updates += 1
+        if not self.interactive and self.updates % LOG_PROGRESS_EVERY != 1:
+            return
+        done = sum(1 for t in tasks if t.status in FINISHED)
+        downloaded = sum(t.downloaded_size for t in tasks)
+        total = sum(t.total_size for t in tasks)
+        speed = sum(t.speed for t in tasks)
+        line = f"[{done}/{len(tasks)}] {_format_bytes(downloaded)}"
+        if total:
+            line += f" / {_format_bytes(total)} ({downloaded / total * 100:.1f}%)"
+        line += f"  {_format_bytes(speed)}/s"
+        if self.interactive:
+            self.stream.write("\r\033[K" + line)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        if self.interactive and self.updates:
+            self.stream.write("\n")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="hdm", description="Hana Download Manager, headless")
+    parser.add_argument("--config", default="settings.json", help="settings file to read (default: settings.json)")
+    parser.add_argument("-d", "--dir", help="download directory (overrides the settings file)")
+    parser.add_argument("-c", "--connections", type=int, help="connections per download")
+    parser.add_argument("-j", "--concurrent", type=int, help="downloads running at the same time")
+    parser.add_argument("-l", "--limit", type=int, default=0, help="speed limit per download in KB/s")
+    parser.add_argument("-x", "--extract", action="store_true", help="extract archives when done")
+    parser.add_argument("--class", dest="queue_class", default="default", help="queue class for schedule windows")
+    parser.add_argument("--json", action="store_true", help="print a JSON summary to stdout")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    get = commands.add_parser("get", help="download URLs")
+    get.add_argument("urls", nargs="*", help="URLs to download")
+    get.add_argument("-i", "--input", action="append", default=[],
+                     help="URL list, Metalink or JSON manifest (repeatable, '-' for stdin)")
+
+    drive = commands.add_parser("drive", help="download Google Drive files or folders")
+    drive.add_argument("items", nargs="+", help="Drive ids or links")
+    drive.add_argument("--name", help="local name (single item only)")
+    return parser
+
+def _load_settings(args):
+    from core.settings import settings_manager
+    settings_manager.config_file = args.config
+    changes = {}
+    if args.dir:
+        changes["download_dir"] = args.dir
+    if args.concurrent:
+        changes["max_concurrent_downloads"] = args.concurrent
+    return settings_manager.settings.copy(update=changes)
+
+def _read_inputs(paths: List[str]) -> List[Dict]:
+    from core.manifest import parse_import_file
+    entries = []
+    for path in paths:
+        if path == "-":
+            entries.extend(parse_import_file("stdin.txt", sys.stdin.buffer.read()))
+        else:
+            with open(path, "rb") as f:
+                entries.extend(parse_import_file(path, f.read()))
+    return entries
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "drive" and args.name and len(args.items) > 1:
+        parser.error("--name only works with a single item")
+
+    try:
+        settings = _load_settings(args)
+        entries = _read_inputs(args.input) if args.command == "get" else []
+    except Exception as e:
+        print(f"hdm: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.command == "get" and not args.urls and not entries:
+        parser.error("nothing to download")
+
+    progress = None if args.quiet else _ProgressPrinter(sys.stderr)
+    summary = None
+    interrupted = False
+    # stdout is reserved for the summary, log output from the core goes to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            summary = asyncio.run(run_batch(
+                settings,
+                urls=args.urls if args.command == "get" else [],
+                entries=entries,
+                drive=args.items if args.command == "drive" else [],
+                drive_name=getattr(args, "name", None),
+                auto_extract=args.extract,
+                speed_limit=args.limit,
+                max_connections=args.connections,
+                queue_class=args.queue_class,
+                on_progress=progress,
+            ))
+        except KeyboardInterrupt:
+            interrupted = True
+        finally:
+            if progress:
+                progress.finish()
+
+    if interrupted:
+        print("hdm: interrupted, unfinished downloads can be resumed", file=sys.stderr)
+        return EXIT_INTERRUPTED
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for task in summary["failed"]:
+            print(f"failed: {task['filename']}: {task['error'] or task['status']}", file=sys.stderr)
+        for item in summary["rejected"]:
+            print(f"skipped: {item['url']}: {item['reason']}", file=sys.stderr)
+        print(f"{len(summary['completed'])} completed, {len(summary['failed'])} failed, "
+              f"{_format_bytes(summary['bytes'])} in {summary['seconds']}s", file=sys.stderr)
+
+    return EXIT_OK if not summary["failed"] and not summary["rejected"] else EXIT_FAILED
+
+if __name__ == "__main__":
+    sys.exit(main())
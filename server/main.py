@@ -2,6 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.routes import router as api_router
 from api.drive_routes import router as drive_router
+from core.checkpoint import checkpoint_service
+from core.workers import worker_pool
+from core.transport import close_pool
 
 app = FastAPI(title="Hana Download Manager")
 
@@ -16,6 +19,13 @@ app.add_middleware(
 app.include_router(api_router, prefix="/api")
 app.include_router(drive_router, prefix="/api")
 
+@app.on_event("shutdown")
+async def flush_checkpoints():
+    # Don't lose the last few seconds of progress on a clean shutdown
+    await worker_pool.shutdown()
+    await checkpoint_service.flush()
+    await close_pool()
+
 @app.get("/")
 async def root():
     return {"message": "Hana Download Manager Backend is running"}
@@ -0,0 +1,70 @@
+"""GET /api/downloads/page with a 20k-task history."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.routes as routes
+from core.downloader import manager, DownloadTask, TaskRecord, TaskStatus
+from core.settings import settings_manager, Settings
+
+COMPLETED = 15000
+ACTIVE = 5000
+ACTIVE_STATUSES = [TaskStatus.DOWNLOADING, TaskStatus.QUEUED, TaskStatus.PAUSED, TaskStatus.ERROR]
+RUNNING = ACTIVE // 2 # DOWNLOADING and QUEUED count as running
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    download_dir = str(tmp_path_factory.mktemp("downloads"))
+    settings_manager.use(Settings(download_dir=download_dir, organize_files=False))
+    tasks = {}
+    for i in range(COMPLETED):
+        record = TaskRecord(id=f"done-{i}", url=f"http://example.com/{i}.bin", filename=f"done-{i}.bin",
+                            filepath=f"{download_dir}/done-{i}.bin", state_file="", parts_dir="",
+                            status=TaskStatus.COMPLETED, total_size=1000, downloaded_size=1000,
+                            speed_limit=0, completed_at=float(i), num_connections=4)
+        tasks[record.id] = record
+    for i in range(ACTIVE):
+        task = DownloadTask(f"http://example.com/a{i}.bin", f"active-{i}.bin", download_dir, 4)
+        task.status = ACTIVE_STATUSES[i % len(ACTIVE_STATUSES)]
+        tasks[task.id] = task
+
+    previous = manager._tasks
+    manager._tasks = tasks
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    yield TestClient(app)
+    manager._tasks = previous
+
+def test_counts(client):
+    page = client.get("/api/downloads/page", params={"tab": "active"}).json()
+    assert page["total"] == ACTIVE
+    assert page["counts"] == {"active": ACTIVE, "completed": COMPLETED, "running": RUNNING}
+
+def test_completed_newest_first(client):
+    page = client.get("/api/downloads/page", params={"tab": "completed", "offset": 0, "limit": 3}).json()
+    assert [t["id"] for t in page["items"]] == [f"done-{COMPLETED - 1}", f"done-{COMPLETED - 2}", f"done-{COMPLETED - 3}"]
+
+def test_last_page_is_short(client):
+    page = client.get("/api/downloads/page", params={"tab": "completed", "offset": COMPLETED - 50, "limit": 100}).json()
+    assert len(page["items"]) == 50
+    assert page["items"][-1]["id"] == "done-0"
+    assert page["offset"] == COMPLETED - 50
+
+def test_offset_past_the_end(client):
+    page = client.get("/api/downloads/page", params={"tab": "active", "offset": ACTIVE + 10}).json()
+    assert page["items"] == []
+    assert page["total"] == ACTIVE
+
+def test_limit_is_capped(client):
+    page = client.get("/api/downloads/page", params={"tab": "completed", "limit": 100000}).json()
+    assert len(page["items"]) == 500
+
+def test_only_the_window_is_serialized(client, monkeypatch):
+    calls = []
+    serialize = routes.serialize_task
+    monkeypatch.setattr(routes, "serialize_task", lambda t: calls.append(t.id) or serialize(t))
+    client.get("/api/downloads/page", params={"tab": "completed", "offset": 1000, "limit": 50})
+    assert len(calls) == 50
+
+def test_unknown_tab(client):
+    assert client.get("/api/downloads/page", params={"tab": "all"}).status_code == 400